@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+异步翻译基准测试：对比线程池执行同步翻译与事件循环内的异步翻译
+在本地模拟服务上并发发起N行翻译，测量总耗时与吞吐
+
+用法:
+    python benchmark/bench_async_translation.py --lines 200 --latency-ms 200
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import urllib3
+
+from config import XFYUN_CONFIG, HTTP_CONFIG
+from fake_xfyun_server import FakeXfyunServer
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+async def run_executor(trans, lines):
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(loop.run_in_executor(None, trans.translate_text, line) for line in lines))
+
+
+async def run_async(trans, lines):
+    try:
+        return await asyncio.gather(*(trans.translate_text_async(line) for line in lines))
+    finally:
+        await trans.get_async_translation_client().close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="异步翻译基准测试")
+    parser.add_argument("--lines", type=int, default=200, help="并发翻译行数")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="模拟服务处理延迟(毫秒)")
+    parser.add_argument("--concurrency", type=int, default=100, help="异步最大在途请求数")
+    args = parser.parse_args()
+
+    with FakeXfyunServer(latency_ms=args.latency_ms) as server:
+        # 指向本地模拟服务，并关闭结果缓存以保证每行都发起请求
+        server.apply_to_config(XFYUN_CONFIG, HTTP_CONFIG)
+        HTTP_CONFIG["async_max_concurrency"] = args.concurrency
+        import trans
+        trans.translation_cache = None
+
+        lines = [f"benchmark line number {index}" for index in range(args.lines)]
+        for name, runner in (("线程池", run_executor), ("异步", run_async)):
+            start = time.perf_counter()
+            results = asyncio.run(runner(trans, lines))
+            elapsed = time.perf_counter() - start
+            failed = sum(1 for line, result in zip(lines, results) if result == line)
+            print(f"{name:<6} 总耗时={elapsed:6.2f}s 吞吐={len(lines) / elapsed:8.1f} 行/s 失败={failed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+端到端基准测试：WebSocket客户端 → WebSocketHandler → 翻译模块 → 本地模拟讯飞服务
+测量整条链路的吞吐（行/秒）与发送到收到响应的延迟分位数（p50/p95/p99）
+
+字幕窗口以桩对象代替，只记录显示信号的调用，不创建任何Qt窗口
+两阶段显示（--display two_phase）时另外统计原文显示确认的延迟
+--subscribers 另外连接若干订阅显示端，统计每个订阅者收到的字幕事件数与丢弃数（翻译调用次数不随订阅者增加）
+
+用法:
+    python benchmark/bench_end_to_end.py --clients 8 --lines 100 --latency lognormal:120,0.5
+    python benchmark/bench_end_to_end.py --error-rate 0.05 --throttle-qps 50 --flow-control --resilience
+    python benchmark/bench_end_to_end.py --clients 1 --lines 200 --slow-rate 0.05 --slow-ms 2000 --pipeline 8
+    python benchmark/bench_end_to_end.py --clients 1 --lines 200 --pipeline 8 --display two_phase
+    python benchmark/bench_end_to_end.py --clients 1 --lines 200 --pipeline 8 --subscribers 8 --slow-subscriber-ms 50
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import urllib3
+
+from config import XFYUN_CONFIG, HTTP_CONFIG, RATE_LIMIT_CONFIG, RESILIENCE_CONFIG
+from fake_xfyun_server import FakeXfyunServer
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+SAMPLE_TEXTS = [
+    "这是一个测试字幕",
+    "Hello, this is a subtitle test",
+    "今天天气很好，我们去公园散步吧",
+    "The quick brown fox jumps over the lazy dog",
+    "人工智能正在改变我们的生活方式",
+]
+
+
+class StubSignal(object):
+    def __init__(self):
+        self.count = 0
+
+    def emit(self, *args):
+        self.count += 1
+
+
+class StubSubtitleWindow(object):
+    """代替 SubtitleWindow，仅统计显示次数"""
+
+    def __init__(self):
+        self.update_signal = StubSignal()
+        self.display_signal = StubSignal()
+        self.translation_signal = StubSignal()
+        self._text_ids = itertools.count(1)
+        self.latest_text_id = 0
+
+    def allocate_text_id(self):
+        self.latest_text_id = next(self._text_ids)
+        return self.latest_text_id
+
+    def is_latest_text(self, text_id):
+        return text_id >= self.latest_text_id
+
+
+def percentile(sorted_values, ratio):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(ratio * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def build_lines(count, client_index, repeat_ratio):
+    """生成待发送字幕：按比例混入重复的示例文本，其余为唯一文本"""
+    lines = []
+    repeat_every = int(round(1 / repeat_ratio)) if repeat_ratio > 0 else 0
+    for index in range(count):
+        if repeat_every and index % repeat_every == 0:
+            lines.append(SAMPLE_TEXTS[index % len(SAMPLE_TEXTS)])
+        else:
+            lines.append(f"client {client_index} subtitle line {index}")
+    return lines
+
+
+async def run_client(uri, lines, latencies, statuses):
+    import websockets
+
+    async with websockets.connect(uri, max_size=None) as websocket:
+        for line in lines:
+            sent_at = time.perf_counter()
+            await websocket.send(json.dumps({"text": line}, ensure_ascii=False))
+            response = json.loads(await websocket.recv())
+            latencies.append((time.perf_counter() - sent_at) * 1000)
+            status = response.get("translation_status", response.get("status"))
+            if response.get("translated_text") == line:
+                status = "fallback"
+            statuses[status] = statuses.get(status, 0) + 1
+
+
+async def run_pipelined_client(uri, lines, latencies, statuses, max_inflight, order,
+                               display="after_translation", display_latencies=None, interval=0.0,
+                               provisional=False, sources=None, encoding="json", echo=True, traffic=None,
+                               compression=False):
+    """流水线客户端：不等待响应连续发送，按 seq 匹配响应计算延迟
+
+    两阶段显示时每行收到 displayed 与 translated 两条响应，displayed 的延迟记入 display_latencies
+    traffic 记录收到的响应字节数（压缩前的消息大小）
+    """
+    import websockets
+    from wire_protocol import decode_message
+
+    async with websockets.connect(uri, max_size=None, compression="deflate" if compression else None) as websocket:
+        await websocket.send(json.dumps({"type": "config", "order": order, "max_inflight": max_inflight,
+                                         "display": display, "provisional": provisional,
+                                         "encoding": encoding, "echo": echo}))
+        decode_message(await websocket.recv())
+        sent_at = {}
+
+        async def sender():
+            for seq, line in enumerate(lines):
+                if seq and interval:
+                    await asyncio.sleep(interval)
+                sent_at[seq] = time.perf_counter()
+                await websocket.send(json.dumps({"text": line, "seq": seq}, ensure_ascii=False))
+
+        send_task = asyncio.ensure_future(sender())
+        for _ in range(len(lines) * (2 if display == "two_phase" else 1)):
+            message = await websocket.recv()
+            if traffic is not None:
+                traffic["messages"] += 1
+                traffic["bytes"] += len(message.encode("utf-8") if isinstance(message, str) else message)
+            response = decode_message(message)
+            seq = response.get("seq")
+            if response.get("event") == "displayed":
+                display_latencies.append((time.perf_counter() - sent_at[seq]) * 1000)
+                continue
+            latencies.append((time.perf_counter() - sent_at[seq]) * 1000)
+            if sources is not None and "result_source" in response:
+                sources[response["result_source"]] = sources.get(response["result_source"], 0) + 1
+            status = response.get("translation_status", response.get("status"))
+            if status == "cancelled":
+                pass
+            elif response.get("superseded"):
+                status = "superseded"
+            elif response.get("translated_text") == lines[seq]:
+                status = "fallback"
+            statuses[status] = statuses.get(status, 0) + 1
+        await send_task
+
+
+async def run_subscriber(uri, received, stop, queue_size=None, delay=0.0):
+    """订阅显示端：注册后持续接收字幕事件，received 按事件类型计数；delay 模拟处理慢的显示端"""
+    import websockets
+    from wire_protocol import decode_message
+
+    async with websockets.connect(uri, max_size=None) as websocket:
+        request = {"type": "subscribe"}
+        if queue_size:
+            request["queue_size"] = queue_size
+        await websocket.send(json.dumps(request))
+        decode_message(await websocket.recv())
+        while not stop.is_set():
+            try:
+                message = await asyncio.wait_for(websocket.recv(), 0.1)
+            except asyncio.TimeoutError:
+                continue
+            event = decode_message(message).get("event")
+            received[event] = received.get(event, 0) + 1
+            if delay:
+                await asyncio.sleep(delay)
+
+
+async def wait_subscribers_idle(subscribers, timeout=5.0):
+    """等待订阅者收到的事件数不再变化（队列已发送完毕）"""
+    deadline = time.perf_counter() + timeout
+    last = None
+    while time.perf_counter() < deadline:
+        counts = [sum(received.values()) for received in subscribers]
+        if counts == last:
+            return
+        last = counts
+        await asyncio.sleep(0.2)
+
+
+async def run_benchmark(args):
+    import websockets
+    import main as subtitle_main
+
+    window = StubSubtitleWindow()
+    handler = subtitle_main.WebSocketHandler(window)
+    server = await websockets.serve(handler.handle_message, "127.0.0.1", 0, max_size=None)
+    port = server.sockets[0].getsockname()[1]
+    uri = f"ws://127.0.0.1:{port}"
+
+    latencies = []
+    display_latencies = []
+    statuses = {}
+    sources = {}
+    traffic = {"messages": 0, "bytes": 0}
+    subscribers = [{} for _ in range(args.subscribers)]
+    stop = asyncio.Event()
+    subscriber_tasks = [
+        asyncio.ensure_future(run_subscriber(uri, received, stop, args.subscriber_queue,
+                                             args.slow_subscriber_ms / 1000.0 if index == 0 else 0.0))
+        for index, received in enumerate(subscribers)
+    ]
+    try:
+        while len(handler.subscribers) < len(subscriber_tasks):
+            await asyncio.sleep(0.01)
+        start = time.perf_counter()
+        if args.pipeline > 0:
+            clients = [
+                run_pipelined_client(uri, build_lines(args.lines, client_index, args.repeat_ratio),
+                                     latencies, statuses, args.pipeline, args.order,
+                                     args.display, display_latencies, args.interval_ms / 1000.0,
+                                     args.provisional, sources, args.encoding, not args.no_echo, traffic,
+                                     args.compression)
+                for client_index in range(args.clients)
+            ]
+        else:
+            clients = [
+                run_client(uri, build_lines(args.lines, client_index, args.repeat_ratio), latencies, statuses)
+                for client_index in range(args.clients)
+            ]
+        await asyncio.gather(*clients)
+        elapsed = time.perf_counter() - start
+        if subscriber_tasks:
+            # 慢订阅者不计入等待，只等其他订阅者收完
+            await wait_subscribers_idle(subscribers[1:] if args.slow_subscriber_ms else subscribers)
+            hub_stats = handler.subscribers.get_stats()
+            stop.set()
+            await asyncio.gather(*subscriber_tasks)
+        else:
+            hub_stats = None
+    finally:
+        server.close()
+        await server.wait_closed()
+        import trans
+        await trans.get_async_translation_client().close()
+    return (elapsed, sorted(latencies), sorted(display_latencies), statuses, sources, traffic, window,
+            subscribers, hub_stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端字幕翻译基准测试")
+    parser.add_argument("--clients", type=int, default=8, help="并发WebSocket连接数")
+    parser.add_argument("--lines", type=int, default=100, help="每个连接发送的字幕行数")
+    parser.add_argument("--repeat-ratio", type=float, default=0.2, help="重复示例文本的比例")
+    parser.add_argument("--latency", default="lognormal:120,0.5", help="模拟服务延迟分布")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="慢请求比例")
+    parser.add_argument("--slow-ms", type=float, default=0.0, help="慢请求额外延迟(毫秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="注入错误比例")
+    parser.add_argument("--throttle-qps", type=int, default=0, help="模拟服务限流QPS")
+    parser.add_argument("--no-tls", action="store_true", help="模拟服务使用HTTP")
+    parser.add_argument("--keep-cache", action="store_true", help="保留翻译结果缓存")
+    parser.add_argument("--flow-control", action="store_true", help="启用客户端流控（默认关闭）")
+    parser.add_argument("--resilience", action="store_true", help="启用对冲请求与熔断（默认关闭）")
+    parser.add_argument("--qps", type=float, default=0,
+                        help="启用客户端流控并覆盖QPS上限（同时作为突发量），0 表示使用配置")
+    parser.add_argument("--pipeline", type=int, default=0,
+                        help="每个连接的在途消息数，0 表示逐条发送并等待响应")
+    parser.add_argument("--order", choices=["ordered", "latest"], default="ordered", help="流水线顺序模式")
+    parser.add_argument("--display", choices=["after_translation", "two_phase"], default="after_translation",
+                        help="显示模式（two_phase 需配合 --pipeline）")
+    parser.add_argument("--provisional", action="store_true", help="两阶段显示时先显示词典临时译文")
+    parser.add_argument("--encoding", choices=["json", "msgpack"], default="json", help="流水线客户端协商的响应编码")
+    parser.add_argument("--no-echo", action="store_true", help="响应不回显原文")
+    parser.add_argument("--compression", action="store_true", help="客户端启用 permessage-deflate")
+    parser.add_argument("--interval-ms", type=float, default=0.0, help="流水线客户端的发送间隔(毫秒)，0 表示连续发送")
+    parser.add_argument("--subscribers", type=int, default=0, help="订阅显示端数量")
+    parser.add_argument("--subscriber-queue", type=int, default=0, help="订阅者发送队列长度，0 表示使用配置")
+    parser.add_argument("--slow-subscriber-ms", type=float, default=0.0,
+                        help="第一个订阅者每收到一条事件后的处理耗时(毫秒)，模拟慢显示端")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+    if args.display == "two_phase" and args.pipeline <= 0:
+        parser.error("--display two_phase 需要 --pipeline 大于 0")
+
+    with FakeXfyunServer(use_tls=not args.no_tls, latency=args.latency, slow_rate=args.slow_rate,
+                         slow_ms=args.slow_ms, error_rate=args.error_rate,
+                         throttle_qps=args.throttle_qps, seed=args.seed) as fake_server:
+        fake_server.apply_to_config(XFYUN_CONFIG, HTTP_CONFIG)
+        if args.flow_control or args.qps > 0:
+            RATE_LIMIT_CONFIG["enabled"] = True
+        if args.resilience:
+            RESILIENCE_CONFIG.update({"hedging_enabled": True, "breaker_enabled": True})
+        if args.qps > 0:
+            RATE_LIMIT_CONFIG.update({"qps": args.qps, "burst": args.qps})
+        import trans
+        if not args.keep_cache:
+            trans.translation_cache = None
+        # 导入 main 会按其配置初始化日志，压测时只保留警告以上
+        import main as subtitle_main  # noqa: F401
+        logging.getLogger().setLevel(logging.WARNING)
+
+        elapsed, latencies, display_latencies, statuses, sources, traffic, window, subscribers, hub_stats = \
+            asyncio.run(run_benchmark(args))
+        total = len(latencies)
+        displayed = window.update_signal.count + window.display_signal.count
+
+        mode = f"流水线({args.pipeline}, {args.order}, {args.display})" if args.pipeline > 0 else "逐条等待响应"
+        print(f"连接数={args.clients} 每连接行数={args.lines} 延迟分布={args.latency} 模式={mode}")
+        print(f"总行数={total} 总耗时={elapsed:.2f}s 吞吐={total / elapsed:.1f} 行/s 显示次数={displayed}"
+              f" 译文填入次数={window.translation_signal.count}")
+        if display_latencies:
+            print(f"原文显示延迟(ms): p50={percentile(display_latencies, 0.50):.1f} "
+                  f"p95={percentile(display_latencies, 0.95):.1f} p99={percentile(display_latencies, 0.99):.1f} "
+                  f"max={display_latencies[-1]:.1f}")
+        print(f"端到端延迟(ms): p50={percentile(latencies, 0.50):.1f} "
+              f"p95={percentile(latencies, 0.95):.1f} p99={percentile(latencies, 0.99):.1f} "
+              f"max={latencies[-1] if latencies else 0.0:.1f}")
+        print(f"响应状态: {statuses}")
+        if sources:
+            print(f"译文来源: {sources}")
+        if traffic["messages"]:
+            print(f"响应流量({args.encoding}{', 无回显' if args.no_echo else ''}，压缩前): "
+                  f"{traffic['bytes'] / total:.1f} 字节/行, {traffic['bytes'] / traffic['messages']:.1f} 字节/消息")
+        if subscribers:
+            print(f"订阅统计: {hub_stats}")
+            for index, received in enumerate(subscribers):
+                label = "慢订阅者" if index == 0 and args.slow_subscriber_ms else "订阅者"
+                print(f"  {label}[{index}] 收到事件: {received}")
+        print(f"模拟服务统计: {fake_server.stats}")
+        print(f"流控统计: {trans.get_flow_control_stats()}")
+        print(f"容错统计: {trans.get_resilience_stats()}")
+        print(f"过期字幕撤销统计: {trans.get_cancellation_stats()} 合并统计: {trans.get_coalescing_stats()}")
+
+
+if __name__ == "__main__":
+    main()
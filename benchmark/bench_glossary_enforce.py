@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+译文词形校准基准测试：对比逐条编译正则逐遍替换与合并正则单次替换
+按每行命中的词条数（1 / 3 / 8 / 16）测量单行耗时，并校验结果一致
+
+用法:
+    python benchmark/bench_glossary_enforce.py --terms 1 3 8 16
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from glossary import CanonicalCasing
+
+TERMS = [
+    "Leader Star", "Xiao Hua", "Supply Chain", "Smart Crane", "Digital Platform", "Cloud Engine",
+    "Power Model", "Quality Center", "Research Network", "Safety Vision", "Port Operation",
+    "Transfer Design", "Comprehensive Plan", "Data Hub", "Machine Learning", "Neural Network",
+]
+
+
+def legacy_enforce(text, applied_entries):
+    """原实现：每个词条编译一次正则并单独扫描一遍"""
+    result_text = text
+    for entry in applied_entries:
+        replacement = entry.get("replacement", "")
+        if not replacement:
+            continue
+        regex = re.compile(re.escape(replacement), re.IGNORECASE)
+        result_text = regex.sub(replacement, result_text)
+    return result_text
+
+
+def make_case(count):
+    """构造命中 count 个词条、且大小写被API改写过的译文"""
+    applied = [{"pattern": f"term{index}", "replacement": term} for index, term in enumerate(TERMS[:count])]
+    text = ", ".join(term.lower() for term in TERMS[:count])
+    text += " were discussed by the operations team during today's review meeting."
+    return text, applied
+
+
+def time_per_line(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="译文词形校准基准测试")
+    parser.add_argument("--terms", type=int, nargs="+", default=[1, 3, 8, 16], help="每行命中的词条数")
+    parser.add_argument("--repeat", type=int, default=20000, help="重复次数")
+    args = parser.parse_args()
+
+    casing = CanonicalCasing()
+    print(f"{'词条数':>6} {'逐条正则/行':>12} {'合并正则/行':>12} {'加速比':>8}")
+    for count in args.terms:
+        text, applied = make_case(count)
+        replacements = [entry["replacement"] for entry in applied]
+        expected = legacy_enforce(text, applied)
+        actual = casing.restore(text, replacements)
+        if expected != actual:
+            raise AssertionError(f"结果不一致:\n  逐条: {expected!r}\n  合并: {actual!r}")
+
+        legacy_us = time_per_line(lambda: legacy_enforce(text, applied), args.repeat)
+        combined_us = time_per_line(lambda: casing.restore(text, replacements), args.repeat)
+        print(f"{count:>6} {legacy_us:>10.2f}us {combined_us:>10.2f}us {legacy_us / combined_us:>7.1f}x")
+    print(f"合并正则缓存: {casing.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
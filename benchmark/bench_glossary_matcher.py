@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+词典匹配基准测试：对比逐条正则扫描与 Aho-Corasick 自动机
+分别在 1k / 10k / 100k 词条规模下测量构建耗时与单行查询耗时，并校验结果一致
+
+用法:
+    python benchmark/bench_glossary_matcher.py --sizes 1000 10000 100000
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from glossary import GlossaryMatcher
+from trans import apply_glossary_inline
+
+ENGLISH_WORDS = [
+    "leader", "star", "digital", "platform", "transfer", "comprehensive", "smart",
+    "crane", "port", "center", "operation", "quality", "safety", "supply", "chain",
+    "design", "research", "cloud", "engine", "network", "model", "vision", "power",
+]
+SAMPLE_LINES = [
+    "The Leader Star roadmap ensures a comprehensive rollout for every team.",
+    "Xiao Hua will monitor the transfer milestones carefully.",
+    "我们团队的引领者之星计划正在推进，请大家按时反馈。",
+    "数字化生产运营中心秉持统筹引领、科学管理，数智融合、协同高效的理念，集成了公司生产经营管理等各个方面的数据。",
+    "Smart crane platform design and supply chain quality are the focus of the digital operation center.",
+]
+
+
+def random_cjk(rng, length):
+    return ''.join(chr(rng.randint(0x4e00, 0x9fa5)) for _ in range(length))
+
+
+def make_entries(size, seed=42):
+    """生成合成词典：中英短语各半，另加样例句中出现的真实词条"""
+    rng = random.Random(seed)
+    entries = {}
+    base = [("引领者之星", "Leader Star"), ("小华", "Xiao Hua"), ("Leader Star", "引领者之星"),
+            ("transfer", "流转"), ("comprehensive", "全方位"), ("数字化", "digital"),
+            ("smart crane", "智能起重机"), ("supply chain", "供应链")]
+    for key, value in base:
+        entries[key.lower()] = {"pattern": key, "replacement": value,
+                                "source_lang": None, "target_lang": None}
+    while len(entries) < size:
+        if rng.random() < 0.5:
+            key = ' '.join(rng.choice(ENGLISH_WORDS) for _ in range(rng.randint(1, 3)))
+            key += str(rng.randint(0, size))
+            value = random_cjk(rng, rng.randint(2, 6))
+        else:
+            key = random_cjk(rng, rng.randint(2, 6))
+            value = ' '.join(rng.choice(ENGLISH_WORDS) for _ in range(rng.randint(1, 3)))
+        entries.setdefault(key.lower(), {"pattern": key, "replacement": value,
+                                         "source_lang": None, "target_lang": None})
+    return entries
+
+
+def legacy_build(entries):
+    for entry in entries.values():
+        entry["regex"] = re.compile(re.escape(entry["pattern"]), re.IGNORECASE)
+
+
+def legacy_collect(entries, text):
+    """原实现：逐条正则 finditer 后排序"""
+    matches = []
+    for entry in entries.values():
+        for match in entry["regex"].finditer(text):
+            matches.append({"start": match.start(), "end": match.end(), "entry": entry})
+    matches.sort(key=lambda item: (item["start"], -(item["end"] - item["start"])))
+    return matches
+
+
+def matcher_collect(matcher, text):
+    return [{"start": start, "end": end, "entry": entry}
+            for start, end, entry in matcher.find_matches(text)]
+
+
+def time_per_line(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for line in SAMPLE_LINES:
+            func(line)
+    return (time.perf_counter() - start) / (repeat * len(SAMPLE_LINES)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="词典匹配基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="词条规模")
+    parser.add_argument("--repeat", type=int, default=20, help="自动机查询重复次数")
+    args = parser.parse_args()
+
+    print(f"{'词条数':>8} {'正则构建':>10} {'自动机构建':>10} {'正则/行':>10} {'自动机/行':>10} {'加速比':>8}")
+    for size in args.sizes:
+        entries = make_entries(size)
+
+        start = time.perf_counter()
+        legacy_build(entries)
+        legacy_build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        matcher = GlossaryMatcher(entries.values())
+        matcher_build_ms = (time.perf_counter() - start) * 1000
+
+        for line in SAMPLE_LINES:
+            expected = apply_glossary_inline(line, legacy_collect(entries, line))[0]
+            actual = apply_glossary_inline(line, matcher_collect(matcher, line))[0]
+            if expected != actual:
+                raise AssertionError(f"结果不一致: {line!r}\n  正则: {expected!r}\n  自动机: {actual!r}")
+
+        legacy_repeat = max(1, min(args.repeat, 20000 // size))
+        legacy_ms = time_per_line(lambda line: legacy_collect(entries, line), legacy_repeat)
+        matcher_ms = time_per_line(lambda line: matcher_collect(matcher, line), args.repeat)
+        print(f"{size:>8} {legacy_build_ms:>9.1f}ms {matcher_build_ms:>9.1f}ms "
+              f"{legacy_ms:>9.3f}ms {matcher_ms:>9.3f}ms {legacy_ms / matcher_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
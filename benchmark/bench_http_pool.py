@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+连接池基准测试：对比每次新建连接与长连接复用时的单请求延迟
+使用本地HTTPS模拟服务，不调用真实API
+
+用法:
+    python benchmark/bench_http_pool.py --requests 200 --threads 1 4
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import urllib3
+
+from fake_xfyun_server import FAKE_API_KEY, FAKE_APP_ID, FAKE_SECRET, FakeXfyunServer
+from trans import TranslationClient, get_result
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class UnverifiedOneShotClient(object):
+    """不复用连接的客户端：每次请求都新建TCP+TLS连接（等价于裸 requests.post）"""
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+
+    def post(self, url, data, headers):
+        import requests
+        return requests.post(url, data=data, headers=headers, timeout=self.timeout, verify=False)
+
+
+def run_case(host, client, total_requests, threads):
+    """执行一组请求并返回每个请求的延迟(毫秒)"""
+    business_args = {"from": "en", "to": "cn"}
+
+    def one_request(index):
+        translator = get_result(host, FAKE_APP_ID, FAKE_API_KEY, FAKE_SECRET, f"benchmark line {index}",
+                                business_args, client=client)
+        start = time.perf_counter()
+        result = translator.call_url()
+        elapsed = (time.perf_counter() - start) * 1000
+        if not result:
+            raise RuntimeError("模拟服务返回空结果")
+        return elapsed
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        start = time.perf_counter()
+        latencies = list(executor.map(one_request, range(total_requests)))
+        wall = time.perf_counter() - start
+    return sorted(latencies), wall
+
+
+def report(name, latencies, wall, connections):
+    print(f"{name:<12} mean={statistics.mean(latencies):7.2f}ms "
+          f"p50={percentile(latencies, 0.50):7.2f}ms "
+          f"p95={percentile(latencies, 0.95):7.2f}ms "
+          f"throughput={len(latencies) / wall:8.1f} req/s "
+          f"connections={connections}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="翻译API连接池基准测试")
+    parser.add_argument("--requests", type=int, default=200, help="每组请求数")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4], help="并发线程数")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="模拟服务处理延迟(毫秒)")
+    args = parser.parse_args()
+
+    with FakeXfyunServer(latency_ms=args.latency_ms) as server:
+        print(f"模拟服务: https://{server.host}/v2/its")
+        for threads in args.threads:
+            print(f"\n--- 并发线程: {threads}, 请求数: {args.requests} ---")
+
+            before = server.stats["connections"]
+            latencies, wall = run_case(server.host, UnverifiedOneShotClient(), args.requests, threads)
+            report("无连接池", latencies, wall, server.stats["connections"] - before)
+
+            client = TranslationClient(pool_maxsize=max(threads, 1), verify_ssl=False)
+            try:
+                before = server.stats["connections"]
+                latencies, wall = run_case(server.host, client, args.requests, threads)
+                report("连接池", latencies, wall, server.stats["connections"] - before)
+            finally:
+                client.close()
+
+
+if __name__ == "__main__":
+    main()
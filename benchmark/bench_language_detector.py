@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+语种检测基准测试：对比逐语种正则扫描（原实现）与码位表单次遍历
+分别测量短字幕行与长段落的单次检测耗时，并用随机混合文本校验两者结果完全一致
+另测量批量接口（numpy向量化）相对逐行检测的吞吐（行/分钟），并校验批量结果与逐行结果一致
+以及长文本抽样检测（提前结束）相对完整扫描的耗时随长度的变化，和随机中英混合文本上的结论一致率
+
+用法:
+    python benchmark/bench_language_detector.py
+    python benchmark/bench_language_detector.py --fuzz 20000 --repeat 20000
+    python benchmark/bench_language_detector.py --batch-lines 1000000
+    python benchmark/bench_language_detector.py --long-chars 5000 50000 500000 --mixed 2000
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import language_detector
+from language_detector import (LANGUAGE_PATTERNS, detect_language, analyze_text_composition,
+                               detect_language_batch, analyze_text_composition_batch,
+                               detect_language_with_confidence)
+
+# 原实现使用的正则，逐条列出以免受 LANGUAGE_PATTERNS 生成方式影响
+LEGACY_PATTERNS = {
+    'cn': r'[\u4e00-\u9fff]',
+    'en': r'[a-zA-Z]',
+    'ja': r'[\u3040-\u309f\u30a0-\u30ff]',
+    'ko': r'[\uac00-\ud7af]',
+    'ru': r'[\u0400-\u04ff]',
+    'ar': r'[\u0600-\u06ff]',
+    'th': r'[\u0e00-\u0e7f]',
+    'el': r'[\u0370-\u03ff]',
+    'he': r'[\u0590-\u05ff]',
+    'hi': r'[\u0900-\u097f]',
+}
+
+SHORT_LINES = [
+    "这是一个测试字幕",
+    "Hello, this is a subtitle test",
+    "今天天气很好，我们去公园散步吧",
+    "The quick brown fox jumps over the lazy dog",
+    "Hello 世界! Mixed text test.",
+    "こんにちは、世界",
+    "Привет, мир",
+    "123456 数字测试",
+]
+
+# 随机文本的字符来源：各语种字符、数字、标点、空白、组合符号与基本多文种平面以外的字符
+FUZZ_ALPHABET = (
+    "你好世界字幕翻译测试abcdefghijklmnopqrstuvwxyzABCXYZ"
+    "あいうえおアイウエオ한국어가나다ПриветмирمرحباสวัสดีΓειάשלוםनमस्ते"
+    "0123456789٣५_ ，。！？,.!?'\"-\t\n\u0301\u0e34\u0374\u3000"
+    "\U00020000\U0001F600\U0001D400\U00010400"
+)
+
+
+def legacy_detect_language(text):
+    """原实现：去除非单词字符后，逐语种执行一次 re.findall"""
+    if not text or not text.strip():
+        return 'unknown'
+    clean_text = re.sub(r'[^\w]', '', text)
+    if not clean_text:
+        return 'unknown'
+    language_ratios = {}
+    text_length = len(clean_text)
+    for lang_code, pattern in LEGACY_PATTERNS.items():
+        chars = re.findall(pattern, clean_text)
+        language_ratios[lang_code] = len(chars) / text_length if text_length > 0 else 0
+    max_ratio = 0
+    detected_language = 'unknown'
+    for lang_code, ratio in language_ratios.items():
+        if ratio > max_ratio:
+            min_threshold = 0.3 if lang_code == 'cn' else 0.5
+            if ratio >= min_threshold:
+                max_ratio = ratio
+                detected_language = lang_code
+    return detected_language
+
+
+def legacy_analyze_text_composition(text):
+    """原实现的语种组成分析"""
+    if not text or not text.strip():
+        return {}
+    clean_text = re.sub(r'[^\w]', '', text)
+    if not clean_text:
+        return {}
+    composition = {}
+    text_length = len(clean_text)
+    for lang_code, pattern in LEGACY_PATTERNS.items():
+        count = len(re.findall(pattern, clean_text))
+        ratio = count / text_length if text_length > 0 else 0
+        if count > 0:
+            composition[lang_code] = {'count': count, 'ratio': ratio, 'percentage': f"{ratio*100:.1f}%"}
+    return composition
+
+
+def build_paragraph(rng, length):
+    """拼接示例字幕构造长段落"""
+    parts = []
+    total = 0
+    while total < length:
+        line = rng.choice(SHORT_LINES)
+        parts.append(line)
+        total += len(line) + 1
+    return " ".join(parts)
+
+
+def check_equivalence(rng, count):
+    """随机混合文本上校验检测结果与组成分析完全一致"""
+    samples = [""] + [" ", "，。！", "\U0001F600"] + SHORT_LINES
+    for _ in range(count):
+        samples.append("".join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(1, 80))))
+    for text in samples:
+        expected, actual = legacy_detect_language(text), detect_language(text)
+        if expected != actual:
+            raise AssertionError(f"检测结果不一致: {text!r} 原实现={expected} 码位表={actual}")
+        expected, actual = legacy_analyze_text_composition(text), analyze_text_composition(text)
+        if expected != actual:
+            raise AssertionError(f"组成分析不一致: {text!r}\n  原实现: {expected}\n  码位表: {actual}")
+    for lang_code, pattern in LANGUAGE_PATTERNS.items():
+        legacy = re.compile(LEGACY_PATTERNS[lang_code])
+        current = re.compile(pattern)
+        for cp in range(0x10000):
+            if bool(legacy.match(chr(cp))) != bool(current.match(chr(cp))):
+                raise AssertionError(f"{lang_code} 正则与原实现不一致: U+{cp:04X}")
+    return len(samples)
+
+
+def check_batch_equivalence(rng, count):
+    """随机混合文本上校验批量接口与逐行接口结果一致"""
+    texts = ["", None, " ", "\U0001F600"] + SHORT_LINES
+    texts += ["".join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(0, 80))) for _ in range(count)]
+    if detect_language_batch(texts) != [detect_language(text) for text in texts]:
+        raise AssertionError("批量检测结果与逐行检测不一致")
+    if analyze_text_composition_batch(texts) != [analyze_text_composition(text) for text in texts]:
+        raise AssertionError("批量组成分析结果与逐行分析不一致")
+
+
+def run_batch_benchmark(rng, line_count):
+    """比较逐行检测与批量检测的吞吐"""
+    lines = [rng.choice(SHORT_LINES) for _ in range(line_count)]
+    start = time.perf_counter()
+    expected = [detect_language(text) for text in lines]
+    scalar_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    actual = detect_language_batch(lines)
+    batch_elapsed = time.perf_counter() - start
+    if expected != actual:
+        raise AssertionError("批量检测结果与逐行检测不一致")
+    mode = "numpy向量化" if language_detector.np is not None else "未安装numpy，逐行检测"
+    print(f"批量检测({mode}) {line_count} 行: 逐行 {line_count / scalar_elapsed * 60 / 1e6:.1f}M 行/分钟, "
+          f"批量 {line_count / batch_elapsed * 60 / 1e6:.1f}M 行/分钟, "
+          f"加速比 {scalar_elapsed / batch_elapsed:.1f}x")
+
+
+def build_mixed_text(rng, length, cn_share, block):
+    """按给定中文占比拼接中英文片段，block 为每个片段的字符数"""
+    parts = []
+    total = 0
+    while total < length:
+        source = rng.choice(SHORT_LINES[:3]) if rng.random() < cn_share else rng.choice(SHORT_LINES[3:5])
+        start = rng.randrange(len(source))
+        part = (source * (block // len(source) + 2))[start:start + block]
+        parts.append(part)
+        total += len(part)
+    return "".join(parts)
+
+
+def run_sampled_benchmark(rng, lengths, mixed_count):
+    """比较完整扫描与抽样检测的耗时，并统计抽样结论与完整扫描不一致的次数"""
+    print(f"{'长度':>8} {'文本':<6} {'完整扫描/次':>12} {'抽样检测/次':>12} {'置信度':>8}")
+    for length in lengths:
+        for name, cn_share in (("中文", 1.0), ("英文", 0.0), ("混合", 0.4)):
+            text = build_mixed_text(rng, length, cn_share, 20)
+            repeat = max(3, 200000 // length)
+            full_us = time_per_call(detect_language, [text], repeat)
+            sampled_us = time_per_call(detect_language_with_confidence, [text], repeat)
+            _, confidence = detect_language_with_confidence(text)
+            print(f"{length:>8} {name:<6} {full_us:>10.1f}us {sampled_us:>10.1f}us {confidence:>8.4f}")
+
+    mismatched = 0
+    early_exits = 0
+    for _ in range(mixed_count):
+        text = build_mixed_text(rng, rng.randint(2500, 60000), rng.random(), rng.choice([1, 20, 300]))
+        language, confidence = detect_language_with_confidence(text)
+        early_exits += confidence < 1.0
+        mismatched += language != detect_language(text)
+    print(f"随机中英混合文本 {mixed_count} 条: 提前结束 {early_exits} 条, 与完整扫描结论不一致 {mismatched} 条")
+
+
+def time_per_call(func, texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            func(text)
+    return (time.perf_counter() - start) / (repeat * len(texts)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="语种检测基准测试")
+    parser.add_argument("--fuzz", type=int, default=5000, help="随机校验文本数")
+    parser.add_argument("--repeat", type=int, default=10000, help="短字幕行重复次数")
+    parser.add_argument("--paragraph-chars", type=int, nargs="+", default=[500, 5000], help="长段落字符数")
+    parser.add_argument("--batch-lines", type=int, default=200000, help="批量检测的行数，0 表示跳过")
+    parser.add_argument("--long-chars", type=int, nargs="+", default=[5000, 50000, 500000],
+                        help="抽样检测的长文本字符数")
+    parser.add_argument("--mixed", type=int, default=500, help="抽样一致率校验的随机混合文本数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    checked = check_equivalence(rng, args.fuzz)
+    check_batch_equivalence(rng, args.fuzz)
+    print(f"结果一致性校验通过: {checked} 条文本（含批量接口）")
+
+    cases = [("短字幕行", SHORT_LINES, args.repeat)]
+    for length in args.paragraph_chars:
+        repeat = max(10, args.repeat * 30 // length)
+        cases.append((f"长段落({length}字)", [build_paragraph(rng, length)], repeat))
+
+    print(f"{'场景':<14} {'正则扫描/次':>12} {'码位表/次':>12} {'加速比':>8}")
+    for name, texts, repeat in cases:
+        legacy_us = time_per_call(legacy_detect_language, texts, repeat)
+        table_us = time_per_call(detect_language, texts, repeat)
+        print(f"{name:<14} {legacy_us:>10.2f}us {table_us:>10.2f}us {legacy_us / table_us:>7.1f}x")
+
+    if args.batch_lines > 0:
+        run_batch_benchmark(rng, args.batch_lines)
+    run_sampled_benchmark(rng, args.long_chars, args.mixed)
+
+
+if __name__ == "__main__":
+    main()
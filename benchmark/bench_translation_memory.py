@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+模糊翻译记忆基准测试：在 10k / 100k 条历史原文规模下测量查询耗时与命中情况
+查询包括近似重复（增删标点、语气词、改动个别字）与无关新句两类
+
+用法:
+    python benchmark/bench_translation_memory.py --sizes 10000 100000 --threshold 0.9
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from translation_memory import TranslationMemory
+
+FILLERS = ["嗯", "呃", "um", "uh"]
+EN_LETTERS = "abcdefghiklmnoprstuw"
+
+
+def make_vocabulary(rng, size=3000):
+    """生成合成词表：常用汉字组成的双字词与英文伪词"""
+    cjk = [''.join(chr(rng.randint(0x4e00, 0x4e00 + 2500)) for _ in range(2)) for _ in range(size)]
+    english = [''.join(rng.choice(EN_LETTERS) for _ in range(rng.randint(2, 9))) for _ in range(size)]
+    return cjk, english
+
+
+def make_sentence(rng, vocabulary):
+    cjk, english = vocabulary
+    if rng.random() < 0.5:
+        return ''.join(rng.choice(cjk) for _ in range(rng.randint(4, 12))), ("cn", "en")
+    return ' '.join(rng.choice(english) for _ in range(rng.randint(5, 14))), ("en", "cn")
+
+
+def perturb(rng, text):
+    """模拟语音识别的细微差异：标点、语气词或改动一个字符"""
+    kind = rng.randrange(3)
+    if kind == 0:
+        return text + rng.choice(["。", "，", "?", "!", "..."])
+    if kind == 1:
+        filler = rng.choice(FILLERS)
+        return f"{filler}, {text}" if filler.isascii() else f"{filler}，{text}"
+    index = rng.randrange(len(text))
+    return text[:index] + rng.choice("的了在是an") + text[index + 1:]
+
+
+def percentile(sorted_values, ratio):
+    index = min(len(sorted_values) - 1, int(round(ratio * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模糊翻译记忆基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000], help="历史原文条数")
+    parser.add_argument("--queries", type=int, default=2000, help="查询次数（近似重复与新句各半）")
+    parser.add_argument("--threshold", type=float, default=0.9, help="相似度阈值")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        rng = random.Random(size)
+        vocabulary = make_vocabulary(rng)
+        memory = TranslationMemory(threshold=args.threshold, max_entries=size, filler_words=FILLERS)
+        stored = []
+        start = time.perf_counter()
+        for index in range(size):
+            text, (from_lang, to_lang) = make_sentence(rng, vocabulary)
+            memory.store(text, from_lang, to_lang, f"translation {index}")
+            stored.append((text, from_lang, to_lang))
+        build_s = time.perf_counter() - start
+
+        timings = []
+        near_hits = 0
+        unrelated_hits = 0
+        for query_index in range(args.queries):
+            if query_index % 2 == 0:
+                text, from_lang, to_lang = rng.choice(stored)
+                query = perturb(rng, text)
+            else:
+                query, (from_lang, to_lang) = make_sentence(rng, vocabulary)
+            start = time.perf_counter()
+            translation, _ = memory.lookup(query, from_lang, to_lang)
+            timings.append((time.perf_counter() - start) * 1000)
+            if translation is not None:
+                if query_index % 2 == 0:
+                    near_hits += 1
+                else:
+                    unrelated_hits += 1
+
+        timings.sort()
+        half = args.queries // 2
+        stats = memory.get_stats()
+        print(f"条目数={size} 写入耗时={build_s:.1f}s 阈值={args.threshold}")
+        print(f"  查询耗时(ms): p50={percentile(timings, 0.5):.3f} p95={percentile(timings, 0.95):.3f} "
+              f"p99={percentile(timings, 0.99):.3f} max={timings[-1]:.3f}")
+        print(f"  近似重复命中率={near_hits / half:.1%} 新句命中率={unrelated_hits / (args.queries - half):.1%} "
+              f"平均候选数={stats['candidates_avg']:.1f}")
+        print(f"  相似度直方图: {stats['similarity_histogram']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+WebSocket消息编码基准测试：对比原实现（json.dumps 默认转义非ASCII字符）与各编码选项
+每行字幕按服务端实际收发的消息计算：一条请求（解码）与对应的响应（编码）
+    - 每行字节数：编码后的原始大小，以及按 permessage-deflate（websockets 默认参数，跨消息共享上下文）压缩后的大小
+    - 每条消息的服务端CPU：请求解码 + 响应编码（+ 压缩），多次运行取最小值
+
+用法:
+    python benchmark/bench_wire_protocol.py
+    python benchmark/bench_wire_protocol.py --lines 20000 --two-phase
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import wire_protocol
+from wire_protocol import WireConnection, decode_message
+
+# 按示例字幕的词汇随机拼接，避免重复文本让压缩结果失真
+CN_WORDS = ["今天", "天气", "很好", "我们", "去", "公园", "散步", "人工智能", "正在", "改变", "生活方式",
+            "这是", "一个", "测试", "字幕", "会议", "现在", "开始", "请", "大家", "注意", "时间", "问题"]
+EN_WORDS = ["the", "weather", "is", "nice", "today", "we", "walk", "in", "park", "artificial", "intelligence",
+            "changing", "way", "live", "this", "a", "test", "subtitle", "meeting", "starts", "now", "please",
+            "everyone", "note", "time", "question"]
+
+
+def random_line(rng, words, joiner, low, high):
+    return joiner.join(rng.choice(words) for _ in range(rng.randint(low, high)))
+
+
+class NullWebSocket(object):
+    subprotocol = None
+
+    async def send(self, message, text=None):
+        pass
+
+
+def build_messages(count, two_phase, seed=0):
+    """构造 (请求, [响应...]) 列表，响应字段与 WebSocketHandler 一致；一半中译英，一半英译中"""
+    rng = random.Random(seed)
+    messages = []
+    now = int(time.time() * 1000)
+    for seq in range(count):
+        cn_line = random_line(rng, CN_WORDS, "", 4, 10)
+        en_line = random_line(rng, EN_WORDS, " ", 5, 12)
+        source, target = (cn_line, en_line) if seq % 2 == 0 else (en_line, cn_line)
+        request = {"text": source, "seq": seq, "y_position": 1000, "timeout": 6}
+        translated = {
+            "status": "success",
+            "message": "译文已推送" if two_phase else "字幕已更新",
+            "source_text": source,
+            "translated_text": target,
+            "translation_status": "success",
+            "result_source": "api",
+        }
+        if two_phase:
+            timestamps = {"received": now + seq, "displayed": now + seq + 1}
+            displayed = {"status": "success", "event": "displayed", "message": "原文已显示",
+                         "source_text": source, "text_id": seq + 1, "timestamps": timestamps, "seq": seq}
+            translated.update({"event": "translated", "text_id": seq + 1,
+                               "timestamps": dict(timestamps, translated=now + seq + 130)})
+            translated["seq"] = seq
+            messages.append((request, [displayed, translated]))
+        else:
+            translated["seq"] = seq
+            messages.append((request, [translated]))
+    return messages
+
+
+def legacy_variant():
+    """原实现：json.loads 解码，json.dumps 默认参数编码"""
+    return "原实现 json.dumps", json.loads, json.dumps, json.dumps
+
+
+def codec_variant(name, encoding, echo_text):
+    connection = WireConnection(NullWebSocket(), encoding=encoding, echo_text=echo_text)
+    if encoding == "msgpack":
+        def encode_request(obj):
+            return wire_protocol.msgpack.packb(obj, use_bin_type=True)
+    else:
+        # 文本帧到达服务端时为 str
+        def encode_request(obj):
+            return wire_protocol.encode_json(obj).decode("utf-8")
+    return name, decode_message, connection.encode, encode_request
+
+
+def run_variant(variant, messages, compress):
+    """返回 (每行响应字节, 每行压缩后字节, 每条消息CPU微秒)"""
+    name, decode, encode, encode_request = variant
+    requests = [encode_request(request) for request, _ in messages]
+    deflater = zlib.compressobj(wbits=-12, memLevel=5)
+
+    raw_bytes = 0
+    compressed_bytes = 0
+    message_count = 0
+    gc.disable()
+    start = time.process_time()
+    for payload, (_, responses) in zip(requests, messages):
+        decode(payload)
+        for response in responses:
+            frame = encode(response)
+            # 文本帧按UTF-8发送，原实现的 str 需要编码
+            data = frame.encode("utf-8") if isinstance(frame, str) else frame
+            raw_bytes += len(data)
+            if compress:
+                # permessage-deflate：同步刷新后去掉末尾的 00 00 ff ff
+                compressed_bytes += len(deflater.compress(data) + deflater.flush(zlib.Z_SYNC_FLUSH)) - 4
+            message_count += 1
+    elapsed = time.process_time() - start
+    gc.enable()
+    lines = len(messages)
+    return raw_bytes / lines, (compressed_bytes / lines if compress else None), elapsed / (lines + message_count) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket消息编码基准测试")
+    parser.add_argument("--lines", type=int, default=20000, help="字幕行数")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数，CPU取最小值")
+    parser.add_argument("--two-phase", action="store_true", help="两阶段显示（每行 displayed + translated 两条响应）")
+    args = parser.parse_args()
+
+    messages = build_messages(args.lines, args.two_phase)
+    orjson = wire_protocol.orjson
+    print(f"行数={args.lines} 两阶段显示={args.two_phase} orjson={'已安装' if orjson else '未安装'} "
+          f"msgpack={'已安装' if wire_protocol.msgpack else '未安装'}")
+    print(f"{'编码':<22} {'字节/行':>10} {'压缩后/行':>10} {'CPU/消息':>10} {'压缩CPU/消息':>12}")
+
+    # (变体, 是否使用 orjson)
+    variants = [
+        (legacy_variant(), False),
+        (codec_variant("json 标准库(不转义)", "json", True), False),
+        (codec_variant("json 标准库 无回显", "json", False), False),
+    ]
+    if orjson is not None:
+        variants.append((codec_variant("json orjson", "json", True), True))
+        variants.append((codec_variant("json orjson 无回显", "json", False), True))
+    if wire_protocol.msgpack is not None:
+        variants.append((codec_variant("msgpack", "msgpack", True), True))
+        variants.append((codec_variant("msgpack 无回显", "msgpack", False), True))
+
+    try:
+        for variant, use_orjson in variants:
+            wire_protocol.orjson = orjson if use_orjson else None
+            runs = [run_variant(variant, messages, False) for _ in range(args.repeat)]
+            compressed_runs = [run_variant(variant, messages, True) for _ in range(args.repeat)]
+            raw, cpu = runs[0][0], min(run[2] for run in runs)
+            compressed, cpu_compressed = compressed_runs[0][1], min(run[2] for run in compressed_runs)
+            print(f"{variant[0]:<22} {raw:>10.1f} {compressed:>10.1f} {cpu:>8.2f}us {cpu_compressed:>10.2f}us")
+    finally:
+        wire_protocol.orjson = orjson
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""
+本地模拟科大讯飞翻译服务（/v2/its）
+用于离线压测与基准测试，避免调用真实API
+
+- 按 get_result 的签名规则校验 Digest 与 HMAC-SHA256 签名
+- 可配置延迟分布（固定 / 均匀 / 对数正态，另可叠加慢请求长尾）
+- 可注入错误码（10013 / 10014 / 11200 等）与限流（11202 或 HTTP 429）
+- 模拟翻译结果确定且逐行对应，便于校验
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import math
+import os
+import random
+import re
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 模拟服务使用的默认凭据（基准测试时写入 XFYUN_CONFIG）
+FAKE_APP_ID = "fakeappid"
+FAKE_API_KEY = "fakeapikey"
+FAKE_SECRET = "fakesecret"
+
+_AUTH_FIELD = re.compile(r'(\w+)="([^"]*)"')
+
+
+def fake_translate(text, to_lang):
+    """确定性的模拟翻译结果（逐行翻译，保留换行）"""
+    return "\n".join(f"[{to_lang}] {line}" for line in text.split("\n"))
+
+
+def parse_latency_spec(spec):
+    """解析延迟分布描述，返回采样函数 sampler(rng) -> 秒
+
+    支持: "fixed:50"、"uniform:20,80"、"lognormal:100,0.5"（中位数毫秒, sigma）
+    """
+    if not spec:
+        return lambda rng: 0.0
+    if isinstance(spec, (int, float)):
+        return lambda rng: float(spec) / 1000.0
+    kind, _, args = str(spec).partition(":")
+    values = [float(value) for value in args.split(",") if value.strip()]
+    if kind == "fixed":
+        return lambda rng: values[0] / 1000.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000.0
+    if kind == "lognormal":
+        median, sigma = values[0], values[1] if len(values) > 1 else 0.5
+        return lambda rng: rng.lognormvariate(math.log(median), sigma) / 1000.0
+    raise ValueError(f"无法识别的延迟分布: {spec}")
+
+
+def generate_self_signed_cert(directory):
+    """使用openssl生成临时自签名证书"""
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+         "-keyout", key_path, "-out", cert_path, "-days", "1",
+         "-subj", "/CN=localhost"],
+        check=True, capture_output=True
+    )
+    return cert_path, key_path
+
+
+class FakeXfyunHandler(BaseHTTPRequestHandler):
+    """模拟 /v2/its 接口的请求处理器"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.count("connections")
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status_code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_code(self, code, message):
+        self.server.count(f"error_{code}")
+        self.send_json(200, {"code": int(code), "message": message, "sid": "fake"})
+
+    def verify_signature(self, raw_body):
+        """按科大讯飞规则校验签名，返回错误码（通过返回 None）"""
+        server = self.server
+        fields = dict(_AUTH_FIELD.findall(self.headers.get("Authorization", "")))
+        if fields.get("api_key") != server.api_key:
+            return "11200"
+
+        digest = "SHA-256=" + base64.b64encode(hashlib.sha256(raw_body).digest()).decode("utf-8")
+        if self.headers.get("Digest") != digest:
+            return "10014"
+
+        signature_str = "host: " + self.headers.get("Host", "") + "\n"
+        signature_str += "date: " + self.headers.get("Date", "") + "\n"
+        signature_str += "POST " + self.path + " HTTP/1.1\n"
+        signature_str += "digest: " + digest
+        expected = base64.b64encode(hmac.new(server.secret.encode("utf-8"),
+                                             signature_str.encode("utf-8"),
+                                             digestmod=hashlib.sha256).digest()).decode("utf-8")
+        if not hmac.compare_digest(fields.get("signature", ""), expected):
+            return "10014"
+        return None
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw_body = self.rfile.read(length)
+        server = self.server
+        server.count("requests")
+
+        if self.path != "/v2/its":
+            self.send_json(404, {"code": 404, "message": "not found"})
+            return
+
+        if server.throttled():
+            server.count("throttled")
+            if server.throttle_http:
+                self.send_json(429, {"code": 429, "message": "too many requests"})
+            else:
+                self.send_error_code("11202", "licc limit")
+            return
+
+        if server.verify_signature:
+            error_code = self.verify_signature(raw_body)
+            if error_code:
+                self.send_error_code(error_code, "signature check failed")
+                return
+
+        try:
+            payload = json.loads(raw_body.decode("utf-8"))
+            if payload["common"]["app_id"] != server.app_id:
+                self.send_error_code("10013", "invalid app_id")
+                return
+            text = base64.b64decode(payload["data"]["text"]).decode("utf-8")
+            from_lang = payload["business"].get("from")
+            to_lang = payload["business"]["to"]
+        except Exception as e:
+            self.send_json(400, {"code": 10163, "message": f"bad request: {e}"})
+            return
+
+        delay, injected_error = server.sample_behavior()
+        if delay:
+            time.sleep(delay)
+        if injected_error:
+            self.send_error_code(injected_error, "injected error")
+            return
+
+        server.count("translated")
+        self.send_json(200, {
+            "code": 0,
+            "message": "success",
+            "sid": "fake",
+            "data": {"result": {"from": from_lang, "to": to_lang,
+                                "trans_result": {"src": text, "dst": fake_translate(text, to_lang)}}}
+        })
+
+
+class FakeHTTPServer(ThreadingHTTPServer):
+    """加大监听队列，避免并发压测时连接被丢弃"""
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # 客户端撤销请求（过期字幕的翻译被取消）时连接被重置，只计数不打印
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            self.count("client_aborted")
+            return
+        super().handle_error(request, client_address)
+
+    def count(self, name):
+        with self.stats_lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def throttled(self):
+        """按秒统计请求数，超过 throttle_qps 时返回 True"""
+        if not self.throttle_qps:
+            return False
+        with self.stats_lock:
+            now = int(time.monotonic())
+            if now != self.qps_window:
+                self.qps_window = now
+                self.qps_count = 0
+            self.qps_count += 1
+            return self.qps_count > self.throttle_qps
+
+    def sample_behavior(self):
+        """采样本次请求的处理延迟与注入错误"""
+        with self.stats_lock:
+            delay = self.latency_sampler(self.rng)
+            if self.slow_rate and self.rng.random() < self.slow_rate:
+                delay += self.slow_ms / 1000.0
+            injected_error = None
+            if self.error_rate and self.rng.random() < self.error_rate:
+                injected_error = self.rng.choice(self.error_codes)
+        return delay, injected_error
+
+
+class FakeXfyunServer(object):
+    """在后台线程中运行的模拟翻译服务
+
+    Args:
+        latency_ms (float): 固定处理延迟（毫秒），与 latency 二选一
+        latency (str): 延迟分布，如 "uniform:50,150"、"lognormal:120,0.6"
+        slow_rate (float): 慢请求比例（模拟长尾）
+        slow_ms (float): 慢请求额外延迟（毫秒）
+        error_rate (float): 注入错误的比例
+        error_codes (list): 注入的错误码
+        throttle_qps (int): 每秒超过该请求数即返回限流错误，0 表示不限流
+        throttle_http (bool): 限流时返回 HTTP 429 而非错误码 11202
+        verify_signature (bool): 是否校验签名
+        seed (int): 随机种子，保证可复现
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, use_tls=True, latency_ms=0.0, latency=None,
+                 slow_rate=0.0, slow_ms=0.0, error_rate=0.0, error_codes=("10013", "10014", "11200"),
+                 throttle_qps=0, throttle_http=False, verify_signature=True,
+                 app_id=FAKE_APP_ID, api_key=FAKE_API_KEY, secret=FAKE_SECRET, seed=0):
+        self.use_tls = use_tls
+        self.httpd = FakeHTTPServer((host, port), FakeXfyunHandler)
+        httpd = self.httpd
+        httpd.latency_sampler = parse_latency_spec(latency if latency else latency_ms)
+        httpd.slow_rate = slow_rate
+        httpd.slow_ms = slow_ms
+        httpd.error_rate = error_rate
+        httpd.error_codes = [str(code) for code in error_codes] or ["10014"]
+        httpd.throttle_qps = throttle_qps
+        httpd.throttle_http = throttle_http
+        httpd.verify_signature = verify_signature
+        httpd.app_id = app_id
+        httpd.api_key = api_key
+        httpd.secret = secret
+        httpd.rng = random.Random(seed)
+        httpd.qps_window = 0
+        httpd.qps_count = 0
+        httpd.stats = {"connections": 0, "requests": 0}
+        httpd.stats_lock = threading.Lock()
+        self._cert_dir = None
+        self._thread = None
+
+        if use_tls:
+            self._cert_dir = tempfile.mkdtemp(prefix="fake_xfyun_")
+            cert_path, key_path = generate_self_signed_cert(self._cert_dir)
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(cert_path, key_path)
+            httpd.socket = context.wrap_socket(httpd.socket, server_side=True)
+
+    @property
+    def host(self):
+        """供 get_result 使用的 host（含端口）"""
+        address, port = self.httpd.server_address[:2]
+        return f"{address}:{port}"
+
+    @property
+    def scheme(self):
+        return "https" if self.use_tls else "http"
+
+    @property
+    def stats(self):
+        with self.httpd.stats_lock:
+            return dict(self.httpd.stats)
+
+    def apply_to_config(self, xfyun_config, http_config=None):
+        """将翻译模块指向本模拟服务（修改传入的配置字典）"""
+        xfyun_config.update({
+            "host": self.host,
+            "scheme": self.scheme,
+            "app_id": self.httpd.app_id,
+            "api_key": self.httpd.api_key,
+            "secret": self.httpd.secret,
+        })
+        if http_config is not None:
+            http_config["verify_ssl"] = False
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._cert_dir:
+            shutil.rmtree(self._cert_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地模拟科大讯飞翻译服务")
+    parser.add_argument("--port", type=int, default=8443, help="监听端口")
+    parser.add_argument("--latency", default="fixed:0", help="延迟分布，如 fixed:50 / uniform:20,80 / lognormal:120,0.6")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="慢请求比例")
+    parser.add_argument("--slow-ms", type=float, default=0.0, help="慢请求额外延迟(毫秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="注入错误比例")
+    parser.add_argument("--error-codes", nargs="+", default=["10013", "10014", "11200"], help="注入的错误码")
+    parser.add_argument("--throttle-qps", type=int, default=0, help="超过该QPS返回限流错误")
+    parser.add_argument("--throttle-http", action="store_true", help="限流时返回HTTP 429")
+    parser.add_argument("--no-tls", action="store_true", help="使用HTTP而非HTTPS")
+    parser.add_argument("--no-verify", action="store_true", help="不校验签名")
+    args = parser.parse_args()
+
+    server = FakeXfyunServer(port=args.port, use_tls=not args.no_tls, latency=args.latency,
+                             slow_rate=args.slow_rate, slow_ms=args.slow_ms,
+                             error_rate=args.error_rate, error_codes=args.error_codes,
+                             throttle_qps=args.throttle_qps, throttle_http=args.throttle_http,
+                             verify_signature=not args.no_verify)
+    print(f"模拟翻译服务已启动: {server.scheme}://{server.host}/v2/its")
+    print(f"凭据: app_id={FAKE_APP_ID} api_key={FAKE_API_KEY} secret={FAKE_SECRET}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
@@ -98,6 +98,7 @@ def build_executable():
         '--hidden-import=logging.handlers',
         '--hidden-import=configparser',
         '--hidden-import=requests',
+        '--hidden-import=aiohttp',
         '--hidden-import=ssl',
         # 排除不需要的模块以减小体积
         '--exclude-module=tkinter',
@@ -139,6 +140,18 @@ def build_executable():
                     if translations_src.exists():
                         shutil.copy2(translations_src, translations_dst)
                         print(f"📝 已复制翻译词典: {translations_dst}")
+                        
+                        # 预编译词典，exe启动时直接读取，省去解析与自动机构建
+                        compiled_dst = project_root / "build" / "dist" / "cache" / "translations.glossary"
+                        compile_result = subprocess.run(
+                            [sys.executable, str(Path(__file__).parent / "compile_glossary.py"),
+                             "--source", str(translations_dst), "--output", str(compiled_dst)],
+                            capture_output=True, text=True, encoding='utf-8'
+                        )
+                        if compile_result.returncode == 0:
+                            print(f"📚 已预编译翻译词典: {compiled_dst}")
+                        else:
+                            print(f"⚠️  预编译词典失败，程序启动时将解析文本: {compile_result.stdout.strip()}")
                     else:
                         print("⚠️  未找到translations.txt文件，将使用API翻译")
                         
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+词典预编译脚本
+将 translations.txt 编译为二进制词典缓存（含预检测的语言代码与匹配自动机）
+
+用法:
+    python build_script/compile_glossary.py
+    python build_script/compile_glossary.py --source translations.txt --output cache/translations.glossary
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def main():
+    from config import GLOSSARY_CONFIG
+
+    # 默认路径与程序运行时一致：相对路径按项目（exe）目录解析
+    parser = argparse.ArgumentParser(description="预编译本地翻译词典")
+    parser.add_argument("--source", default=str(PROJECT_ROOT / "translations.txt"), help="词典文本文件")
+    parser.add_argument("--output", default=str(PROJECT_ROOT / GLOSSARY_CONFIG.get("compiled_path")),
+                        help="预编译词典输出路径")
+    args = parser.parse_args()
+
+    if not Path(args.source).exists():
+        print(f"❌ 未找到词典文件: {args.source}")
+        return False
+
+    # 直接使用词典模块编译，不导入 trans（导入时会加载词典、打开翻译缓存并写入预编译文件）
+    from glossary import compile_glossary
+
+    start = time.perf_counter()
+    snapshot = compile_glossary(args.source, args.output)
+    elapsed = time.perf_counter() - start
+    print(f"✅ 已编译 {len(snapshot)} 条词典 -> {args.output} ({elapsed:.2f}s, "
+          f"{snapshot.matcher.node_count} 个节点)")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
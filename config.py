@@ -6,17 +6,76 @@
 # 科大讯飞API配置 (硬编码)
 XFYUN_CONFIG = {
     "host": "itrans.xfyun.cn",
+    "scheme": "https",  # 本地模拟服务（benchmark/fake_xfyun_server.py）可使用 http
     "app_id": "4eb9ed9f",
     "api_key": "81092656b8f469fbb60f1016247d03b1",
     "secret": "a2fae5fac1108c1327aac2444967ffb6"
 }
 
+# 翻译API HTTP客户端配置（长连接 + 连接池）
+HTTP_CONFIG = {
+    "pool_connections": 4,      # 连接池数量（按主机划分）
+    "pool_maxsize": 32,         # 单个主机最大保持连接数，应不小于并发翻译线程数
+    "connect_timeout": 3.0,     # 建立连接超时(秒)
+    "read_timeout": 10.0,       # 读取响应超时(秒)
+    "max_retries": 0,           # 连接失败自动重试次数
+    "verify_ssl": True,         # 是否校验HTTPS证书
+    "async_max_concurrency": 100,  # 异步翻译最大在途请求数（WebSocket服务使用）
+    "async_pool_maxsize": 100      # 异步客户端连接池大小
+}
+
+# 翻译API流控配置：令牌桶限制QPS + AIMD自适应并发
+RATE_LIMIT_CONFIG = {
+    "enabled": False,           # 是否启用客户端流控（启用后超出配额或排队超时的请求会使用词典兜底结果）
+    "qps": 20,                  # 每秒最多请求数（按服务商配额设置）
+    "burst": 20,                # 允许的瞬时突发请求数
+    "initial_concurrency": 8,   # 初始并发上限
+    "min_concurrency": 1,       # 最小并发上限
+    "max_concurrency": 64,      # 最大并发上限
+    "decrease_factor": 0.7,     # 触发限流或延迟升高时的并发乘性减小系数
+    "latency_tolerance": 2.0,   # 延迟超过基线多少倍视为过载
+    "max_queue_wait_ms": 3000,  # 最长排队时间(毫秒)，超时拒绝并使用兜底结果
+    "throttle_codes": ["11201", "11202", "11203", "http_429"]  # 视为限流的错误码
+}
+
+# 长尾延迟治理配置：对冲请求 + 熔断
+RESILIENCE_CONFIG = {
+    "hedging_enabled": False,       # 是否启用对冲请求（对冲会重复发送计费请求）
+    "hedge_percentile": 0.95,       # 请求耗时超过该分位延迟时发起对冲请求
+    "hedge_min_samples": 20,        # 延迟样本不足时不对冲
+    "hedge_min_delay_ms": 100,      # 对冲等待下限(毫秒)
+    "hedge_max_delay_ms": 3000,     # 对冲等待上限(毫秒)
+    "hedge_max_ratio": 0.1,         # 对冲请求占总请求的最大比例
+    "breaker_enabled": False,       # 是否启用熔断（熔断期间直接使用词典兜底结果）
+    "breaker_failure_threshold": 5, # 连续失败多少次后熔断
+    "breaker_recovery_ms": 10000    # 熔断后多久放行试探请求(毫秒)
+}
+
+# 微批处理配置：时间窗口内同一翻译方向的多行合并为一次API请求
+BATCH_CONFIG = {
+    "enabled": False,           # 是否启用微批处理（突发流量时减少请求数）
+    "window_ms": 30,            # 批处理时间窗口(毫秒)，即每行最多附加的排队延迟
+    "max_batch_size": 16,       # 单批最大行数
+    "max_batch_chars": 2000,    # 单批最大字符数
+    "max_inflight_batches": 8   # 同时在途的批请求数
+}
+
 # 翻译配置
 TRANSLATION_CONFIG = {
     "from_lang": "cn",
     "to_lang": "en"
 }
 
+# 长文本语种检测配置：均匀抽取若干窗口统计，结论在统计上确定后提前结束
+LANGUAGE_DETECTION_CONFIG = {
+    "sampling_enabled": True,   # 长文本抽样检测；关闭时始终完整扫描
+    "full_scan_chars": 2048,    # 不超过该长度的文本直接完整扫描
+    "window_chars": 64,         # 每个抽样窗口的字符数
+    "min_windows": 8,           # 至少抽取多少个窗口才做判定
+    "max_sample_chars": 4096,   # 抽样字符数上限，仍无法判定（结论接近阈值）时完整扫描
+    "confidence": 0.999         # 提前结束所需的置信度
+}
+
 # 显示默认配置
 DISPLAY_CONFIG = {
     "default_y_position": 1000,
@@ -32,4 +91,63 @@ DISPLAY_CONFIG = {
 NETWORK_CONFIG = {
     "websocket_port": 4321,
     "websocket_host": "0.0.0.0"
-} 
\ No newline at end of file
+}
+
+# WebSocket消息编码配置（客户端可通过子协议 subtitle.json / subtitle.msgpack 或配置消息按连接调整）
+WIRE_CONFIG = {
+    "encoding": "json",    # 默认响应编码：json（文本帧）或 msgpack（二进制帧，需安装 msgpack）
+    "echo_text": True,     # 响应是否回显客户端发送的原文（source_text），关闭可减少流量
+    "compression": True    # 是否允许 permessage-deflate 压缩（客户端支持时生效），关闭可节省CPU
+}
+
+# 单个WebSocket连接的消息流水线配置（客户端可发送 {"type": "config", ...} 按连接调整）
+PIPELINE_CONFIG = {
+    "max_inflight": 4,          # 每个连接同时处理的消息数
+    "max_inflight_limit": 32,   # 客户端可设置的并发上限
+    "order": "ordered",         # ordered: 严格按接收顺序显示；latest: 最新消息优先，过期结果不显示
+    "display": "after_translation",  # after_translation: 译文完成后一并显示；two_phase: 先显示原文，译文稍后填入
+    "provisional": False,            # two_phase 下先显示词典临时译文（整句命中或短语内联替换），API译文返回后替换
+    "provisional_min_coverage": 0.3  # 词典短语至少覆盖原文的比例才显示临时译文
+}
+
+# 字幕订阅配置（显示端发送 {"type": "subscribe"} 后接收服务端显示的每条字幕）
+SUBSCRIBER_CONFIG = {
+    "queue_size": 32,           # 每个订阅者的发送队列长度，满时丢弃最旧的字幕事件
+    "queue_size_limit": 1024,   # 订阅者可设置的队列长度上限
+    "max_subscribers": 64       # 订阅者数量上限
+}
+
+# 翻译结果缓存配置（内存LRU + 磁盘追加日志）
+CACHE_CONFIG = {
+    "enabled": True,
+    "memory_max_entries": 2000,          # 内存层最大条目数
+    "disk_max_entries": 100000,          # 磁盘层最大条目数
+    "ttl_seconds": 7 * 24 * 3600,        # 过期时间(秒)，0 表示永不过期
+    "persist_path": "cache/translation_cache.jsonl"  # 磁盘缓存文件（相对路径按exe/脚本目录解析），留空则仅使用内存
+}
+
+# 本地词典（translations.txt）热更新配置
+GLOSSARY_CONFIG = {
+    "watch_enabled": True,      # 监听词典文件变化并增量重新加载
+    "watch_interval_ms": 1000,  # 轮询文件修改时间的间隔(毫秒)
+    "compiled_enabled": True,   # 启动时优先加载预编译词典，文本较新时自动重新编译
+    "compiled_path": "cache/translations.glossary"  # 预编译词典缓存文件（启动时一次性读入，相对路径按exe/脚本目录解析）
+}
+
+# 模糊翻译记忆配置（语音识别对同一句话的输出常只差标点、语气词或个别字）
+# 相似原文直接复用历史译文；改动一个字可能改变句意，因此默认关闭
+TRANSLATION_MEMORY_CONFIG = {
+    "enabled": False,
+    "threshold": 0.9,           # 相似度阈值（1 - 编辑距离 / 较长文本长度）
+    "min_chars": 6,             # 规范化后短于该长度的句子只做精确匹配
+    "max_entries": 100000,      # 最多保存的历史原文条数
+    "filler_words": ["um", "uh", "erm", "嗯", "呃"]  # 比较时忽略的语气词
+}
+
+# 流式字幕配置（ASR部分结果，消息携带 segment_id / is_final）
+STREAMING_CONFIG = {
+    "debounce_ms": 300,         # 部分结果静默多久后翻译(毫秒)
+    "max_wait_ms": 1000,        # 持续更新时最长等待(毫秒)，保证长句也能及时显示译文
+    "min_change_chars": 4,      # 至少变化多少字符（忽略空白与标点）才重新翻译
+    "max_segments": 32          # 单个连接同时跟踪的最大片段数
+}
@@ -0,0 +1,517 @@
+# -*- coding: utf-8 -*-
+"""
+流量控制模块 - 保护翻译API配额，避免突发流量触发限流
+TokenBucket: 令牌桶，限制每秒请求数（QPS）
+AdaptiveConcurrencyLimiter: AIMD自适应并发控制，遇到限流或延迟升高时乘性减小并发，健康时加性增大
+FlowController: 组合二者，统一提供同步/异步的获取与释放接口
+LatencyTracker / HedgingPolicy / CircuitBreaker: 对冲请求与熔断，降低长尾延迟
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# 请求结果分类
+OUTCOME_SUCCESS = "success"
+OUTCOME_THROTTLED = "throttled"
+OUTCOME_ERROR = "error"
+
+
+class RateLimitExceeded(Exception):
+    """排队等待超时，请求被拒绝"""
+
+
+class TokenBucket(object):
+    """线程安全的令牌桶
+
+    Args:
+        rate (float): 每秒补充的令牌数（即长期QPS上限）
+        burst (int): 桶容量（允许的瞬时突发请求数）
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = max(0.001, float(rate))
+        self.capacity = max(1.0, float(burst if burst is not None else rate))
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait=None):
+        """预约一个令牌，返回需要等待的秒数；等待超过 max_wait 时不预约并返回 None"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if max_wait is not None and wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+
+def _resolve_waiter(future):
+    if not future.done():
+        future.set_result(True)
+
+
+class AdaptiveConcurrencyLimiter(object):
+    """AIMD自适应并发控制
+
+    成功且延迟正常时每个完整窗口并发上限 +increase_step；
+    遇到限流或近期延迟中位数超过基线（窗口中位数） latency_tolerance 倍时乘以 decrease_factor（每个冷却期最多一次）
+
+    Args:
+        initial_limit (int): 初始并发上限
+        min_limit (int): 最小并发上限
+        max_limit (int): 最大并发上限
+        increase_step (float): 每个窗口的加性增量
+        decrease_factor (float): 乘性减小系数
+        latency_tolerance (float): 延迟超过基线多少倍视为过载
+        latency_window (int): 计算基线延迟的样本数
+    """
+
+    def __init__(self, initial_limit=8, min_limit=1, max_limit=64, increase_step=1.0,
+                 decrease_factor=0.7, latency_tolerance=2.0, latency_window=100):
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = float(min(max(int(initial_limit), self.min_limit), self.max_limit))
+        self.increase_step = float(increase_step)
+        self.decrease_factor = min(max(float(decrease_factor), 0.1), 0.95)
+        self.latency_tolerance = max(1.0, float(latency_tolerance))
+        self._latencies = deque(maxlen=max(10, int(latency_window)))
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self._async_waiters = deque()  # 异步等待者 (事件循环, future)，按先后顺序交接名额
+        self._last_decrease_at = 0.0
+        self._stats = {"increases": 0, "decreases": 0, "throttled": 0, "errors": 0}
+
+    def _baseline_latency(self):
+        """长期基线：窗口内延迟中位数"""
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[len(ordered) // 2]
+
+    def _recent_latency(self, count=10):
+        """短期延迟：最近若干个样本的中位数，避免单个慢请求误判为过载"""
+        recent = sorted(list(self._latencies)[-count:])
+        return recent[len(recent) // 2]
+
+    def try_acquire(self):
+        with self._cond:
+            if self._in_flight < int(self.limit):
+                self._in_flight += 1
+                return True
+            return False
+
+    def acquire(self, timeout=None):
+        """同步获取一个并发名额，超时返回 False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._waiting += 1
+            try:
+                while self._in_flight >= int(self.limit):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                self._in_flight += 1
+                return True
+            finally:
+                self._waiting -= 1
+
+    async def acquire_async(self, timeout=None):
+        """异步获取一个并发名额（不阻塞事件循环），超时返回 False
+
+        异步等待者按先后顺序排队，名额释放时直接交接给队首等待者并唤醒其事件循环
+        """
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if not self._async_waiters and self._in_flight < int(self.limit):
+                self._in_flight += 1
+                return True
+            waiter = (loop, loop.create_future())
+            self._async_waiters.append(waiter)
+            self._waiting += 1
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+            return True
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._cond:
+                try:
+                    self._async_waiters.remove(waiter)
+                    granted = False
+                except ValueError:
+                    # 名额已交接给本等待者，放弃时归还
+                    granted = True
+            if granted:
+                self.cancel()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return False
+        finally:
+            with self._cond:
+                self._waiting -= 1
+
+    def _wake_async_waiters(self):
+        """把空闲名额按顺序交接给异步等待者（调用方持有锁）"""
+        while self._async_waiters and self._in_flight < int(self.limit):
+            loop, future = self._async_waiters.popleft()
+            self._in_flight += 1
+            try:
+                loop.call_soon_threadsafe(_resolve_waiter, future)
+            except RuntimeError:
+                # 等待者的事件循环已关闭
+                self._in_flight -= 1
+
+    def cancel(self):
+        """归还未使用的名额，不影响并发上限"""
+        with self._cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._wake_async_waiters()
+            self._cond.notify()
+
+    def release(self, latency, outcome):
+        """释放名额并根据结果调整并发上限
+
+        Args:
+            latency (float): 请求耗时（秒）
+            outcome (str): success / throttled / error
+        """
+        with self._cond:
+            # 仅在并发名额接近用满时才增大上限，避免空闲时上限无限膨胀
+            saturated = self._in_flight >= self.limit * 0.75
+            self._in_flight = max(0, self._in_flight - 1)
+            now = time.monotonic()
+            if outcome == OUTCOME_SUCCESS:
+                self._latencies.append(latency)
+            baseline = self._baseline_latency()
+            overloaded = outcome == OUTCOME_THROTTLED or (
+                outcome == OUTCOME_SUCCESS and len(self._latencies) >= 20
+                and self._recent_latency() > baseline * self.latency_tolerance
+            )
+
+            if outcome == OUTCOME_THROTTLED:
+                self._stats["throttled"] += 1
+            elif outcome != OUTCOME_SUCCESS:
+                self._stats["errors"] += 1
+
+            if overloaded:
+                # 冷却期内只减小一次，避免同一波失败把并发压到最低
+                cooldown = max(baseline or 0.0, 0.1)
+                if now - self._last_decrease_at >= cooldown:
+                    old_limit = self.limit
+                    self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+                    self._last_decrease_at = now
+                    self._stats["decreases"] += 1
+                    logger.warning(
+                        f"翻译API{'触发限流' if outcome == OUTCOME_THROTTLED else '延迟升高'}，"
+                        f"并发上限 {old_limit:.1f} -> {self.limit:.1f}"
+                    )
+            elif outcome == OUTCOME_SUCCESS and saturated and self.limit < self.max_limit:
+                # 每个成功请求增加 step/limit，相当于每个完整窗口增加 step
+                self.limit = min(float(self.max_limit), self.limit + self.increase_step / self.limit)
+                self._stats["increases"] += 1
+
+            self._wake_async_waiters()
+            self._cond.notify_all()
+
+    def get_stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                "limit": round(self.limit, 2),
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+                "baseline_latency_ms": (self._baseline_latency() or 0.0) * 1000,
+            })
+        return stats
+
+
+class FlowController(object):
+    """组合令牌桶与自适应并发控制
+
+    Args:
+        bucket (TokenBucket): 令牌桶，None 表示不限QPS
+        limiter (AdaptiveConcurrencyLimiter): 并发控制，None 表示不限并发
+        max_queue_wait (float): 最长排队时间（秒），超过后拒绝请求
+    """
+
+    def __init__(self, bucket=None, limiter=None, max_queue_wait=3.0):
+        self.bucket = bucket
+        self.limiter = limiter
+        self.max_queue_wait = max_queue_wait
+        self._lock = threading.Lock()
+        self._stats = {
+            "admitted": 0,
+            "rejected": 0,
+            "queue_depth": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+        }
+
+    def _enter_queue(self):
+        with self._lock:
+            self._stats["queue_depth"] += 1
+        return time.monotonic()
+
+    def _leave_queue(self, queued_at, admitted):
+        wait_ms = (time.monotonic() - queued_at) * 1000
+        with self._lock:
+            self._stats["queue_depth"] -= 1
+            if admitted:
+                self._stats["admitted"] += 1
+                self._stats["wait_ms_total"] += wait_ms
+                self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], wait_ms)
+            else:
+                self._stats["rejected"] += 1
+        return wait_ms
+
+    def _remaining(self, queued_at):
+        if self.max_queue_wait is None:
+            return None
+        return max(0.0, self.max_queue_wait - (time.monotonic() - queued_at))
+
+    def acquire(self):
+        """同步获取请求许可，返回许可凭据（传给 release）；排队超时抛出 RateLimitExceeded"""
+        queued_at = self._enter_queue()
+        admitted = False
+        acquired = False
+        rejected = False
+        try:
+            if self.limiter is not None:
+                acquired = self.limiter.acquire(self._remaining(queued_at))
+                if not acquired:
+                    rejected = True
+                    return self._reject(queued_at)
+            if self.bucket is not None:
+                wait = self.bucket.reserve(self._remaining(queued_at))
+                if wait is None:
+                    rejected = True
+                    return self._reject(queued_at)
+                if wait > 0:
+                    time.sleep(wait)
+            admitted = True
+            return time.monotonic()
+        finally:
+            if acquired and not admitted:
+                self.limiter.cancel()
+            if admitted:
+                self._leave_queue(queued_at, True)
+            elif not rejected:
+                # 排队期间被取消
+                with self._lock:
+                    self._stats["queue_depth"] -= 1
+
+    async def acquire_async(self):
+        """异步获取请求许可，返回许可凭据（传给 release）；排队超时抛出 RateLimitExceeded"""
+        queued_at = self._enter_queue()
+        admitted = False
+        acquired = False
+        rejected = False
+        try:
+            if self.limiter is not None:
+                acquired = await self.limiter.acquire_async(self._remaining(queued_at))
+                if not acquired:
+                    rejected = True
+                    return self._reject(queued_at)
+            if self.bucket is not None:
+                wait = self.bucket.reserve(self._remaining(queued_at))
+                if wait is None:
+                    rejected = True
+                    return self._reject(queued_at)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            admitted = True
+            return time.monotonic()
+        finally:
+            if acquired and not admitted:
+                self.limiter.cancel()
+            if admitted:
+                self._leave_queue(queued_at, True)
+            elif not rejected:
+                # 排队期间被取消
+                with self._lock:
+                    self._stats["queue_depth"] -= 1
+
+    def _reject(self, queued_at):
+        wait_ms = self._leave_queue(queued_at, False)
+        raise RateLimitExceeded(f"翻译请求排队 {wait_ms:.0f}ms 后被拒绝")
+
+    def release(self, permit, outcome):
+        """请求结束后释放许可并反馈结果"""
+        if permit is None or self.limiter is None:
+            return
+        self.limiter.release(time.monotonic() - permit, outcome)
+
+    def abandon(self, permit):
+        """请求被调用方撤销（对冲落败或字幕已过期）：归还许可，不作为失败反馈"""
+        if permit is None or self.limiter is None:
+            return
+        self.limiter.cancel()
+
+    def get_stats(self):
+        """获取流控统计：排队深度、等待时间、拒绝数、当前并发上限等"""
+        with self._lock:
+            stats = dict(self._stats)
+        admitted = stats["admitted"]
+        stats["wait_ms_avg"] = stats["wait_ms_total"] / admitted if admitted else 0.0
+        if self.limiter is not None:
+            stats["concurrency"] = self.limiter.get_stats()
+        if self.bucket is not None:
+            stats["qps_limit"] = self.bucket.rate
+        return stats
+
+
+class LatencyTracker(object):
+    """滑动窗口延迟统计，用于计算对冲请求的触发阈值（如p95）"""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=max(10, int(window)))
+        self._lock = threading.Lock()
+
+    def record(self, latency):
+        with self._lock:
+            self._samples.append(latency)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, fraction):
+        """返回分位数（秒），无样本时返回 None"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+        return samples[index]
+
+
+class CircuitBreaker(object):
+    """熔断器：连续失败达到阈值后熔断，直接走兜底；冷却期后放行一个试探请求
+
+    状态: closed（正常）-> open（熔断）-> half_open（试探）-> closed / open
+
+    Args:
+        failure_threshold (int): 连续失败多少次后熔断
+        recovery_timeout (float): 熔断后多久允许试探（秒）
+    """
+
+    STATE_CLOSED = "closed"
+    STATE_OPEN = "open"
+    STATE_HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, recovery_timeout=10.0):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.recovery_timeout = max(0.0, float(recovery_timeout))
+        self.state = self.STATE_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self._stats = {"opened": 0, "short_circuited": 0}
+
+    def allow_request(self):
+        """是否允许发起请求；熔断期间返回 False"""
+        with self._lock:
+            if self.state == self.STATE_CLOSED:
+                return True
+            if self.state == self.STATE_OPEN and \
+                    time.monotonic() - self._opened_at >= self.recovery_timeout:
+                self.state = self.STATE_HALF_OPEN
+                self._trial_in_flight = False
+                logger.info("翻译API熔断器进入试探状态")
+            if self.state == self.STATE_HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self._stats["short_circuited"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.STATE_CLOSED:
+                logger.info("翻译API恢复正常，熔断器关闭")
+            self.state = self.STATE_CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.STATE_HALF_OPEN or \
+                    (self.state == self.STATE_CLOSED and self._failures >= self.failure_threshold):
+                self.state = self.STATE_OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+                self._stats["opened"] += 1
+                logger.warning(
+                    f"翻译API连续失败 {self._failures} 次，熔断 {self.recovery_timeout:.0f} 秒，期间使用本地兜底"
+                )
+
+    def record_cancelled(self):
+        """试探请求被取消（如对冲落败），允许下一个请求继续试探"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["state"] = self.state
+            stats["consecutive_failures"] = self._failures
+        return stats
+
+
+class HedgingPolicy(object):
+    """对冲请求策略：请求耗时超过观测到的分位延迟时，再发一个相同请求，取先返回者
+
+    Args:
+        percentile (float): 触发对冲的延迟分位（如 0.95）
+        min_samples (int): 样本数不足时不对冲
+        min_delay (float): 对冲等待下限（秒）
+        max_delay (float): 对冲等待上限（秒）
+        max_ratio (float): 对冲请求占总请求的最大比例，防止放大流量
+    """
+
+    def __init__(self, percentile=0.95, min_samples=20, min_delay=0.1, max_delay=3.0, max_ratio=0.1):
+        self.percentile = min(max(float(percentile), 0.5), 0.999)
+        self.min_samples = max(1, int(min_samples))
+        self.min_delay = max(0.0, float(min_delay))
+        self.max_delay = max(self.min_delay, float(max_delay))
+        self.max_ratio = max(0.0, float(max_ratio))
+        self.latencies = LatencyTracker()
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "hedges_fired": 0, "hedges_won": 0}
+
+    def hedge_delay(self):
+        """返回本次请求的对冲等待时间（秒），不需要对冲时返回 None"""
+        with self._lock:
+            self._stats["requests"] += 1
+        if len(self.latencies) < self.min_samples:
+            return None
+        delay = self.latencies.percentile(self.percentile)
+        return min(max(delay, self.min_delay), self.max_delay)
+
+    def try_fire(self):
+        """登记一次对冲请求，超过比例上限时返回 False"""
+        with self._lock:
+            if self._stats["hedges_fired"] + 1 > self.max_ratio * self._stats["requests"]:
+                return False
+            self._stats["hedges_fired"] += 1
+            return True
+
+    def record_win(self):
+        with self._lock:
+            self._stats["hedges_won"] += 1
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        threshold = self.latencies.percentile(self.percentile)
+        stats["hedge_threshold_ms"] = threshold * 1000 if threshold is not None else None
+        return stats
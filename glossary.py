@@ -0,0 +1,654 @@
+# -*- coding: utf-8 -*-
+"""
+本地词典匹配模块 - Aho-Corasick 多模式自动机
+词典加载时一次性构建，查询时单次扫描文本即可找出全部命中
+自动机以扁平数组（CSR）存储，便于序列化和跨线程只读共享
+词典以不可变快照发布，热更新时整体替换，读者无需加锁
+快照可预编译为二进制缓存文件，启动时一次性读入，省去逐行解析、语言检测与自动机构建
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from types import MappingProxyType
+
+from language_detector import detect_language_batch, normalize_language_code
+
+logger = logging.getLogger(__name__)
+
+
+def fold_case(text):
+    """大小写折叠，保证折叠前后字符下标一一对应"""
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    # 少数字符小写后长度变化（如 'İ'），逐字符处理以保持下标对齐
+    return ''.join(ch if len(ch.lower()) != 1 else ch.lower() for ch in text)
+
+
+class GlossaryMatcher(object):
+    """大小写不敏感的 Aho-Corasick 多模式匹配器
+
+    Args:
+        entries (iterable): 词典条目，每个条目为包含 "pattern" 键的字典
+    """
+
+    def __init__(self, entries=()):
+        self.entries = []
+        self.pattern_lengths = array('l')
+        self._build(entries)
+
+    def _build(self, entries):
+        # 1) 构建字典树，节点子表为 {码点: 子节点}
+        children = [{}]
+        node_pattern = [-1]
+        for entry in entries:
+            pattern = entry.get("pattern") if entry else None
+            if not pattern:
+                continue
+            node = 0
+            for ch in fold_case(pattern):
+                code = ord(ch)
+                child = children[node].get(code)
+                if child is None:
+                    child = len(children)
+                    children[node][code] = child
+                    children.append({})
+                    node_pattern.append(-1)
+                node = child
+            # 折叠后相同的模式只保留第一个，与逐条正则的稳定排序结果一致
+            if node_pattern[node] < 0:
+                node_pattern[node] = len(self.entries)
+                self.entries.append(entry)
+                self.pattern_lengths.append(len(pattern))
+
+        # 2) 广度优先计算失败指针与输出链接
+        node_count = len(children)
+        fail = [0] * node_count
+        out_link = [-1] * node_count
+        queue = deque(children[0].values())
+        while queue:
+            node = queue.popleft()
+            for code, child in children[node].items():
+                state = fail[node]
+                while state and code not in children[state]:
+                    state = fail[state]
+                target = children[state].get(code, 0)
+                fail[child] = target if target != child else 0
+                suffix = fail[child]
+                out_link[child] = suffix if node_pattern[suffix] >= 0 else out_link[suffix]
+                queue.append(child)
+
+        # 3) 展平为CSR数组：edge_offsets[n]..edge_offsets[n+1] 为节点n的有序出边
+        edge_offsets = array('l', [0])
+        edge_codes = array('l')
+        edge_targets = array('l')
+        for table in children:
+            for code in sorted(table):
+                edge_codes.append(code)
+                edge_targets.append(table[code])
+            edge_offsets.append(len(edge_codes))
+
+        self.edge_offsets = edge_offsets
+        self.edge_codes = edge_codes
+        self.edge_targets = edge_targets
+        self.fail = array('l', fail)
+        self.node_pattern = array('l', node_pattern)
+        self.out_link = array('l', out_link)
+
+    @classmethod
+    def from_arrays(cls, entries, arrays):
+        """由预编译的数组直接构造匹配器"""
+        matcher = cls.__new__(cls)
+        matcher.entries = list(entries)
+        for name in cls.ARRAY_NAMES:
+            setattr(matcher, name, arrays[name])
+        return matcher
+
+    # 序列化时保存的自动机数组
+    ARRAY_NAMES = ("pattern_lengths", "edge_offsets", "edge_codes", "edge_targets",
+                   "fail", "node_pattern", "out_link")
+
+    def __len__(self):
+        return len(self.entries)
+
+    def rebind(self, entries):
+        """模式集合不变时（仅译文或语言变化），复用自动机并绑定新的词典条目
+
+        Returns:
+            GlossaryMatcher: 共享自动机数组的新匹配器；模式集合不同时返回 None
+        """
+        by_pattern = {}
+        for entry in entries:
+            pattern = entry.get("pattern") if entry else None
+            if pattern:
+                by_pattern.setdefault(fold_case(pattern), entry)
+        if len(by_pattern) != len(self.entries):
+            return None
+        rebound = []
+        for entry in self.entries:
+            new_entry = by_pattern.get(fold_case(entry["pattern"]))
+            if new_entry is None or len(new_entry["pattern"]) != len(entry["pattern"]):
+                return None
+            rebound.append(new_entry)
+
+        matcher = GlossaryMatcher.__new__(GlossaryMatcher)
+        matcher.__dict__.update(self.__dict__)
+        matcher.entries = rebound
+        return matcher
+
+    @property
+    def node_count(self):
+        return len(self.fail)
+
+    def iter_occurrences(self, text):
+        """单次扫描，按结束位置依次产出 (start, end, pattern_index)，包含重叠命中"""
+        if not self.entries or not text:
+            return
+        edge_offsets = self.edge_offsets
+        edge_codes = self.edge_codes
+        edge_targets = self.edge_targets
+        fail = self.fail
+        node_pattern = self.node_pattern
+        out_link = self.out_link
+        pattern_lengths = self.pattern_lengths
+
+        node = 0
+        for index, ch in enumerate(fold_case(text)):
+            code = ord(ch)
+            while True:
+                lo = edge_offsets[node]
+                hi = edge_offsets[node + 1]
+                if lo < hi:
+                    pos = bisect_left(edge_codes, code, lo, hi)
+                    if pos < hi and edge_codes[pos] == code:
+                        node = edge_targets[pos]
+                        break
+                if node == 0:
+                    break
+                node = fail[node]
+
+            output = node if node_pattern[node] >= 0 else out_link[node]
+            while output >= 0:
+                pattern_index = node_pattern[output]
+                end = index + 1
+                yield end - pattern_lengths[pattern_index], end, pattern_index
+                output = out_link[output]
+
+    def find_matches(self, text, accept=None):
+        """查找全部命中，返回按 (起点升序, 长度降序) 排列的 (start, end, entry) 列表
+
+        与逐条 re.finditer 的语义一致：同一词条的命中互不重叠；
+        不同词条之间的重叠由调用方按最左最长原则取舍。
+
+        Args:
+            text (str): 待匹配文本
+            accept (callable, optional): 条目过滤函数，返回 False 的条目被忽略
+        """
+        matches = []
+        last_end = {}
+        entries = self.entries
+        for start, end, pattern_index in self.iter_occurrences(text):
+            if start < last_end.get(pattern_index, 0):
+                continue
+            entry = entries[pattern_index]
+            if accept is not None and not accept(entry):
+                continue
+            last_end[pattern_index] = end
+            matches.append((start, end, entry))
+        matches.sort(key=lambda item: (item[0], item[0] - item[1]))
+        return matches
+
+
+class CanonicalCasing(object):
+    """译文词形校准：将已应用词条的译文合并为一个大小写不敏感的正则，单次 sub 恢复标准写法
+
+    合并正则按词条组合缓存（同一组术语在字幕中会反复出现），避免每行重复编译；
+    长词优先排列，重叠时取最左最长，"Deep Learning" 不会被其中的 "learning" 覆盖
+
+    Args:
+        max_patterns (int): 缓存的合并正则数量上限
+    """
+
+    def __init__(self, max_patterns=512):
+        self.max_patterns = max(1, int(max_patterns))
+        self._patterns = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "compiled": 0}
+
+    @staticmethod
+    def _compile(replacements):
+        # 折叠后相同的译文以后出现者为准，与逐条替换的结果一致
+        by_folded = {}
+        for term in replacements:
+            if term:
+                by_folded[fold_case(term)] = term
+        if not by_folded:
+            return None
+        canonical = tuple(sorted(by_folded.values(), key=lambda term: (-len(term), term)))
+        # 每个词条一个捕获组，命中后按组号取标准写法
+        regex = re.compile('|'.join(f'({re.escape(term)})' for term in canonical), re.IGNORECASE)
+        return regex, canonical
+
+    def restore(self, text, replacements):
+        """将 text 中与 replacements 大小写不同的词条恢复为标准写法"""
+        if not text:
+            return text
+        key = tuple(replacements)
+        with self._lock:
+            compiled = self._patterns.get(key)
+            if compiled is not None:
+                self._patterns.move_to_end(key)
+                self._stats["hits"] += 1
+        if compiled is None:
+            compiled = self._compile(key)
+            with self._lock:
+                self._patterns[key] = compiled
+                self._stats["compiled"] += 1
+                while len(self._patterns) > self.max_patterns:
+                    self._patterns.popitem(last=False)
+        if compiled is None:
+            return text
+        regex, canonical = compiled
+        return regex.sub(lambda match: canonical[match.lastindex - 1], text)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached_patterns"] = len(self._patterns)
+        return stats
+
+
+# 按翻译方向预先分区的词典索引
+PARTITION_DIRECTIONS = (("cn", "en"), ("en", "cn"))
+
+
+def entry_matches_direction(entry, from_lang, to_lang):
+    """词条是否适用于该翻译方向；语言未知的词条适用于所有方向"""
+    if entry.get("replacement") is None:
+        return False
+    source_lang = entry.get("source_lang")
+    target_lang = entry.get("target_lang")
+    if from_lang and source_lang and source_lang != from_lang:
+        return False
+    if to_lang and target_lang and target_lang != to_lang:
+        return False
+    return True
+
+
+def partition_name(direction):
+    return f"{direction[0]}>{direction[1]}"
+
+
+class GlossarySnapshot(object):
+    """不可变的词典快照：条目字典与匹配器一起发布，读者取一次引用即可得到一致视图
+
+    除全量匹配器外，按 PARTITION_DIRECTIONS 为每个翻译方向构建只含适用词条的分区匹配器，
+    查询时只扫描对应分区，无需逐条过滤语言
+
+    Args:
+        entries (dict): 小写键 -> 词典条目
+        matcher (GlossaryMatcher): 由 entries 构建的全量匹配器
+        partitions (dict): (from_lang, to_lang) -> 分区匹配器，缺失的方向自动构建
+        path (str): 来源文件路径
+        signature (tuple): 来源文件的 (mtime_ns, size)，用于判断文件是否变化
+        version (int): 快照版本号，每次发布递增
+    """
+
+    __slots__ = ("entries", "matcher", "partitions", "path", "signature", "version")
+
+    def __init__(self, entries=None, matcher=None, partitions=None, path=None, signature=None, version=0):
+        self.entries = MappingProxyType(dict(entries or {}))
+        self.matcher = matcher if matcher is not None else GlossaryMatcher(self.entries.values())
+        partitions = dict(partitions or {})
+        for direction in PARTITION_DIRECTIONS:
+            if direction not in partitions:
+                partitions[direction] = GlossaryMatcher(self.partition_entries(direction))
+        self.partitions = MappingProxyType(partitions)
+        self.path = path
+        self.signature = signature
+        self.version = version
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        return self.entries.get(key, default)
+
+    def partition_entries(self, direction):
+        """按全量条目顺序返回适用于该方向的词条"""
+        from_lang, to_lang = direction
+        return [entry for entry in self.entries.values() if entry_matches_direction(entry, from_lang, to_lang)]
+
+    def partition_for(self, from_lang, to_lang):
+        """返回该方向的分区匹配器，未分区的方向返回 None"""
+        return self.partitions.get((from_lang, to_lang))
+
+    def partition_sizes(self):
+        return {partition_name(direction): len(matcher) for direction, matcher in self.partitions.items()}
+
+
+def parse_translation_lines(lines):
+    """解析词典文本，返回 ([(key, value), ...], 跳过行数)"""
+    pairs = []
+    skipped_lines = 0
+    for line_number, line in enumerate(lines, start=1):
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if "，" in stripped:
+            key, value = [part.strip() for part in stripped.split("，", 1)]
+        elif "," in stripped:
+            key, value = [part.strip() for part in stripped.split(",", 1)]
+        else:
+            skipped_lines += 1
+            logger.warning(f"翻译文件格式不正确（第{line_number}行）: {stripped}")
+            continue
+        if not key or not value:
+            skipped_lines += 1
+            logger.warning(f"翻译文件缺少键或值（第{line_number}行）: {stripped}")
+            continue
+        pairs.append((key, value))
+    return pairs, skipped_lines
+
+
+def build_glossary_snapshot(file_path, signature, lines, previous):
+    """
+    根据词典文本构建新快照，与上一快照对比增量更新
+
+    未变化的词条直接复用（不再检测语言）；模式集合不变时复用匹配自动机
+
+    Returns:
+        tuple: (GlossarySnapshot, 变更统计 dict)
+    """
+    pairs, skipped_lines = parse_translation_lines(lines)
+    old_entries = previous.entries
+    entries = {}
+    pending = []
+    for key, value in pairs:
+        key_lower = key.lower()
+        old_entry = old_entries.get(key_lower)
+        if old_entry is not None and old_entry["pattern"] == key and old_entry["replacement"] == value:
+            entries[key_lower] = old_entry
+            continue
+        entry = {"pattern": key, "replacement": value}
+        entries[key_lower] = entry
+        pending.append(entry)
+
+    # 新增或修改的词条批量检测语言
+    languages = detect_language_batch(
+        [entry["pattern"] for entry in pending] + [entry["replacement"] for entry in pending]
+    )
+    for entry, source_lang, target_lang in zip(pending, languages, languages[len(pending):]):
+        entry["source_lang"] = normalize_language_code(source_lang)
+        entry["target_lang"] = normalize_language_code(target_lang)
+
+    added = sum(1 for key in entries if key not in old_entries)
+    removed = sum(1 for key in old_entries if key not in entries)
+    changed = sum(1 for key, entry in entries.items()
+                  if key in old_entries and old_entries[key] is not entry)
+
+    unchanged = not (added or removed or changed)
+    matcher, matcher_rebuilt = derive_glossary_matcher(previous.matcher, list(entries.values()), unchanged)
+
+    # 各方向分区独立判断：只改动一个方向的词条时，其他方向的分区直接复用
+    partitions = {}
+    rebuilt_partitions = []
+    for direction, previous_partition in previous.partitions.items():
+        partition_entries = [
+            entry for entry in entries.values() if entry_matches_direction(entry, *direction)
+        ]
+        same_entries = len(partition_entries) == len(previous_partition.entries) and all(
+            entry is old_entry for entry, old_entry in zip(partition_entries, previous_partition.entries)
+        )
+        partition, rebuilt = derive_glossary_matcher(previous_partition, partition_entries, same_entries)
+        partitions[direction] = partition
+        if rebuilt:
+            rebuilt_partitions.append(partition_name(direction))
+
+    snapshot = GlossarySnapshot(entries, matcher, partitions, path=file_path, signature=signature,
+                                version=previous.version + 1)
+    changes = {
+        "added": added,
+        "removed": removed,
+        "changed": changed,
+        "unchanged": len(entries) - added - changed,
+        "skipped_lines": skipped_lines,
+        "matcher_rebuilt": matcher_rebuilt,
+        "rebuilt_partitions": rebuilt_partitions,
+    }
+    return snapshot, changes
+
+
+def derive_glossary_matcher(previous_matcher, entries, unchanged):
+    """词条未变时沿用旧匹配器；模式集合不变时复用自动机；否则重建。返回 (匹配器, 是否重建)"""
+    if unchanged:
+        return previous_matcher, False
+    matcher = previous_matcher.rebind(entries)
+    if matcher is not None:
+        return matcher, False
+    return GlossaryMatcher(entries), True
+
+
+# 预编译词典文件格式：
+#   8字节魔数 | 头部(格式版本, 源文件mtime_ns, 源文件大小, 元数据长度) | 元数据JSON | 8字节对齐 | int32小端数组
+# 解析规则或语言检测逻辑变化时需递增 COMPILED_FORMAT_VERSION，使旧文件自动失效
+COMPILED_MAGIC = b"SUBGLOSS"
+COMPILED_FORMAT_VERSION = 2
+_COMPILED_HEADER = struct.Struct("<IqqI")
+
+
+def content_digest(data):
+    """源文件内容摘要，修改时间变化但内容相同时（如复制文件）仍可复用预编译结果"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(path):
+    with open(path, "rb") as f:
+        return content_digest(f.read())
+
+
+def write_compiled_glossary(output_path, snapshot, source_digest=None):
+    """将词典快照写入预编译文件（先写临时文件再替换，读者不会看到写了一半的文件）"""
+    entry_list = list(snapshot.entries.values())
+    entry_index = {id(entry): index for index, entry in enumerate(entry_list)}
+    signature = snapshot.signature or (0, 0)
+
+    named_matchers = [("all", snapshot.matcher)]
+    named_matchers += [(partition_name(direction), matcher) for direction, matcher in snapshot.partitions.items()]
+    offset = 0
+    matchers = {}
+    blobs = []
+    for matcher_name, matcher in named_matchers:
+        layout = {}
+        for name in GlossaryMatcher.ARRAY_NAMES:
+            values = array('i', getattr(matcher, name))
+            if sys.byteorder != "little":
+                values.byteswap()
+            layout[name] = [offset, len(values)]
+            blobs.append(values.tobytes())
+            offset += len(blobs[-1])
+        matchers[matcher_name] = {
+            "entries": [entry_index[id(entry)] for entry in matcher.entries],
+            "arrays": layout,
+        }
+
+    meta = json.dumps({
+        "source_path": snapshot.path,
+        "source_digest": source_digest,
+        "entries": [
+            [entry["pattern"], entry["replacement"], entry.get("source_lang"), entry.get("target_lang")]
+            for entry in entry_list
+        ],
+        "matchers": matchers,
+    }, ensure_ascii=False).encode("utf-8")
+
+    head = COMPILED_MAGIC + _COMPILED_HEADER.pack(COMPILED_FORMAT_VERSION, signature[0], signature[1], len(meta))
+    padding = b"\0" * (-(len(head) + len(meta)) % 8)
+
+    directory = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=".glossary_", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(head)
+            f.write(meta)
+            f.write(padding)
+            for blob in blobs:
+                f.write(blob)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def read_compiled_glossary(path, source_path, source_signature, version=0):
+    """
+    读取预编译词典（二进制缓存）
+
+    源文件的 (mtime_ns, size) 与记录一致时直接使用；不一致时比较内容摘要，
+    内容也不同（源文件已修改）则返回 None，由调用方重新编译。
+    读取时完整解析词条元数据（JSON）并把自动机数组复制到内存，随后关闭映射；
+    快照不引用文件页面，也不按需加载。Windows 上存在映射的文件无法被 os.replace 替换，
+    保持映射会使热更新时无法重写预编译文件
+
+    Returns:
+        GlossarySnapshot: 加载成功返回快照，文件不存在、版本不符或已过期返回 None
+    """
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        return _read_compiled_mapping(mapped, path, source_path, source_signature, version)
+    finally:
+        mapped.close()
+
+
+def _read_compiled_mapping(mapped, path, source_path, source_signature, version):
+    head_size = len(COMPILED_MAGIC) + _COMPILED_HEADER.size
+    if len(mapped) < head_size or mapped[:len(COMPILED_MAGIC)] != COMPILED_MAGIC:
+        logger.warning(f"预编译词典格式无效: {path}")
+        return None
+    format_version, mtime_ns, size, meta_length = _COMPILED_HEADER.unpack_from(mapped, len(COMPILED_MAGIC))
+    if format_version != COMPILED_FORMAT_VERSION:
+        logger.info(f"预编译词典版本不符（{format_version} != {COMPILED_FORMAT_VERSION}），需要重新编译")
+        return None
+
+    meta = json.loads(mapped[head_size:head_size + meta_length].decode("utf-8"))
+    if (mtime_ns, size) != tuple(source_signature or ()):
+        if source_signature is None or size != source_signature[1] or \
+                meta.get("source_digest") != file_digest(source_path):
+            logger.info(f"翻译文件已修改，预编译词典过期: {path}")
+            return None
+
+    base = head_size + meta_length
+    base += -base % 8
+    entry_list = [
+        {"pattern": pattern, "replacement": replacement, "source_lang": source_lang, "target_lang": target_lang}
+        for pattern, replacement, source_lang, target_lang in meta["entries"]
+    ]
+    matchers = {}
+    for matcher_name, layout in meta["matchers"].items():
+        arrays = {}
+        for name, (offset, count) in layout["arrays"].items():
+            values = array('i')
+            values.frombytes(mapped[base + offset:base + offset + count * 4])
+            if sys.byteorder != "little":
+                values.byteswap()
+            arrays[name] = values
+        matchers[matcher_name] = GlossaryMatcher.from_arrays(
+            [entry_list[index] for index in layout["entries"]], arrays
+        )
+
+    entries = {entry["pattern"].lower(): entry for entry in entry_list}
+    # 分区方向变化后缺失的分区由 GlossarySnapshot 自动构建
+    partitions = {
+        direction: matchers[partition_name(direction)]
+        for direction in PARTITION_DIRECTIONS if partition_name(direction) in matchers
+    }
+    return GlossarySnapshot(entries, matchers["all"], partitions, path=source_path,
+                            signature=source_signature, version=version)
+
+
+def compile_glossary(source_path, output_path):
+    """离线编译：将词典文本编译为预编译词典文件，返回快照"""
+    with open(source_path, "rb") as f:
+        raw = f.read()
+    snapshot, _ = build_glossary_snapshot(
+        source_path, file_signature(source_path), raw.decode("utf-8").splitlines(), GlossarySnapshot()
+    )
+    write_compiled_glossary(output_path, snapshot, content_digest(raw))
+    return snapshot
+
+
+def file_signature(path):
+    """返回文件的 (mtime_ns, size)，文件不存在时返回 None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class GlossaryWatcher(object):
+    """轮询词典文件变化的后台线程（不依赖第三方文件监听库）
+
+    Args:
+        resolve_path (callable): 返回当前应监听的文件路径（可能为 None）
+        on_change (callable): 文件变化时调用 on_change()
+        interval_ms (float): 轮询间隔（毫秒）
+    """
+
+    def __init__(self, resolve_path, on_change, interval_ms=1000):
+        self.resolve_path = resolve_path
+        self.on_change = on_change
+        self.interval = max(0.05, float(interval_ms) / 1000.0)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._last = None
+
+    def _current(self):
+        path = self.resolve_path()
+        return path, file_signature(path) if path else None
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        # 首次轮询总是通知一次，由 on_change 自行判断文件是否已加载过
+        self._last = None
+        self._thread = threading.Thread(target=self._run, name="glossary-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                current = self._current()
+                if current == self._last:
+                    continue
+                self._last = current
+                self.on_change()
+            except Exception as e:
+                logger.error(f"词典文件监听出错: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -4,21 +4,32 @@
 当前支持中英文检测，未来可扩展多语种
 """
 
-import re
-from config import TRANSLATION_CONFIG
+import math
+from statistics import NormalDist
+from config import TRANSLATION_CONFIG, LANGUAGE_DETECTION_CONFIG
+try:
+    import numpy as np
+except ImportError:  # 打包版本不包含numpy，批量接口退回逐行检测
+    np = None
 
-# 支持的语种和对应的Unicode范围
+# 支持的语种和对应的Unicode码位范围（闭区间）
+LANGUAGE_RANGES = {
+    'cn': ((0x4e00, 0x9fff),),                    # 中文 (CJK统一汉字)
+    'en': ((0x0041, 0x005a), (0x0061, 0x007a)),   # 英文 (基本拉丁字母)
+    'ja': ((0x3040, 0x309f), (0x30a0, 0x30ff)),   # 日文 (平假名+片假名，不包括汉字避免与中文混淆)
+    'ko': ((0xac00, 0xd7af),),                    # 韩文 (韩文音节)
+    'ru': ((0x0400, 0x04ff),),                    # 俄文 (西里尔字母)
+    'ar': ((0x0600, 0x06ff),),                    # 阿拉伯文
+    'th': ((0x0e00, 0x0e7f),),                    # 泰文
+    'el': ((0x0370, 0x03ff),),                    # 希腊文
+    'he': ((0x0590, 0x05ff),),                    # 希伯来文
+    'hi': ((0x0900, 0x097f),),                    # 印地文 (天城文)
+}
+
+# 与码位范围等价的正则字符类，保留给按正则匹配的调用方
 LANGUAGE_PATTERNS = {
-    'cn': r'[\u4e00-\u9fff]',                    # 中文 (CJK统一汉字)
-    'en': r'[a-zA-Z]',                           # 英文 (基本拉丁字母)
-    'ja': r'[\u3040-\u309f\u30a0-\u30ff]',      # 日文 (平假名+片假名，不包括汉字避免与中文混淆)
-    'ko': r'[\uac00-\ud7af]',                    # 韩文 (韩文音节)
-    'ru': r'[\u0400-\u04ff]',                    # 俄文 (西里尔字母)
-    'ar': r'[\u0600-\u06ff]',                    # 阿拉伯文
-    'th': r'[\u0e00-\u0e7f]',                    # 泰文
-    'el': r'[\u0370-\u03ff]',                    # 希腊文
-    'he': r'[\u0590-\u05ff]',                    # 希伯来文
-    'hi': r'[\u0900-\u097f]',                    # 印地文 (天城文)
+    lang_code: '[' + ''.join(f'\\u{start:04x}-\\u{end:04x}' for start, end in ranges) + ']'
+    for lang_code, ranges in LANGUAGE_RANGES.items()
 }
 
 # 语种名称映射
@@ -35,6 +46,52 @@ LANGUAGE_NAMES = {
     'hi': '印地文'
 }
 
+# 码位表标记：非单词字符、其他单词字符，以及各语种依 LANGUAGE_RANGES 顺序的标记
+_NON_WORD_TAG = '0'
+_OTHER_WORD_TAG = '1'
+_LANGUAGE_CODES = tuple(LANGUAGE_RANGES)
+_LANGUAGE_TAGS = tuple(chr(ord('A') + index) for index in range(len(_LANGUAGE_CODES)))
+
+
+def _build_script_table():
+    """构建基本多文种平面的码位表：第 N 个字符即码位 N 的标记，供 str.translate 单次遍历使用
+
+    单词字符与正则 \\w 一致（str.isalnum() 或下划线），语种字符只在属于单词字符时才计入
+    """
+    table = [_OTHER_WORD_TAG if (chr(cp).isalnum() or cp == 0x5f) else _NON_WORD_TAG
+             for cp in range(0x10000)]
+    for tag, ranges in zip(_LANGUAGE_TAGS, LANGUAGE_RANGES.values()):
+        for start, end in ranges:
+            for cp in range(start, end + 1):
+                if table[cp] == _OTHER_WORD_TAG:
+                    table[cp] = tag
+    return ''.join(table)
+
+
+_SCRIPT_TABLE = _build_script_table()
+
+
+def _count_scripts(text):
+    """单次遍历统计各语种字符数
+
+    Returns:
+        tuple: (按 LANGUAGE_RANGES 顺序的各语种字符数列表, 去除空格和标点后的字符数)
+    """
+    tagged = text.translate(_SCRIPT_TABLE)
+    present = set(tagged)
+    non_word = tagged.count(_NON_WORD_TAG) if _NON_WORD_TAG in present else 0
+    if not tagged.isascii():
+        # 基本多文种平面以外的字符不在码位表中，translate 原样保留，逐个判断是否为单词字符
+        non_word += sum(1 for ch in tagged if ch > '\uffff' and not (ch.isalnum() or ch == '_'))
+    counts = [tagged.count(tag) if tag in present else 0 for tag in _LANGUAGE_TAGS]
+    return counts, len(text) - non_word
+
+
+def _min_threshold(lang_code):
+    """语种判定的最低比例阈值，避免误判"""
+    return 0.3 if lang_code == 'cn' else 0.5  # 中文阈值稍低，因为可能包含英文
+
+
 def detect_language(text):
     """
     检测文本语种 - 支持多语种检测
@@ -48,20 +105,19 @@ def detect_language(text):
     if not text or not text.strip():
         return 'unknown'
     
-    # 移除空格和标点符号进行检测
-    clean_text = re.sub(r'[^\w]', '', text)
-    
-    if not clean_text:
+    # 单次遍历码位表，统计去除空格和标点后的各语种字符数
+    counts, text_length = _count_scripts(text)
+    return _pick_language(counts, text_length)
+
+def _pick_language(counts, text_length):
+    """根据各语种字符数选出达到阈值且比例最高的语种"""
+    if not text_length:
         return 'unknown'
     
     # 计算各语种字符的比例
     language_ratios = {}
-    text_length = len(clean_text)
-    
-    for lang_code, pattern in LANGUAGE_PATTERNS.items():
-        chars = re.findall(pattern, clean_text)
-        ratio = len(chars) / text_length if text_length > 0 else 0
-        language_ratios[lang_code] = ratio
+    for lang_code, count in zip(_LANGUAGE_CODES, counts):
+        language_ratios[lang_code] = count / text_length
     
     # 找出比例最高的语种
     max_ratio = 0
@@ -70,13 +126,126 @@ def detect_language(text):
     for lang_code, ratio in language_ratios.items():
         if ratio > max_ratio:
             # 设置最低阈值，避免误判
-            min_threshold = 0.3 if lang_code == 'cn' else 0.5  # 中文阈值稍低，因为可能包含英文
-            if ratio >= min_threshold:
+            if ratio >= _min_threshold(lang_code):
                 max_ratio = ratio
                 detected_language = lang_code
     
     return detected_language
 
+# 抽样检测时每抽取多少个窗口判定一次结论
+_MARGIN_CHECK_EVERY = 4
+
+def _window_order(window_count):
+    """按位反转顺序（van der Corput 序列）遍历窗口下标，任意前若干个窗口都大致均匀地分布在全文"""
+    bits = max(1, (window_count - 1).bit_length())
+    for index in range(1 << bits):
+        window = int(format(index, f'0{bits}b')[::-1], 2)
+        if window < window_count:
+            yield window
+
+def _sampled_margin(sums, text_length, window_count):
+    """
+    根据已抽样窗口的统计量判断结论，返回 (语种代码, 结论的最小标准分)
+    
+    各语种比例按整群抽样的比率估计计算标准误（以二项分布标准误为下限）；
+    标准分是结论最接近被推翻的那一项：领先语种高出自身阈值、高出其他可能达标语种的幅度，
+    或未知语种时各语种低于阈值的幅度，均以标准误为单位
+    """
+    counts = [count for count, _, _ in sums[0]]
+    sum_ww = sums[1]
+    mean_words = text_length / window_count
+    ratios = []
+    errors = []
+    for count, sum_cc, sum_cw in sums[0]:
+        ratio = count / text_length
+        residual = max(0.0, sum_cc - 2 * ratio * sum_cw + ratio * ratio * sum_ww)
+        cluster_error = math.sqrt(residual / (window_count * (window_count - 1))) / mean_words
+        smoothed = (count + 0.5) / (text_length + 1)
+        binomial_error = math.sqrt(smoothed * (1 - smoothed) / text_length)
+        ratios.append(ratio)
+        errors.append(max(cluster_error, binomial_error))
+    
+    language = _pick_language(counts, text_length)
+    thresholds = [_min_threshold(lang_code) for lang_code in _LANGUAGE_CODES]
+    if language == 'unknown':
+        return language, min((threshold - ratio) / error
+                             for ratio, error, threshold in zip(ratios, errors, thresholds))
+    
+    leader = _LANGUAGE_CODES.index(language)
+    margin = (ratios[leader] - thresholds[leader]) / errors[leader]
+    for index, (ratio, error, threshold) in enumerate(zip(ratios, errors, thresholds)):
+        if index == leader:
+            continue
+        # 其他语种只要确定低于自身阈值，或确定低于领先语种，都无法改变结论
+        below_threshold = (threshold - ratio) / error
+        # 各语种比例此消彼长并不独立，差值的标准误取两者之和（任意相关性下的上界）
+        below_leader = (ratios[leader] - ratio) / (errors[leader] + error)
+        margin = min(margin, max(below_threshold, below_leader))
+    return language, margin
+
+def detect_language_with_confidence(text, full_scan_chars=None, window_chars=None, min_windows=None,
+                                    max_sample_chars=None, confidence=None):
+    """
+    检测文本语种并给出置信度，适用于长段落与整段转写文本
+    
+    短文本直接完整扫描；长文本按位反转顺序均匀抽取窗口统计，结论在统计上确定（达到 confidence）后
+    提前结束，耗时与文本长度基本无关；抽样达到上限仍无法判定（结论接近阈值）时退回完整扫描。
+    参数默认取 LANGUAGE_DETECTION_CONFIG
+    
+    Args:
+        text (str): 要检测的文本
+        full_scan_chars (int): 不超过该长度的文本直接完整扫描
+        window_chars (int): 每个抽样窗口的字符数
+        min_windows (int): 至少抽取多少个窗口才做判定
+        max_sample_chars (int): 抽样字符数上限
+        confidence (float): 提前结束所需的置信度
+        
+    Returns:
+        tuple: (语种代码, 置信度)，完整扫描的结果置信度为 1.0
+    """
+    config = LANGUAGE_DETECTION_CONFIG
+    full_scan_chars = config.get("full_scan_chars", 1024) if full_scan_chars is None else full_scan_chars
+    if not config.get("sampling_enabled", True) or not text or len(text) <= full_scan_chars:
+        return detect_language(text), 1.0
+    
+    window_chars = max(1, int(config.get("window_chars", 64) if window_chars is None else window_chars))
+    min_windows = max(2, int(config.get("min_windows", 8) if min_windows is None else min_windows))
+    max_sample_chars = config.get("max_sample_chars", 4096) if max_sample_chars is None else max_sample_chars
+    confidence = config.get("confidence", 0.999) if confidence is None else confidence
+    
+    window_count = -(-len(text) // window_chars)
+    max_windows = max(min_windows, int(max_sample_chars) // window_chars)
+    # 抽样过程中会多次判定，按判定次数分摊允许的误判概率（Bonferroni 校正），避免反复检验抬高误判率
+    checks = max(1, (max_windows - min_windows) // _MARGIN_CHECK_EVERY + 1)
+    error_budget = max(1 - confidence, 1e-12) / checks
+    required_margin = NormalDist().inv_cdf(1 - min(error_budget, 0.5))
+    # 每个语种累计 (字符数, 字符数平方和, 字符数与单词字符数乘积和)，以及单词字符数的平方和
+    language_sums = [[0, 0, 0] for _ in _LANGUAGE_CODES]
+    sum_ww = 0
+    text_length = 0
+    sampled = 0
+    for window in _window_order(window_count):
+        counts, words = _count_scripts(text[window * window_chars:(window + 1) * window_chars])
+        sampled += 1
+        text_length += words
+        sum_ww += words * words
+        for sums, count in zip(language_sums, counts):
+            sums[0] += count
+            sums[1] += count * count
+            sums[2] += count * words
+        if sampled >= max_windows:
+            break
+        # 达到最少窗口数后每隔若干窗口判定一次，判定本身的开销不随抽样量增长
+        if sampled >= min_windows and sampled % _MARGIN_CHECK_EVERY == 0 and text_length:
+            language, margin = _sampled_margin((language_sums, sum_ww), text_length, sampled)
+            if margin >= required_margin:
+                return language, 1 - (1 - NormalDist().cdf(margin)) * checks
+    
+    if sampled == window_count:
+        # 抽样已覆盖全文，结论即为完整扫描的结论
+        return _pick_language([sums[0] for sums in language_sums], text_length), 1.0
+    return detect_language(text), 1.0
+
 def get_translation_direction(text):
     """
     根据输入文本自动确定翻译方向
@@ -89,8 +258,15 @@ def get_translation_direction(text):
                source_text_position: 'top' 或 'bottom' 表示源文本显示位置
                target_text_position: 'top' 或 'bottom' 表示译文显示位置
     """
-    detected_lang = detect_language(text)
+    return get_direction_for_language(detect_language(text))
+
+def get_direction_for_language(detected_lang):
+    """
+    根据已检测的语种确定翻译方向，返回值同 get_translation_direction
     
+    Args:
+        detected_lang (str): detect_language 的检测结果
+    """
     if detected_lang == 'cn':
         # 中文翻译为英文：中文在上，英文在下
         return 'cn', 'en', 'top', 'bottom'
@@ -131,7 +307,17 @@ def get_display_layout(text):
             "to_lang": "en"
         }
     """
-    from_lang, to_lang, source_pos, target_pos = get_translation_direction(text)
+    return build_display_layout(text, detect_language(text))
+
+def build_display_layout(text, detected_lang):
+    """
+    根据已检测的语种构建字幕显示布局，返回值同 get_display_layout
+    
+    Args:
+        text (str): 输入文本
+        detected_lang (str): detect_language 的检测结果
+    """
+    from_lang, to_lang, source_pos, target_pos = get_direction_for_language(detected_lang)
     
     return {
         "source_text": text,
@@ -182,6 +368,13 @@ TRANSLATION_DIRECTIONS = {
 ```
 """
 
+def normalize_language_code(lang_code):
+    """限制语言代码到已支持范围"""
+    if not lang_code:
+        return None
+    lang_code = lang_code.lower()
+    return lang_code if lang_code in ('cn', 'en') else None
+
 def get_language_name(lang_code):
     """获取语种的中文名称"""
     return LANGUAGE_NAMES.get(lang_code, f'未知语种({lang_code})')
@@ -191,17 +384,17 @@ def analyze_text_composition(text):
     if not text or not text.strip():
         return {}
     
-    clean_text = re.sub(r'[^\w]', '', text)
-    if not clean_text:
+    counts, text_length = _count_scripts(text)
+    return _build_composition(counts, text_length)
+
+def _build_composition(counts, text_length):
+    """由各语种字符数构建语种组成字典"""
+    if not text_length:
         return {}
     
     composition = {}
-    text_length = len(clean_text)
-    
-    for lang_code, pattern in LANGUAGE_PATTERNS.items():
-        chars = re.findall(pattern, clean_text)
-        count = len(chars)
-        ratio = count / text_length if text_length > 0 else 0
+    for lang_code, count in zip(_LANGUAGE_CODES, counts):
+        ratio = count / text_length
         if count > 0:
             composition[lang_code] = {
                 'count': count,
@@ -211,6 +404,108 @@ def analyze_text_composition(text):
     
     return composition
 
+# 批量检测时每块最多包含的字符数，限制中间数组的内存占用
+BATCH_CHUNK_CHARS = 1 << 22
+
+_batch_code_table = None
+
+
+def _get_batch_code_table():
+    """将码位表转换为 numpy 数组：0 为非单词字符，1 为其他单词字符，2 起依次为各语种"""
+    global _batch_code_table
+    if _batch_code_table is None:
+        raw = np.frombuffer(_SCRIPT_TABLE.encode('ascii'), dtype=np.uint8)
+        _batch_code_table = np.where(raw >= ord('A'), raw - ord('A') + 2, raw - ord('0')).astype(np.intp)
+    return _batch_code_table
+
+
+def _iter_chunks(texts):
+    """按字符数将文本列表切分为若干块"""
+    chunk = []
+    chunk_chars = 0
+    for text in texts:
+        text = text or ''
+        chunk.append(text)
+        chunk_chars += len(text)
+        if chunk_chars >= BATCH_CHUNK_CHARS:
+            yield chunk
+            chunk = []
+            chunk_chars = 0
+    if chunk:
+        yield chunk
+
+
+def _count_scripts_chunk(chunk):
+    """向量化统计一块文本中每行的各类字符数
+
+    Returns:
+        tuple: (形状为 [行数, 语种数] 的各语种字符数, 每行去除空格和标点后的字符数)
+    """
+    table = _get_batch_code_table()
+    width = len(_LANGUAGE_CODES) + 2
+    lengths = np.fromiter(map(len, chunk), dtype=np.intp, count=len(chunk))
+    joined = ''.join(chunk)
+    # UTF-32 每个字符恰好一个码位，下标与字符串下标一一对应
+    codepoints = np.frombuffer(joined.encode('utf-32-le', 'surrogatepass'), dtype='<u4')
+    codes = table[np.minimum(codepoints, 0xffff)]
+    # 基本多文种平面以外的字符不在码位表中，逐个判断是否为单词字符
+    for index in np.flatnonzero(codepoints > 0xffff).tolist():
+        ch = joined[index]
+        codes[index] = 1 if (ch.isalnum() or ch == '_') else 0
+    line_ids = np.repeat(np.arange(len(chunk), dtype=np.intp), lengths)
+    counts = np.bincount(line_ids * width + codes, minlength=len(chunk) * width).reshape(len(chunk), width)
+    return counts[:, 2:], lengths - counts[:, 0]
+
+
+def detect_language_batch(texts):
+    """
+    批量检测文本语种，结果与逐条调用 detect_language 完全一致
+    安装了 numpy 时将整批文本转换为码位数组向量化统计，否则逐条检测
+    
+    Args:
+        texts (iterable): 文本列表
+        
+    Returns:
+        list: 与输入一一对应的语种代码
+    """
+    if np is None:
+        return [detect_language(text) for text in texts]
+    
+    thresholds = np.array([_min_threshold(lang_code) for lang_code in _LANGUAGE_CODES])
+    names = np.array(_LANGUAGE_CODES + ('unknown',), dtype=object)
+    results = []
+    for chunk in _iter_chunks(texts):
+        counts, text_lengths = _count_scripts_chunk(chunk)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = counts / text_lengths[:, None]
+        # 达到阈值的语种中比例最高者胜出，比例相同时取靠前的语种（与逐条检测的遍历顺序一致）
+        eligible = (ratios >= thresholds) & (text_lengths[:, None] > 0)
+        best = np.where(eligible, ratios, -1.0).argmax(axis=1)
+        best[~eligible.any(axis=1)] = len(_LANGUAGE_CODES)
+        results.extend(names[best].tolist())
+    return results
+
+
+def analyze_text_composition_batch(texts):
+    """
+    批量分析文本的语种组成，结果与逐条调用 analyze_text_composition 完全一致
+    
+    Args:
+        texts (iterable): 文本列表
+        
+    Returns:
+        list: 与输入一一对应的语种组成字典
+    """
+    if np is None:
+        return [analyze_text_composition(text) for text in texts]
+    
+    results = []
+    for chunk in _iter_chunks(texts):
+        counts, text_lengths = _count_scripts_chunk(chunk)
+        for row, text_length in zip(counts.tolist(), text_lengths.tolist()):
+            results.append(_build_composition(row, text_length))
+    return results
+
 if __name__ == "__main__":
     # 基本测试
     test_texts = [
@@ -12,16 +12,27 @@ import threading
 import logging
 import traceback
 import os
+import itertools
+import time
 from datetime import datetime
 from PyQt5.QtCore import QTimer, Qt, pyqtSignal, QThread, QObject
 from PyQt5.QtWidgets import (QApplication, QLabel, QWidget, QVBoxLayout, 
                            QSystemTrayIcon, QMenu, QAction, QMessageBox)
 from PyQt5.QtGui import QFont, QIcon
 import websockets
-import json
 
-from config import DISPLAY_CONFIG, NETWORK_CONFIG
-from trans import translate_text
+from config import (DISPLAY_CONFIG, NETWORK_CONFIG, STREAMING_CONFIG, GLOSSARY_CONFIG, PIPELINE_CONFIG,
+                    WIRE_CONFIG, SUBSCRIBER_CONFIG)
+from trans import (translate_text, translate_text_async, translate_text_with_origin_async,
+                   analyze_message, start_glossary_watcher,
+                   build_provisional_translation, get_translation_memory_stats, get_cancellation_stats,
+                   get_coalescing_stats, get_translation_cache_stats, get_batching_stats,
+                   RESULT_GLOSSARY)
+from streaming_translation import StreamingTranslator
+from message_pipeline import MessagePipeline, ORDER_MODES
+from subscriber_hub import SubscriberHub
+from wire_protocol import (WireConnection, MessageDecodeError, decode_message, available_subprotocols,
+                           check_encoding)
 from language_detector import get_display_layout
 
 # 配置日志 - 按天生成日志文件
@@ -38,22 +49,45 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 显示模式：after_translation 译文完成后一并显示；two_phase 先显示原文，译文完成后填入
+DISPLAY_MODES = ("after_translation", "two_phase")
+
+# 推送给订阅者的字幕样式字段
+STYLE_FIELDS = ("y_position", "top_color", "bottom_color", "timeout", "height")
+
+
+def timestamp_ms():
+    """当前时间戳（毫秒），用于两阶段显示响应中的时间记录"""
+    return int(time.time() * 1000)
+
 class TranslatorThread(QThread):
     """翻译线程，异步处理翻译任务"""
     result_ready = pyqtSignal(str, int)  # 翻译结果和文本ID
     finished_signal = pyqtSignal(QThread)  # 线程完成信号
     error_signal = pyqtSignal(str)  # 错误信号
 
-    def __init__(self, text, text_id):
+    def __init__(self, text, text_id, analysis=None):
         super().__init__()
         self.text = text
         self.text_id = text_id
+        self.analysis = analysis
+        self.cancelled = False
+
+    def cancel(self):
+        """字幕已被更新的文本取代：尚未开始的翻译直接跳过，已完成的结果不再发送"""
+        self.cancelled = True
 
     def run(self):
         """执行翻译"""
         try:
+            if self.cancelled:
+                logger.info(f"字幕已过期，跳过翻译[{self.text_id}]: {self.text}")
+                return
             logger.info(f"开始翻译文本[{self.text_id}]: {self.text}")
-            english_text = translate_text(self.text)
+            english_text = translate_text(self.text, analysis=self.analysis)
+            if self.cancelled:
+                logger.info(f"字幕已过期，丢弃翻译结果[{self.text_id}]: {english_text}")
+                return
             self.result_ready.emit(english_text, self.text_id)
             logger.info(f"翻译完成[{self.text_id}]: {self.text} -> {english_text}")
         except Exception as e:
@@ -67,7 +101,11 @@ class TranslatorThread(QThread):
 
 class SubtitleWindow(QWidget):
     """字幕显示窗口"""
-    update_signal = pyqtSignal(str, str, object, object, object, object, object)
+    # 最后一个参数为接收消息时计算的 MessageAnalysis，窗口直接使用其中的显示布局
+    update_signal = pyqtSignal(str, str, object, object, object, object, object, object)
+    # 两阶段显示：先显示原文（最后一个参数为预先分配的文本ID），译文稍后经 translation_signal 填入
+    display_signal = pyqtSignal(str, str, object, object, object, object, object, object, object)
+    translation_signal = pyqtSignal(str, int)
 
     def __init__(self):
         super().__init__()
@@ -76,9 +114,14 @@ class SubtitleWindow(QWidget):
         self.hide_timer = None
         self.translator_threads = []  # 翻译线程列表
         self.current_text_id = 0  # 当前文本ID
+        self.latest_text_id = 0   # 最近分配的文本ID（分配时即更新，不等显示信号排队处理）
+        self._text_ids = itertools.count(1)
+        self._text_id_lock = threading.Lock()
 
         # 连接信号
         self.update_signal.connect(self.update_subtitle_slot)
+        self.display_signal.connect(self.update_subtitle_slot)
+        self.translation_signal.connect(self.on_translation_ready)
         
         logger.info("字幕窗口初始化完成")
 
@@ -149,26 +192,50 @@ class SubtitleWindow(QWidget):
             logger.error(f"UI初始化失败: {e}")
             raise
 
+    def allocate_text_id(self):
+        """分配文本ID（线程安全），两阶段显示在发出显示信号前预先分配"""
+        with self._text_id_lock:
+            self.latest_text_id = next(self._text_ids)
+            return self.latest_text_id
+
+    def is_latest_text(self, text_id):
+        """text_id 之后是否未再分配过文本ID，即该字幕尚未被更新的字幕取代
+
+        与 current_text_id 不同，显示信号仍在排队时也能正确判断，不会误判刚显示的字幕已过期
+        """
+        return text_id >= self.latest_text_id
+
     def update_subtitle_slot(self, source_text, target_text, y_position=None, 
-                           top_color=None, bottom_color=None, timeout=None, height=None):
+                           top_color=None, bottom_color=None, timeout=None, height=None, analysis=None,
+                           text_id=None):
         """字幕更新槽函数"""
         try:
             logger.info(f"接收到字幕更新请求 - 原文: {source_text}, 译文: {target_text}, 位置: {y_position}, 上方颜色: {top_color}, 下方颜色: {bottom_color}, 超时: {timeout}, 高度: {height}")
             self.update_subtitle(source_text, target_text, y_position, 
-                               top_color, bottom_color, timeout, height)
+                               top_color, bottom_color, timeout, height, analysis, text_id)
         except Exception as e:
             logger.error(f"字幕更新失败: {e}")
 
     def update_subtitle(self, source_text, target_text, y_position=None, 
-                       top_color=None, bottom_color=None, timeout=None, height=None):
-        """更新字幕显示"""
+                       top_color=None, bottom_color=None, timeout=None, height=None, analysis=None,
+                       text_id=None):
+        """更新字幕显示
+
+        text_id 由调用方预先分配时为两阶段显示：译文为空则底部留空等待 translation_signal，不启动翻译线程
+        """
         try:
-            # 更新当前文本ID
-            self.current_text_id += 1
+            # 更新当前文本ID，之前文本的翻译已无法显示
+            two_phase = text_id is not None
+            self.current_text_id = text_id if two_phase else self.allocate_text_id()
             self.current_source_text_id = self.current_text_id
+            for thread in self.translator_threads:
+                thread.cancel()
 
-            # 获取显示布局信息
-            layout_info = get_display_layout(source_text)
+            # 获取显示布局信息：优先使用消息分析结果，GUI线程不再检测语种
+            if analysis is not None:
+                layout_info = analysis.layout
+            else:
+                layout_info = get_display_layout(source_text)
             logger.info(f"检测到语言布局: {layout_info}")
             
             # 更新位置
@@ -201,18 +268,20 @@ class SubtitleWindow(QWidget):
                 if target_text:
                     self.bottom_label.setText(target_text)
                 else:
-                    # 启动翻译线程，翻译前底部标签保持空白
+                    # 启动翻译线程（两阶段显示时译文另行推送），翻译前底部标签保持空白
                     self.bottom_label.setText("")
-                    self.start_translation(source_text, self.current_source_text_id)
+                    if not two_phase:
+                        self.start_translation(source_text, self.current_source_text_id, analysis)
             else:
                 # 外文在上，中文翻译在下
                 self.top_label.setText(source_text)
                 if target_text:
                     self.bottom_label.setText(target_text)
                 else:
-                    # 启动翻译线程，翻译前底部标签保持空白
+                    # 启动翻译线程（两阶段显示时译文另行推送），翻译前底部标签保持空白
                     self.bottom_label.setText("")
-                    self.start_translation(source_text, self.current_source_text_id)
+                    if not two_phase:
+                        self.start_translation(source_text, self.current_source_text_id, analysis)
 
             # 显示窗口
             self.show()
@@ -234,10 +303,10 @@ class SubtitleWindow(QWidget):
             logger.error(f"更新字幕时发生错误: {e}")
             logger.error(traceback.format_exc())
 
-    def start_translation(self, text, text_id):
+    def start_translation(self, text, text_id, analysis=None):
         """启动翻译线程"""
         try:
-            translator = TranslatorThread(text, text_id)
+            translator = TranslatorThread(text, text_id, analysis)
             translator.result_ready.connect(self.on_translation_ready)
             translator.error_signal.connect(self.on_translation_error)
             translator.finished_signal.connect(self.on_translation_finished)
@@ -342,72 +411,408 @@ class WebSocketHandler:
     """WebSocket消息处理器"""
     def __init__(self, subtitle_window):
         self.subtitle_window = subtitle_window
+        # 订阅者（其他显示端）接收本机显示的每条字幕，一次翻译服务多块屏幕
+        self.subscribers = SubscriberHub(
+            queue_size=SUBSCRIBER_CONFIG.get("queue_size", 32),
+            max_subscribers=SUBSCRIBER_CONFIG.get("max_subscribers", 64)
+        )
+
+    def publish(self, event, context=None, analysis=None, **fields):
+        """把本地窗口显示的字幕事件推送给订阅者：原文、译文、样式与布局方向"""
+        if not len(self.subscribers):
+            return
+        message = {"event": event}
+        message.update(fields)
+        if context is not None:
+            message["style"] = {key: context.get(key) for key in STYLE_FIELDS}
+        if analysis is not None:
+            message["from_lang"] = analysis.layout["from_lang"]
+            message["to_lang"] = analysis.layout["to_lang"]
+        self.subscribers.publish(message)
+
+    def create_streaming_translator(self, connection):
+        """为连接创建流式翻译会话，翻译结果直接显示并推送给客户端"""
+        async def on_result(segment_id, source_text, translated_text, is_final, context):
+            self.subtitle_window.update_signal.emit(
+                source_text, translated_text, context.get('y_position'),
+                context.get('top_color'), context.get('bottom_color'),
+                context.get('timeout'), context.get('height'), context.get('analysis')
+            )
+            self.publish("subtitle", context, context.get('analysis'), segment_id=segment_id, is_final=is_final,
+                         source_text=source_text, translated_text=translated_text)
+            response = {
+                "status": "success",
+                "message": "流式字幕已更新",
+                "segment_id": segment_id,
+                "is_final": is_final,
+                "source_text": source_text,
+                "translated_text": translated_text,
+                "translation_status": "success"
+            }
+            await connection.send(response)
+            logger.info(f"发送流式响应: {response}")
+
+        return StreamingTranslator(
+            translate_text_async, on_result,
+            debounce_ms=STREAMING_CONFIG.get("debounce_ms", 300),
+            max_wait_ms=STREAMING_CONFIG.get("max_wait_ms", 1000),
+            min_change_chars=STREAMING_CONFIG.get("min_change_chars", 4),
+            max_segments=STREAMING_CONFIG.get("max_segments", 32),
+            analyze_func=analyze_message
+        )
+
+    def create_message_pipeline(self, connection):
+        """为连接创建消息流水线：多条消息并发翻译，按连接的顺序模式显示并响应
+
+        流水线处理的任务为 {"data": 消息, "analysis", "text_id", "timestamps"}；
+        text_id 不为空表示原文已按两阶段显示，交付时只填入译文并发送 translated 事件
+        """
+        async def send_response(response, job):
+            if job.get("text_id") is not None:
+                response["event"] = "translated"
+                response["text_id"] = job["text_id"]
+                response["timestamps"] = dict(job["timestamps"], translated=timestamp_ms())
+            if 'seq' in job["data"]:
+                response["seq"] = job["data"]['seq']
+            await connection.send(response)
+            logger.info(f"发送响应: {response}")
+
+        async def deliver(result, superseded):
+            data = result["data"]
+            if "error" in result:
+                response = {"status": "error", "message": result["error"]}
+            else:
+                if not superseded and result.get("text_id") is not None \
+                        and not self.subtitle_window.is_latest_text(result["text_id"]):
+                    # ordered 模式下原文已被更新的字幕取代：窗口不会填入该译文，也不再推送给订阅者
+                    superseded = True
+                if not superseded:
+                    if result.get("text_id") is not None:
+                        # 窗口按文本ID判断，原文已被更新的字幕取代时不再填入译文
+                        self.subtitle_window.translation_signal.emit(result["translated_text"], result["text_id"])
+                        self.publish("translated", text_id=result["text_id"],
+                                     translated_text=result["translated_text"])
+                    else:
+                        self.subtitle_window.update_signal.emit(
+                            result["source_text"], result["translated_text"], data.get('y_position'),
+                            data.get('top_color'), data.get('bottom_color'), data.get('timeout'),
+                            data.get('height'), result["analysis"]
+                        )
+                        self.publish("subtitle", data, result["analysis"], source_text=result["source_text"],
+                                     translated_text=result["translated_text"])
+                if superseded:
+                    message = "字幕已过期，未显示"
+                else:
+                    message = "译文已推送" if result.get("text_id") is not None else "字幕已更新"
+                response = {
+                    "status": "success",
+                    "message": message,
+                    "source_text": result["source_text"],
+                    "translated_text": result["translated_text"],
+                    "translation_status": result["translation_status"],
+                    "result_source": result["result_source"]
+                }
+                if result.get("provisional_text") is not None:
+                    response["provisional_text"] = result["provisional_text"]
+                if superseded:
+                    response["superseded"] = True
+            await send_response(response, result)
+
+        async def cancel(job):
+            # latest 模式下更新的字幕已显示，仍在翻译的旧字幕被取消
+            response = {
+                "status": "success",
+                "message": "字幕已过期，翻译已取消",
+                "source_text": job["data"].get('text', ''),
+                "translation_status": "cancelled",
+                "superseded": True
+            }
+            await send_response(response, job)
+
+        return MessagePipeline(
+            self.translate_message, deliver,
+            max_inflight=PIPELINE_CONFIG.get("max_inflight", 4),
+            mode=PIPELINE_CONFIG.get("order", "ordered"),
+            cancel_func=cancel
+        )
+
+    async def display_source(self, connection, data, provisional=False):
+        """两阶段显示的第一阶段：立即显示原文并发送 displayed 确认，返回交给流水线翻译的任务
+
+        provisional 为 True 时，词典能提供的临时译文（整句命中或短语内联替换）同时显示在译文位置，
+        API译文返回后替换
+        """
+        received = timestamp_ms()
+        source_text = data.get('text', '')
+        target_text = data.get('target_text', '')
+        analysis = analyze_message(source_text)
+        provisional_text = None
+        if provisional and not target_text:
+            provisional_text = build_provisional_translation(
+                analysis, PIPELINE_CONFIG.get("provisional_min_coverage", 0.0))
+        text_id = self.subtitle_window.allocate_text_id()
+        self.subtitle_window.display_signal.emit(
+            source_text, target_text or provisional_text or '', data.get('y_position'),
+            data.get('top_color'), data.get('bottom_color'), data.get('timeout'),
+            data.get('height'), analysis, text_id
+        )
+        self.publish("displayed", data, analysis, text_id=text_id, source_text=source_text,
+                     translated_text=target_text or provisional_text or '')
+        timestamps = {"received": received, "displayed": timestamp_ms()}
+        response = {
+            "status": "success",
+            "event": "displayed",
+            "message": "原文已显示",
+            "source_text": source_text,
+            "text_id": text_id,
+            "timestamps": timestamps
+        }
+        if provisional_text is not None:
+            response["provisional_text"] = provisional_text
+        if 'seq' in data:
+            response["seq"] = data['seq']
+        await connection.send(response)
+        logger.info(f"发送响应: {response}")
+        return {"data": data, "analysis": analysis, "text_id": text_id, "timestamps": timestamps,
+                "provisional_text": provisional_text}
+
+    async def translate_message(self, job):
+        """翻译一条字幕消息，返回显示与响应所需的内容"""
+        data = job["data"]
+        try:
+            source_text = data.get('text', '')
+            target_text = data.get('target_text', '')
+            logger.info(f"解析参数 - 原文: {source_text}, 译文: {target_text}, 位置: {data.get('y_position')}, 上方颜色: {data.get('top_color')}, 下方颜色: {data.get('bottom_color')}, 超时: {data.get('timeout')}, 高度: {data.get('height')}")
+            
+            # 每条消息只分析一次（语种、显示布局、词典命中），翻译与显示共用
+            analysis = job.get("analysis") or analyze_message(source_text)
+            
+            translation_status = "provided" if target_text else "success"
+            translated_text = target_text
+            result_source = "provided"
+            
+            if not translated_text:
+                try:
+                    translated_text, result_source = await translate_text_with_origin_async(
+                        source_text, analysis=analysis)
+                except Exception as translate_error:
+                    translation_status = f"error: {translate_error}"
+                    translated_text = source_text
+                    result_source = "source"
+                    logger.error(f"翻译失败，使用原文兜底: {translate_error}")
+                    logger.error(traceback.format_exc())
+                # 最终结果即先行显示的临时译文（整句词典命中，或API失败时的词典兜底）
+                provisional_text = job.get("provisional_text")
+                if provisional_text is not None and result_source == RESULT_GLOSSARY \
+                        and translated_text == provisional_text:
+                    result_source = "provisional"
+            
+            return dict(
+                job,
+                source_text=source_text,
+                translated_text=translated_text,
+                translation_status=translation_status,
+                result_source=result_source,
+                analysis=analysis
+            )
+        except Exception as e:
+            error_msg = f"处理消息时发生错误: {e}"
+            logger.error(error_msg)
+            logger.error(traceback.format_exc())
+            return dict(job, error=error_msg)
+
+    async def configure_pipeline(self, connection, pipeline, data, settings):
+        """处理连接配置消息，更新连接的显示设置 settings（display / provisional）与响应编码
+
+        {"type": "config", "order": "ordered"|"latest", "max_inflight": N,
+         "display": "after_translation"|"two_phase", "provisional": true|false,
+         "encoding": "json"|"msgpack", "echo": true|false}
+        所有字段先校验，任一字段无效时不做任何修改；确认消息即使用新的编码发送
+        """
+        display = data.get('display', settings["display"])
+        if display not in DISPLAY_MODES:
+            raise ValueError(f"不支持的显示模式: {display}")
+        order = data.get('order')
+        if order is not None and order not in ORDER_MODES:
+            raise ValueError(f"不支持的顺序模式: {order}")
+        encoding = data.get('encoding')
+        if encoding is not None:
+            check_encoding(encoding)
+        max_inflight = data.get('max_inflight')
+        if max_inflight is not None:
+            try:
+                max_inflight = int(max_inflight)
+            except (TypeError, ValueError):
+                raise ValueError(f"无效的并发上限: {max_inflight!r}")
+            limit = PIPELINE_CONFIG.get("max_inflight_limit", 32)
+            max_inflight = min(max(1, max_inflight), limit)
+        await pipeline.configure(mode=order, max_inflight=max_inflight)
+        connection.configure(encoding=encoding, echo_text=data.get('echo'))
+        settings["display"] = display
+        settings["provisional"] = bool(data.get('provisional', settings["provisional"]))
+        response = {
+            "status": "success",
+            "message": "连接配置已更新",
+            "order": pipeline.mode,
+            "max_inflight": pipeline.max_inflight,
+            "display": display,
+            "provisional": settings["provisional"],
+            "encoding": connection.encoding,
+            "echo": connection.echo_text
+        }
+        if 'seq' in data:
+            response["seq"] = data['seq']
+        await connection.send(response)
+        logger.info(f"连接配置已更新: 顺序模式 {pipeline.mode}, 并发上限 {pipeline.max_inflight}, "
+                    f"显示模式 {display}, 临时译文 {settings['provisional']}, "
+                    f"响应编码 {connection.encoding}, 回显原文 {connection.echo_text}")
+
+    async def subscribe(self, connection, data):
+        """注册订阅者：{"type": "subscribe", "queue_size": N, "encoding": "json"|"msgpack"}
+
+        字段全部校验通过且注册成功后才切换编码；队列中的事件发送时按连接当前编码编码
+        """
+        encoding = data.get('encoding')
+        if encoding is not None:
+            check_encoding(encoding)
+        queue_size = data.get('queue_size')
+        if queue_size is not None:
+            try:
+                queue_size = int(queue_size)
+            except (TypeError, ValueError):
+                raise ValueError(f"无效的队列长度: {queue_size!r}")
+            limit = SUBSCRIBER_CONFIG.get("queue_size_limit", 1024)
+            queue_size = min(max(1, queue_size), limit)
+        subscriber = self.subscribers.subscribe(connection, queue_size)
+        connection.configure(encoding=encoding)
+        response = {
+            "status": "success",
+            "message": "已订阅字幕",
+            "subscriber_id": subscriber.subscriber_id,
+            "queue_size": subscriber.queue_size,
+            "encoding": connection.encoding
+        }
+        if 'seq' in data:
+            response["seq"] = data['seq']
+        await connection.send(response)
+        return subscriber
 
     async def handle_message(self, websocket):
-        """处理WebSocket消息"""
+        """处理WebSocket消息：同一连接的多条消息经流水线并发翻译"""
+        # 响应编码按子协议协商（未协商时使用默认配置），可由配置消息调整
+        connection = WireConnection(websocket, WIRE_CONFIG.get("encoding", "json"), WIRE_CONFIG.get("echo_text", True))
+        streaming = self.create_streaming_translator(connection)
+        pipeline = self.create_message_pipeline(connection)
+        settings = {
+            "display": PIPELINE_CONFIG.get("display", "after_translation"),
+            "provisional": PIPELINE_CONFIG.get("provisional", False)
+        }
+        subscriber = None
         try:
-            logger.info(f"WebSocket客户端连接: {websocket.remote_address}")
+            logger.info(f"WebSocket客户端连接: {websocket.remote_address}, 响应编码 {connection.encoding}")
             async for message in websocket:
                 try:
-                    data = json.loads(message)
+                    data = decode_message(message)
                     logger.info(f"接收到WebSocket消息: {data}")
                     
-                    # 解析消息
-                    source_text = data.get('text', '')
-                    target_text = data.get('target_text', '')
-                    y_position = data.get('y_position')
-                    top_color = data.get('top_color')
-                    bottom_color = data.get('bottom_color')
-                    timeout = data.get('timeout')
-                    height = data.get('height')
+                    if data.get('type') == 'config':
+                        await self.configure_pipeline(connection, pipeline, data, settings)
+                        continue
                     
-                    logger.info(f"解析参数 - 原文: {source_text}, 译文: {target_text}, 位置: {y_position}, 上方颜色: {top_color}, 下方颜色: {bottom_color}, 超时: {timeout}, 高度: {height}")
-
-                    translation_status = "provided" if target_text else "success"
-                    translated_text = target_text
+                    # 显示端订阅：此后接收本机显示的每条字幕
+                    if data.get('type') == 'subscribe':
+                        if subscriber is None:
+                            subscriber = await self.subscribe(connection, data)
+                        else:
+                            await connection.send({"status": "success", "message": "已订阅字幕",
+                                                   "subscriber_id": subscriber.subscriber_id})
+                        continue
+                    if data.get('type') == 'unsubscribe':
+                        if subscriber is not None:
+                            self.subscribers.unsubscribe(subscriber)
+                            subscriber = None
+                        await connection.send({"status": "success", "message": "已取消订阅"})
+                        continue
                     
-                    if not translated_text:
-                        try:
-                            loop = asyncio.get_running_loop()
-                            translated_text = await loop.run_in_executor(None, translate_text, source_text)
-                        except Exception as translate_error:
-                            translation_status = f"error: {translate_error}"
-                            translated_text = source_text
-                            logger.error(f"翻译失败，使用原文兜底: {translate_error}")
-                            logger.error(traceback.format_exc())
+                    # 流式字幕：携带 segment_id 的消息按片段防抖翻译，结果异步推送
+                    segment_id = data.get('segment_id')
+                    if segment_id is not None and not data.get('target_text'):
+                        is_final = bool(data.get('is_final', True))
+                        context = {
+                            'y_position': data.get('y_position'), 'top_color': data.get('top_color'),
+                            'bottom_color': data.get('bottom_color'), 'timeout': data.get('timeout'),
+                            'height': data.get('height')
+                        }
+                        stream_status = await streaming.submit(segment_id, data.get('text', ''), is_final, context)
+                        await connection.send({
+                            "status": "success",
+                            "message": "流式字幕已接收",
+                            "segment_id": segment_id,
+                            "is_final": is_final,
+                            "translation_status": stream_status
+                        })
+                        continue
                     
-                    # 发送更新信号
-                    self.subtitle_window.update_signal.emit(
-                        source_text, translated_text, y_position, 
-                        top_color, bottom_color, timeout, height
-                    )
+                    if settings["display"] == "two_phase":
+                        # 原文立即显示，之前仍在翻译的字幕已无法显示（latest 模式下直接取消）
+                        job = await self.display_source(connection, data, settings["provisional"])
+                        pipeline.supersede_inflight()
+                    else:
+                        job = {"data": data}
                     
-                    # 发送确认响应
-                    response = {
-                        "status": "success",
-                        "message": "字幕已更新",
-                        "source_text": source_text,
-                        "translated_text": translated_text,
-                        "translation_status": translation_status
-                    }
-                    await websocket.send(json.dumps(response))
-                    logger.info(f"发送响应: {response}")
+                    # 在途消息达到上限时在此等待空位，暂停读取后续消息
+                    await pipeline.submit(job)
                     
-                except json.JSONDecodeError as e:
-                    error_msg = f"JSON解析错误: {e}"
+                except MessageDecodeError as e:
+                    error_msg = f"消息解析错误: {e}"
                     logger.error(error_msg)
-                    await websocket.send(json.dumps({"status": "error", "message": error_msg}))
+                    await connection.send({"status": "error", "message": error_msg})
                 except Exception as e:
                     error_msg = f"处理消息时发生错误: {e}"
                     logger.error(error_msg)
                     logger.error(traceback.format_exc())
-                    await websocket.send(json.dumps({"status": "error", "message": error_msg}))
+                    await connection.send({"status": "error", "message": error_msg})
                     
         except websockets.exceptions.ConnectionClosed:
             logger.info("WebSocket客户端断开连接")
         except Exception as e:
             logger.error(f"WebSocket连接错误: {e}")
             logger.error(traceback.format_exc())
+        finally:
+            if subscriber is not None:
+                self.subscribers.unsubscribe(subscriber)
+            pipeline.close()
+            streaming.close()
+            logger.info(f"消息流水线统计: {pipeline.stats}")
+            logger.info(f"流式翻译统计: {streaming.stats}")
+            cancellation_stats = get_cancellation_stats()
+            logger.info(
+                f"过期字幕撤销统计: 节省API调用 {cancellation_stats['saved']} 次, "
+                f"中止在途调用 {cancellation_stats['aborted']} 次, "
+                f"放弃的合并请求 {get_coalescing_stats()['abandoned']} 个"
+            )
+            cache_stats = get_translation_cache_stats()
+            if cache_stats:
+                logger.info(
+                    f"翻译结果缓存统计: 命中 {cache_stats['hits']} 次（内存 {cache_stats['memory_hits']}, "
+                    f"磁盘 {cache_stats['disk_hits']}）, 未命中 {cache_stats['misses']} 次, "
+                    f"命中率 {cache_stats['hit_rate']:.1%}, 条目 {cache_stats['memory_entries']}/{cache_stats['disk_entries']}"
+                )
+            batching_stats = get_batching_stats()
+            if batching_stats:
+                logger.info(
+                    f"微批处理统计: {batching_stats['lines']} 行, API请求 {batching_stats['api_requests']} 次, "
+                    f"平均每次请求 {batching_stats['lines_per_request']:.2f} 行, "
+                    f"平均批大小 {batching_stats['avg_batch_size']:.2f}, "
+                    f"拆分回退 {batching_stats['split_fallbacks']} 次, 失败批次 {batching_stats['failed_batches']} 次, "
+                    f"排队延迟 平均 {batching_stats['queue_wait_ms_avg']:.1f}ms / 最大 {batching_stats['queue_wait_ms_max']:.1f}ms"
+                )
+            memory_stats = get_translation_memory_stats()
+            if memory_stats:
+                logger.info(
+                    f"模糊翻译记忆统计: 命中率 {memory_stats['hit_rate']:.1%}, "
+                    f"相似度直方图 {memory_stats['similarity_histogram']}"
+                )
 
 async def start_websocket_server(subtitle_window):
     """启动WebSocket服务器"""
@@ -418,7 +823,12 @@ async def start_websocket_server(subtitle_window):
         
         logger.info(f"正在启动WebSocket服务器: ws://{host}:{port}")
         
-        server = await websockets.serve(handler.handle_message, host, port)
+        # 子协议用于协商响应编码；permessage-deflate 可在配置中关闭以节省CPU
+        server = await websockets.serve(
+            handler.handle_message, host, port,
+            subprotocols=available_subprotocols(),
+            compression="deflate" if WIRE_CONFIG.get("compression", True) else None
+        )
         logger.info("WebSocket服务器启动成功，等待客户端连接...")
         
         await server.wait_closed()
@@ -463,6 +873,10 @@ def main():
         
         logger.info("字幕软件启动完成")
         
+        # 监听词典文件，编辑后自动增量重新加载
+        if GLOSSARY_CONFIG.get("watch_enabled", True):
+            start_glossary_watcher()
+        
         # 在新线程中启动WebSocket服务器
         def start_server():
             try:
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+消息流水线模块 - 单个WebSocket连接内并发处理多条字幕消息
+同一连接最多同时处理 max_inflight 条消息，慢请求不再阻塞后续消息的读取与翻译；
+结果按连接选择的顺序模式交付：
+    ordered: 严格按接收顺序显示与响应（先到的消息未完成时，后完成的结果暂存等待）
+    latest:  结果完成即交付；比已交付消息更早的结果标记为过期，只响应不显示；
+             更新的消息交付后，仍在处理中的更早消息已无法显示，直接取消以节省翻译调用
+"""
+
+import asyncio
+import functools
+import logging
+
+logger = logging.getLogger(__name__)
+
+ORDER_MODES = ("ordered", "latest")
+
+
+class MessagePipeline(object):
+    """单个连接的消息流水线
+
+    Args:
+        process_func (coroutine function): process_func(message) -> 处理结果，应自行处理异常
+        deliver_func (coroutine function): deliver_func(result, superseded) 显示并响应处理结果；
+            superseded 为 True 表示已有更新的消息交付，结果不应再显示
+        max_inflight (int): 同时处理的最大消息数，达到上限时 submit 等待
+        mode (str): 顺序模式，ordered 或 latest
+        cancel_func (coroutine function): 可选，cancel_func(message) 响应 latest 模式下因过期被取消的消息
+    """
+
+    def __init__(self, process_func, deliver_func, max_inflight=4, mode="ordered", cancel_func=None):
+        self.process_func = process_func
+        self.deliver_func = deliver_func
+        self.cancel_func = cancel_func
+        self.max_inflight = max(1, int(max_inflight))
+        self.mode = mode if mode in ORDER_MODES else "ordered"
+        self._slots = asyncio.Condition()
+        self._inflight = 0
+        self._next_index = 0
+        self._next_deliver = 0       # ordered 模式下一条应交付的消息序号
+        self._latest_delivered = -1  # latest 模式已交付的最新消息序号
+        self._completed = {}
+        self._deliver_lock = asyncio.Lock()
+        self._tasks = set()
+        self._processing = {}        # 仍在处理中的消息序号 -> 任务
+        self._cancelled = set()      # 因过期被取消的消息序号
+        self.stats = {
+            "submitted": 0,
+            "delivered": 0,
+            "superseded": 0,
+            "cancelled": 0,
+            "reorder_waits": 0,
+            "peak_inflight": 0,
+        }
+
+    async def configure(self, mode=None, max_inflight=None):
+        """调整顺序模式或并发上限；切换模式前等待在途消息全部交付"""
+        if mode is not None and mode not in ORDER_MODES:
+            raise ValueError(f"不支持的顺序模式: {mode}")
+        if mode is not None and mode != self.mode:
+            await self.drain()
+            self.mode = mode
+            self._next_deliver = self._next_index
+            self._latest_delivered = self._next_index - 1
+        if max_inflight is not None:
+            async with self._slots:
+                self.max_inflight = max(1, int(max_inflight))
+                self._slots.notify_all()
+
+    async def submit(self, message):
+        """提交一条消息，在途消息达到上限时等待空位"""
+        async with self._slots:
+            await self._slots.wait_for(lambda: self._inflight < self.max_inflight)
+            self._inflight += 1
+            self.stats["peak_inflight"] = max(self.stats["peak_inflight"], self._inflight)
+        index = self._next_index
+        self._next_index += 1
+        self.stats["submitted"] += 1
+        task = asyncio.ensure_future(self._run(index, message))
+        self._processing[index] = task
+        self._tasks.add(task)
+        task.add_done_callback(functools.partial(self._on_task_done, index, message))
+
+    def _on_task_done(self, index, message, task):
+        self._tasks.discard(task)
+        if task.cancelled() and index in self._cancelled:
+            # 任务在开始执行前即被取消，_run 未能捕获取消，在此响应并释放空位
+            self._cancelled.discard(index)
+            self._processing.pop(index, None)
+            responder = asyncio.ensure_future(self._respond_cancelled(message))
+            self._tasks.add(responder)
+            responder.add_done_callback(self._tasks.discard)
+
+    async def _release(self, count=1):
+        async with self._slots:
+            self._inflight -= count
+            self._slots.notify_all()
+
+    async def _run(self, index, message):
+        try:
+            result = await self.process_func(message)
+        except asyncio.CancelledError:
+            self._processing.pop(index, None)
+            if index not in self._cancelled:
+                raise
+            self._cancelled.discard(index)
+            await self._respond_cancelled(message)
+            return
+        except Exception as e:
+            logger.error(f"处理流水线消息失败[{index}]: {e}")
+            result = None
+        finally:
+            self._processing.pop(index, None)
+
+        if self.mode == "ordered":
+            self._completed[index] = result
+            if index != self._next_deliver:
+                self.stats["reorder_waits"] += 1
+            await self._deliver_in_order()
+        else:
+            superseded = index < self._latest_delivered
+            if not superseded:
+                self._latest_delivered = index
+                self._cancel_older(index)
+            try:
+                await self._deliver(result, superseded)
+            finally:
+                await self._release()
+
+    def _cancel_older(self, index):
+        """取消比 index 更早、仍在处理中的消息：它们完成后也只会被标记为过期"""
+        for older, task in list(self._processing.items()):
+            if older < index and not task.done() and older not in self._cancelled:
+                self._cancelled.add(older)
+                self.stats["cancelled"] += 1
+                task.cancel()
+
+    def supersede_inflight(self):
+        """调用方已显示更新的内容：latest 模式下取消全部仍在处理中的消息，ordered 模式下不做处理"""
+        if self.mode == "latest":
+            self._cancel_older(self._next_index)
+
+    async def _respond_cancelled(self, message):
+        try:
+            if self.cancel_func is not None:
+                await self.cancel_func(message)
+        except Exception as e:
+            logger.error(f"响应已取消的流水线消息失败: {e}")
+        finally:
+            await self._release()
+
+    async def _deliver_in_order(self):
+        # 多个任务可能同时完成，串行交付以保证顺序
+        async with self._deliver_lock:
+            while self._next_deliver in self._completed:
+                result = self._completed.pop(self._next_deliver)
+                self._next_deliver += 1
+                try:
+                    await self._deliver(result, False)
+                finally:
+                    await self._release()
+
+    async def _deliver(self, result, superseded):
+        if superseded:
+            self.stats["superseded"] += 1
+        self.stats["delivered"] += 1
+        if result is None:
+            return
+        try:
+            await self.deliver_func(result, superseded)
+        except Exception as e:
+            logger.error(f"交付流水线结果失败: {e}")
+
+    async def drain(self):
+        """等待全部在途消息交付"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def close(self):
+        """连接断开时取消全部在途消息"""
+        for task in list(self._tasks):
+            task.cancel()
+        self._completed.clear()
+        self._processing.clear()
+        self._cancelled.clear()
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+请求合并模块 - 减少重复或零散的翻译API调用
+SingleFlight: 相同键的在途请求只执行一次，后到的调用者共享同一结果
+MicroBatcher: 短时间窗口内同一翻译方向的多行合并为一次API请求
+同时支持线程（同步）和 asyncio（异步）调用者，二者可混合等待同一请求
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight(object):
+    """合并相同键的在途请求：首个调用者执行，后续调用者挂起等待同一结果
+
+    异步调用者全部取消等待（且没有同步调用者）时，撤销仍在进行的请求
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._waiters = {}  # future -> [异步等待者数, 同步等待者数]
+        self._tasks = {}    # future -> 执行请求的异步任务
+        self._stats = {"executed": 0, "coalesced": 0, "abandoned": 0}
+
+    def _join(self, key, is_async=False):
+        """加入在途请求，返回 (future, 是否为首个调用者)"""
+        with self._lock:
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._inflight[key] = future
+                self._waiters[future] = [0, 0]
+                self._stats["executed"] += 1
+            else:
+                self._stats["coalesced"] += 1
+            self._waiters[future][0 if is_async else 1] += 1
+            return future, is_leader
+
+    def _leave(self, key, future):
+        """异步等待者取消等待；已无任何等待者时返回需要撤销的任务"""
+        with self._lock:
+            waiters = self._waiters.get(future)
+            if waiters is None:
+                return None
+            waiters[0] -= 1
+            if waiters[0] > 0 or waiters[1] > 0:
+                return None
+            task = self._tasks.get(future)
+            if task is None or task.done():
+                return None
+            # 撤销后新的调用者重新发起请求，不再加入即将取消的请求
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            self._stats["abandoned"] += 1
+            return task
+
+    def _complete(self, key, future, result=None, error=None, cancelled=False):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            self._waiters.pop(future, None)
+            self._tasks.pop(future, None)
+        if cancelled:
+            future.cancel()
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, func, *args):
+        """同步执行：相同键已有在途请求时阻塞等待其结果"""
+        future, is_leader = self._join(key)
+        if not is_leader:
+            logger.info(f"合并相同的在途翻译请求: {key[0] if isinstance(key, tuple) else key}")
+            return future.result()
+
+        try:
+            result = func(*args)
+        except Exception as e:
+            self._complete(key, future, error=e)
+            raise
+        except BaseException as e:
+            self._complete(key, future, error=RuntimeError(f"请求被中断: {e!r}"))
+            raise
+        self._complete(key, future, result)
+        return result
+
+    async def do_async(self, key, coro_func, *args):
+        """异步执行：请求在独立任务中运行，单个等待者被取消不会影响其他等待者，全部取消时撤销请求"""
+        future, is_leader = self._join(key, is_async=True)
+        if is_leader:
+            task = asyncio.ensure_future(coro_func(*args))
+            with self._lock:
+                self._tasks[future] = task
+
+            def on_done(done_task):
+                if done_task.cancelled():
+                    # 等待者已全部放弃，取消共享结果（不留下无人读取的异常）
+                    self._complete(key, future, cancelled=True)
+                elif done_task.exception() is not None:
+                    self._complete(key, future, error=done_task.exception())
+                else:
+                    self._complete(key, future, done_task.result())
+
+            task.add_done_callback(on_done)
+        else:
+            logger.info(f"合并相同的在途翻译请求: {key[0] if isinstance(key, tuple) else key}")
+
+        try:
+            return await asyncio.shield(asyncio.wrap_future(future))
+        except asyncio.CancelledError:
+            task = self._leave(key, future)
+            if task is not None:
+                task.cancel()
+            raise
+
+    def get_stats(self):
+        """获取合并统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["inflight"] = len(self._inflight)
+        return stats
+
+
+class MicroBatcher(object):
+    """微批处理：收集时间窗口内同一翻译方向的待译行，合并为一次API请求
+
+    多行以分隔符拼接后整体翻译，再按分隔符拆回各行；
+    拆分后行数不一致时退回逐行请求，保证结果正确；批请求失败时各行均返回空字符串，不再逐行重试
+
+    Args:
+        send_func (callable): send_func(text, from_lang, to_lang) -> 译文，失败返回空字符串
+        window_ms (float): 批处理时间窗口（毫秒），从该组第一行入队开始计时
+        max_batch_size (int): 单批最大行数，达到后立即发送
+        max_batch_chars (int): 单批最大字符数
+        max_inflight_batches (int): 同时在途的批请求数
+        delimiter (str): 行分隔符，包含分隔符的行不参与批处理
+    """
+
+    def __init__(self, send_func, window_ms=30, max_batch_size=16, max_batch_chars=2000,
+                 max_inflight_batches=8, delimiter="\n"):
+        self.send_func = send_func
+        self.window = max(0.0, float(window_ms)) / 1000.0
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_batch_chars = max(1, int(max_batch_chars))
+        self.delimiter = delimiter
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(max_inflight_batches)),
+                                            thread_name_prefix="translation-batch")
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._ready = []
+        self._running = True
+        self._started_at = time.monotonic()
+        self._stats = {
+            "lines": 0,
+            "api_requests": 0,
+            "batches": 0,
+            "batched_lines": 0,
+            "split_fallbacks": 0,
+            "failed_batches": 0,
+            "cancelled_lines": 0,
+            "queue_wait_ms_total": 0.0,
+            "queue_wait_ms_max": 0.0,
+        }
+        self._thread = threading.Thread(target=self._dispatch_loop, name="translation-batcher",
+                                        daemon=True)
+        self._thread.start()
+
+    def submit(self, text, from_lang, to_lang):
+        """提交一行待译文本，返回 concurrent.futures.Future"""
+        future = Future()
+        item = (text, future, time.monotonic())
+        key = (from_lang, to_lang)
+
+        with self._cond:
+            self._stats["lines"] += 1
+            if self.delimiter in text or len(text) >= self.max_batch_chars:
+                self._ready.append((key, [item]))
+                self._cond.notify()
+                return future
+
+            group = self._pending.get(key)
+            if group is not None and group["chars"] + len(text) + len(self.delimiter) > self.max_batch_chars:
+                self._ready.append((key, self._pending.pop(key)["items"]))
+                group = None
+            if group is None:
+                group = {"items": [], "chars": 0, "deadline": item[2] + self.window}
+                self._pending[key] = group
+            group["items"].append(item)
+            group["chars"] += len(text) + len(self.delimiter)
+            if len(group["items"]) >= self.max_batch_size:
+                self._ready.append((key, self._pending.pop(key)["items"]))
+            self._cond.notify()
+        return future
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    now = time.monotonic()
+                    for key in [key for key, group in self._pending.items() if group["deadline"] <= now]:
+                        self._ready.append((key, self._pending.pop(key)["items"]))
+                    if self._ready:
+                        break
+                    timeout = None
+                    if self._pending:
+                        timeout = min(group["deadline"] for group in self._pending.values()) - now
+                    self._cond.wait(timeout)
+                if not self._running and not self._ready:
+                    return
+                ready, self._ready = self._ready, []
+
+            for key, items in ready:
+                self._executor.submit(self._send_batch, key, items)
+
+    def _send_batch(self, key, items):
+        from_lang, to_lang = key
+        now = time.monotonic()
+        # 已取消的行（例如字幕已过期）不再发送
+        live_items = [item for item in items if item[1].set_running_or_notify_cancel()]
+        with self._cond:
+            self._stats["cancelled_lines"] += len(items) - len(live_items)
+            for _, _, enqueued_at in live_items:
+                wait_ms = (now - enqueued_at) * 1000
+                self._stats["queue_wait_ms_total"] += wait_ms
+                self._stats["queue_wait_ms_max"] = max(self._stats["queue_wait_ms_max"], wait_ms)
+        if not live_items:
+            return
+
+        if len(live_items) == 1:
+            self._send_single(live_items[0], from_lang, to_lang)
+            return
+
+        texts = [text for text, _, _ in live_items]
+        try:
+            result = self._call(self.delimiter.join(texts), from_lang, to_lang)
+        except Exception as e:
+            logger.error(f"批量翻译请求异常: {e}")
+            result = ''
+        if not result:
+            # 请求失败（或被熔断、流控拒绝）时逐行重试只会放大失败请求，各行直接按失败返回
+            with self._cond:
+                self._stats["failed_batches"] += 1
+            for _, future, _ in live_items:
+                future.set_result('')
+            return
+        parts = [part.strip() for part in result.split(self.delimiter)]
+
+        if len(parts) == len(live_items) and all(parts):
+            with self._cond:
+                self._stats["batches"] += 1
+                self._stats["batched_lines"] += len(live_items)
+            logger.info(f"批量翻译完成: {len(live_items)} 行合并为 1 次请求")
+            for (_, future, _), part in zip(live_items, parts):
+                future.set_result(part)
+            return
+
+        logger.warning(
+            f"批量翻译结果无法按行拆分（期望 {len(live_items)} 行，实际 {len(parts)} 行），退回逐行请求"
+        )
+        with self._cond:
+            self._stats["split_fallbacks"] += 1
+        for item in live_items:
+            self._send_single(item, from_lang, to_lang)
+
+    def _send_single(self, item, from_lang, to_lang):
+        text, future, _ = item
+        try:
+            future.set_result(self._call(text, from_lang, to_lang))
+        except Exception as e:
+            future.set_exception(e)
+
+    def _call(self, text, from_lang, to_lang):
+        with self._cond:
+            self._stats["api_requests"] += 1
+        return self.send_func(text, from_lang, to_lang)
+
+    def close(self):
+        """停止批处理，发送剩余待译行"""
+        with self._cond:
+            self._running = False
+            for key in list(self._pending):
+                self._ready.append((key, self._pending.pop(key)["items"]))
+            self._cond.notify()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+
+    def get_stats(self):
+        """获取批处理统计信息：吞吐、批大小、排队附加延迟"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["pending_lines"] = sum(len(group["items"]) for group in self._pending.values())
+        elapsed = max(time.monotonic() - self._started_at, 1e-9)
+        sent_lines = stats["lines"] - stats["cancelled_lines"] - stats["pending_lines"]
+        stats["lines_per_second"] = stats["lines"] / elapsed
+        stats["lines_per_request"] = sent_lines / stats["api_requests"] if stats["api_requests"] else 0.0
+        stats["avg_batch_size"] = stats["batched_lines"] / stats["batches"] if stats["batches"] else 0.0
+        stats["queue_wait_ms_avg"] = stats["queue_wait_ms_total"] / sent_lines if sent_lines > 0 else 0.0
+        return stats
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+流式翻译模块 - 处理语音识别（ASR）不断增长的部分结果
+同一语音片段（segment_id）的部分结果经过防抖和变化量判断后才翻译，
+被新结果取代的翻译任务会被取消，最终结果（is_final）总是翻译
+"""
+
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# 判断文本变化量时忽略空白和标点
+_IGNORED_CHARS = re.compile(r'[\W_]+')
+
+
+def normalize_partial_text(text):
+    """规范化部分结果：去除空白与标点，忽略大小写"""
+    return _IGNORED_CHARS.sub('', text or '').lower()
+
+
+def changed_char_count(old_text, new_text):
+    """估算两次部分结果之间的变化字符数（公共前缀之外的部分）"""
+    prefix = 0
+    limit = min(len(old_text), len(new_text))
+    while prefix < limit and old_text[prefix] == new_text[prefix]:
+        prefix += 1
+    return max(len(old_text), len(new_text)) - prefix
+
+
+class StreamingSegment(object):
+    """单个语音片段的流式状态"""
+
+    def __init__(self, segment_id):
+        self.segment_id = segment_id
+        self.latest_text = ''
+        self.context = None
+        self.requested_norm = None   # 最近一次发起翻译的规范化文本
+        self.translated_text = None  # 最近一次完成翻译的原文
+        self.translation = None      # 最近一次完成翻译的译文
+        self.task = None             # 防抖等待任务
+        self.inflight = None         # 进行中的部分结果翻译任务
+        self.first_pending_at = None
+        self.last_update_at = None
+
+
+class StreamingTranslator(object):
+    """单个连接的流式翻译会话
+
+    Args:
+        translate_func (coroutine function): translate_func(text) -> 译文
+        on_result (coroutine function): on_result(segment_id, source_text, translation, is_final, context)
+        debounce_ms (float): 部分结果静默多久后翻译
+        max_wait_ms (float): 持续更新时，距首个未翻译部分结果的最长等待
+        min_change_chars (int): 部分结果至少变化多少字符才重新翻译
+        max_segments (int): 同时跟踪的最大片段数，超出时丢弃最旧片段
+        analyze_func (callable): 可选，analyze_func(text) -> 分析结果；提供时每次翻译的文本只分析一次，
+            以 translate_func(text, analysis=分析结果) 调用，并通过 context['analysis'] 交给 on_result
+    """
+
+    def __init__(self, translate_func, on_result, debounce_ms=300, max_wait_ms=1000,
+                 min_change_chars=4, max_segments=32, analyze_func=None):
+        self.translate_func = translate_func
+        self.on_result = on_result
+        self.analyze_func = analyze_func
+        self.debounce = max(0.0, float(debounce_ms)) / 1000.0
+        self.max_wait = max(self.debounce, float(max_wait_ms) / 1000.0)
+        self.min_change_chars = max(1, int(min_change_chars))
+        self.max_segments = max(1, int(max_segments))
+        self.segments = OrderedDict()
+        self.final_tasks = set()
+        self.stats = {
+            "partials_received": 0,
+            "partials_translated": 0,
+            "partials_skipped": 0,
+            "superseded_cancelled": 0,
+            "finals_translated": 0,
+            "finals_reused": 0,
+        }
+
+    def _get_segment(self, segment_id):
+        segment = self.segments.get(segment_id)
+        if segment is None:
+            segment = StreamingSegment(segment_id)
+            self.segments[segment_id] = segment
+            while len(self.segments) > self.max_segments:
+                _, stale = self.segments.popitem(last=False)
+                self._cancel_task(stale)
+        else:
+            self.segments.move_to_end(segment_id)
+        return segment
+
+    def _cancel_task(self, segment):
+        if segment.task is not None and not segment.task.done():
+            segment.task.cancel()
+        segment.task = None
+        self._cancel_inflight(segment)
+
+    def _cancel_inflight(self, segment):
+        if segment.inflight is not None and not segment.inflight.done():
+            segment.inflight.cancel()
+            self.stats["superseded_cancelled"] += 1
+        segment.inflight = None
+
+    def _analyze(self, text, context):
+        """分析待翻译文本，返回 (分析结果, 附带分析结果的 context)"""
+        if self.analyze_func is None:
+            return None, context
+        analysis = self.analyze_func(text)
+        return analysis, dict(context or {}, analysis=analysis)
+
+    def _is_meaningful_change(self, segment, norm_text):
+        if not norm_text:
+            return False
+        if segment.requested_norm is None:
+            return True
+        if norm_text == segment.requested_norm:
+            return False
+        return changed_char_count(segment.requested_norm, norm_text) >= self.min_change_chars
+
+    async def submit(self, segment_id, text, is_final, context=None):
+        """提交一条流式消息，返回处理状态: debounced / skipped / translating / reused"""
+        segment = self._get_segment(segment_id)
+        segment.latest_text = text
+        segment.context = context
+        now = time.monotonic()
+
+        if is_final:
+            del self.segments[segment_id]
+            self._cancel_task(segment)
+            if segment.translated_text is not None and \
+                    normalize_partial_text(segment.translated_text) == normalize_partial_text(text):
+                # 最终结果与最近一次翻译的部分结果一致，直接复用译文
+                self.stats["finals_reused"] += 1
+                _, result_context = self._analyze(text, context)
+                await self.on_result(segment_id, text, segment.translation, True, result_context)
+                return "reused"
+            self.stats["finals_translated"] += 1
+            task = asyncio.ensure_future(self._translate(segment, text, True))
+            self.final_tasks.add(task)
+            task.add_done_callback(self.final_tasks.discard)
+            return "translating"
+
+        self.stats["partials_received"] += 1
+        norm_text = normalize_partial_text(text)
+        if not self._is_meaningful_change(segment, norm_text):
+            # 已有等待中的任务会使用最新文本；否则跳过本次部分结果
+            if segment.task is None or segment.task.done():
+                self.stats["partials_skipped"] += 1
+                return "skipped"
+            segment.last_update_at = now
+            return "debounced"
+
+        segment.last_update_at = now
+        if segment.task is None or segment.task.done():
+            segment.first_pending_at = now
+            segment.task = asyncio.ensure_future(self._debounce_and_translate(segment))
+        return "debounced"
+
+    async def _debounce_and_translate(self, segment):
+        try:
+            while True:
+                deadline = min(segment.last_update_at + self.debounce,
+                               segment.first_pending_at + self.max_wait)
+                delay = deadline - time.monotonic()
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+
+            text = segment.latest_text
+            norm_text = normalize_partial_text(text)
+            if not self._is_meaningful_change(segment, norm_text):
+                self.stats["partials_skipped"] += 1
+                return
+            segment.requested_norm = norm_text
+            self.stats["partials_translated"] += 1
+        except asyncio.CancelledError:
+            return
+        # 新一轮翻译取代仍在进行的旧部分结果翻译；翻译期间允许新的部分结果开启下一轮防抖
+        self._cancel_inflight(segment)
+        segment.inflight = asyncio.ensure_future(self._translate(segment, text, False))
+        segment.task = None
+
+    async def _translate(self, segment, text, is_final):
+        analysis, result_context = self._analyze(text, segment.context)
+        try:
+            if self.analyze_func is None:
+                translation = await self.translate_func(text)
+            else:
+                translation = await self.translate_func(text, analysis=analysis)
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            logger.error(f"流式翻译失败[{segment.segment_id}]: {e}")
+            translation = text
+
+        if not is_final:
+            if self.segments.get(segment.segment_id) is not segment:
+                # 片段已结束或被丢弃，过期的部分结果不再显示
+                return
+            segment.translated_text = text
+            segment.translation = translation
+        try:
+            await self.on_result(segment.segment_id, text, translation, is_final, result_context)
+        except Exception as e:
+            logger.error(f"发送流式翻译结果失败[{segment.segment_id}]: {e}")
+
+    def close(self):
+        """连接断开时取消全部等待中的任务"""
+        for segment in self.segments.values():
+            self._cancel_task(segment)
+        self.segments.clear()
+        for task in list(self.final_tasks):
+            task.cancel()
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+字幕订阅模块 - 一次翻译的结果推送给多个显示端
+显示端通过 {"type": "subscribe"} 注册为订阅者，之后接收服务端显示的每一条字幕事件
+（原文、译文与样式）；事件放入各订阅者的发送队列，发送时按连接当前的编码编码，
+同一事件在同一编码下只编码一次（订阅者之间共享编码结果）。
+每个订阅者的队列有界，满时丢弃最旧的事件，慢订阅者只会丢失自己的旧字幕，不会拖慢其他订阅者或翻译流程
+"""
+
+import asyncio
+import collections
+import itertools
+import logging
+
+from wire_protocol import encode_message
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber(object):
+    """单个订阅者：有界发送队列（满时丢弃最旧事件）与独立的发送任务
+
+    Args:
+        connection (WireConnection): 订阅者连接，按其编码发送事件
+        queue_size (int): 发送队列长度
+    """
+
+    def __init__(self, subscriber_id, connection, queue_size=32):
+        self.subscriber_id = subscriber_id
+        self.connection = connection
+        self.queue_size = max(1, int(queue_size))
+        self._queue = collections.deque(maxlen=self.queue_size)
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._task = None
+        self.stats = {"queued": 0, "sent": 0, "dropped": 0}
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._send_loop())
+
+    def put(self, event, encoded):
+        """放入一条事件，队列已满时丢弃最旧的事件（不等待）
+
+        Args:
+            event (dict): 字幕事件
+            encoded (dict): 该事件的编码缓存（编码 -> 编码结果），各订阅者共享
+        """
+        if self._closed:
+            return
+        if len(self._queue) == self.queue_size:
+            self.stats["dropped"] += 1
+        self._queue.append((event, encoded))
+        self.stats["queued"] += 1
+        self._ready.set()
+
+    async def _send_loop(self):
+        try:
+            while not self._closed:
+                if not self._queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                event, encoded = self._queue.popleft()
+                # 按发送时的编码编码，订阅后切换编码时队列中的旧事件也使用新编码
+                encoding = self.connection.encoding
+                payload = encoded.get(encoding)
+                if payload is None:
+                    payload = encoded[encoding] = encode_message(event, encoding)
+                await self.connection.send_encoded(payload)
+                self.stats["sent"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 连接已断开等，停止推送；订阅者在连接处理结束时注销
+            logger.info(f"订阅者[{self.subscriber_id}]推送停止: {e!r}")
+            self._closed = True
+
+    def close(self):
+        self._closed = True
+        self._queue.clear()
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+
+class SubscriberHub(object):
+    """订阅者集合：发布的事件推送给全部订阅者
+
+    发布与订阅都在 WebSocket 服务的事件循环中进行；publish 不等待任何发送
+
+    Args:
+        queue_size (int): 每个订阅者的默认发送队列长度
+        max_subscribers (int): 订阅者数量上限
+    """
+
+    def __init__(self, queue_size=32, max_subscribers=64):
+        self.queue_size = max(1, int(queue_size))
+        self.max_subscribers = max(1, int(max_subscribers))
+        self._subscribers = {}
+        self._ids = itertools.count(1)
+        self.stats = {"published": 0, "dropped": 0}
+
+    def subscribe(self, connection, queue_size=None):
+        """注册订阅者并开始推送，返回 Subscriber；超过订阅者上限时抛出 ValueError"""
+        if len(self._subscribers) >= self.max_subscribers:
+            raise ValueError(f"订阅者数量已达上限: {self.max_subscribers}")
+        subscriber = Subscriber(next(self._ids), connection, queue_size or self.queue_size)
+        self._subscribers[subscriber.subscriber_id] = subscriber
+        subscriber.start()
+        logger.info(f"订阅者[{subscriber.subscriber_id}]已注册，当前订阅者 {len(self._subscribers)} 个")
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """注销订阅者，丢弃其未发送的事件"""
+        if self._subscribers.pop(subscriber.subscriber_id, None) is None:
+            return
+        subscriber.close()
+        self.stats["dropped"] += subscriber.stats["dropped"]
+        logger.info(f"订阅者[{subscriber.subscriber_id}]已注销: {subscriber.stats}，"
+                    f"当前订阅者 {len(self._subscribers)} 个")
+
+    def publish(self, event):
+        """推送事件给全部订阅者；同一编码的订阅者共享一次编码结果"""
+        if not self._subscribers:
+            return
+        self.stats["published"] += 1
+        encoded = {}
+        for subscriber in self._subscribers.values():
+            subscriber.put(event, encoded)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def get_stats(self):
+        """获取订阅统计信息：订阅者数、发布事件数、丢弃事件数（含当前订阅者）"""
+        stats = dict(self.stats)
+        stats["subscribers"] = len(self._subscribers)
+        stats["dropped"] += sum(subscriber.stats["dropped"] for subscriber in self._subscribers.values())
+        return stats
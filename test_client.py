@@ -274,10 +274,33 @@ async def interactive_test(host="localhost", port=None):
     except Exception as e:
         log_output(f"✗ 交互式测试失败: {e}")
 
+async def subscribe_test(host="localhost", port=None):
+    """订阅模式：作为显示端接收服务端显示的每条字幕，Ctrl+C 退出"""
+    log_output("\n=== 订阅模式 ===")
+    
+    if port is None:
+        port = NETWORK_CONFIG["websocket_port"]
+    
+    try:
+        async with websockets.connect(f'ws://{host}:{port}') as websocket:
+            await websocket.send(json.dumps({"type": "subscribe"}))
+            log_output(f"订阅确认: {json.loads(await websocket.recv())}")
+            
+            async for message in websocket:
+                event = json.loads(message)
+                if event.get("event") == "translated":
+                    log_output(f"[{event.get('text_id')}] 译文: {event.get('translated_text')}")
+                else:
+                    log_output(f"[{event.get('event')}] 原文: {event.get('source_text')} | "
+                               f"译文: {event.get('translated_text')} | 样式: {event.get('style')}")
+            
+    except Exception as e:
+        log_output(f"✗ 订阅模式失败: {e}")
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description='字幕软件WebSocket测试客户端')
-    parser.add_argument('--mode', '-m', choices=['basic', 'batch', 'rapid', 'custom', 'interactive', 'all'],
+    parser.add_argument('--mode', '-m', choices=['basic', 'batch', 'rapid', 'custom', 'interactive', 'subscribe', 'all'],
                        default='basic', help='测试模式')
     parser.add_argument('--host', default='localhost', help='WebSocket服务器地址')
     parser.add_argument('--port', type=int, default=NETWORK_CONFIG["websocket_port"], help='WebSocket服务器端口')
@@ -298,6 +321,8 @@ def main():
             await test_custom_params(args.host, args.port)
         elif args.mode == 'interactive':
             await interactive_test(args.host, args.port)
+        elif args.mode == 'subscribe':
+            await subscribe_test(args.host, args.port)
         elif args.mode == 'all':
             await test_basic_functionality(args.host, args.port)
             await asyncio.sleep(1)
@@ -4,9 +4,17 @@
 机器翻译 WebAPI 接口调用模块化
 简化版本：直接使用配置参数
 支持本地翻译缓存（基于txt词语映射），优先使用自定义翻译
+支持翻译结果缓存（内存LRU + 磁盘持久化），重复文本跳过API调用
+使用长连接HTTP客户端（连接池复用TCP/TLS连接），多线程共享
+提供基于aiohttp的异步翻译接口，供WebSocket服务在事件循环中直接调用
+相同的在途翻译请求自动合并，只调用一次API；可选微批处理合并突发的多行请求
+客户端流控（令牌桶 + AIMD自适应并发），避免突发流量触发服务商限流
+对冲请求与熔断：慢请求超过p95时补发请求，API持续失败时直接使用本地兜底
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+import asyncio
 import datetime
 import hashlib
 import base64
@@ -15,24 +23,37 @@ import json
 import logging
 import os
 import sys
-import re
-from config import XFYUN_CONFIG, TRANSLATION_CONFIG
-from language_detector import update_translation_config, detect_language
+import threading
+try:
+    import aiohttp
+except ImportError:  # 未安装aiohttp时异步接口退回线程池执行同步翻译
+    aiohttp = None
+from config import (XFYUN_CONFIG, TRANSLATION_CONFIG, CACHE_CONFIG, HTTP_CONFIG, BATCH_CONFIG,
+                    RATE_LIMIT_CONFIG, RESILIENCE_CONFIG, GLOSSARY_CONFIG, TRANSLATION_MEMORY_CONFIG)
+from language_detector import (detect_language_with_confidence, get_direction_for_language,
+                               build_display_layout, normalize_language_code)
+from translation_cache import TranslationCache
+from translation_memory import TranslationMemory
+from request_coalescing import SingleFlight, MicroBatcher
+from flow_control import (TokenBucket, AdaptiveConcurrencyLimiter, FlowController, RateLimitExceeded,
+                          HedgingPolicy, CircuitBreaker,
+                          OUTCOME_SUCCESS, OUTCOME_THROTTLED, OUTCOME_ERROR)
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait as wait_futures
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import time
+from glossary import (CanonicalCasing, GlossarySnapshot, GlossaryWatcher, build_glossary_snapshot,
+                      content_digest, entry_matches_direction, file_signature, read_compiled_glossary, write_compiled_glossary)
 
 # 获取logger (不重复配置)
 logger = logging.getLogger(__name__)
 
-# 全局翻译缓存字典
-local_translations = {}
+# 本地词典快照（不可变，热更新时整体替换；读者取一次引用即可得到一致的条目与匹配器）
+glossary_snapshot = GlossarySnapshot()
+# 串行化词典重建，读者不受影响
+_glossary_reload_lock = threading.Lock()
+_glossary_watcher = None
 
 
-def normalize_language_code(lang_code):
-    """限制语言代码到已支持范围"""
-    if not lang_code:
-        return None
-    lang_code = lang_code.lower()
-    return lang_code if lang_code in ('cn', 'en') else None
-
 def get_resource_path(relative_path):
     """获取资源文件的绝对路径，兼容开发环境和打包后的exe"""
     try:
@@ -44,79 +65,139 @@ def get_resource_path(relative_path):
     
     return os.path.join(base_path, relative_path)
 
-def load_local_translations():
-    """加载本地翻译映射文件（txt词语映射）"""
-    global local_translations
-    translations_file = "translations.txt"
-    
-    # 获取exe或脚本的实际目录
+def get_app_dir():
+    """exe或脚本的实际目录"""
     if getattr(sys, 'frozen', False):
         # PyInstaller打包后的exe
-        exe_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
-    else:
-        # 开发环境
-        exe_dir = os.path.dirname(os.path.abspath(__file__))
+        return os.path.dirname(os.path.abspath(sys.argv[0]))
+    # 开发环境
+    return os.path.dirname(os.path.abspath(__file__))
+
+def resolve_app_path(path):
+    """配置中的相对路径按exe/脚本所在目录解析，与启动时的工作目录无关（如从快捷方式启动）"""
+    if not path or os.path.isabs(path):
+        return path
+    return os.path.join(get_app_dir(), path)
+
+def get_translation_search_paths():
+    """翻译映射文件的搜索路径：1) 当前工作目录 2) exe/脚本同目录 3) 资源目录"""
+    translations_file = "translations.txt"
+    exe_dir = get_app_dir()
     
-    # 优先查找顺序：1) 当前工作目录 2) exe/脚本同目录 3) 资源目录
-    search_paths = [
+    return [
         translations_file,  # 当前工作目录
         os.path.join(exe_dir, translations_file),  # exe/脚本同目录
         get_resource_path(translations_file),  # PyInstaller资源目录
     ]
-    
+
+def find_translations_file():
+    """返回第一个存在的翻译映射文件路径，未找到返回 None"""
+    for file_path in get_translation_search_paths():
+        if os.path.exists(file_path):
+            return file_path
+    return None
+
+def format_partition_sizes(snapshot):
+    """格式化各方向分区的词条数，用于加载日志"""
+    return ', '.join(f"{name} {size} 条" for name, size in snapshot.partition_sizes().items())
+
+def get_compiled_glossary_path():
+    """预编译词典路径，未启用时返回 None"""
+    if not GLOSSARY_CONFIG.get("compiled_enabled", True):
+        return None
+    return resolve_app_path(GLOSSARY_CONFIG.get("compiled_path")) or None
+
+def save_compiled_glossary(snapshot, digest, output_path=None):
+    """写入预编译词典（尽力而为，失败不影响翻译）"""
+    output_path = output_path or get_compiled_glossary_path()
+    if not output_path:
+        return False
     try:
-        loaded = False
-        for file_path in search_paths:
-            if os.path.exists(file_path):
-                logger.info(f"尝试加载翻译文件: {file_path}")
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    parsed_translations = {}
-                    skipped_lines = 0
-                    for line_number, line in enumerate(f, start=1):
-                        stripped = line.strip()
-                        if not stripped or stripped.startswith("#"):
-                            continue
-                        if "，" in stripped:
-                            key, value = [part.strip() for part in stripped.split("，", 1)]
-                        elif "," in stripped:
-                            key, value = [part.strip() for part in stripped.split(",", 1)]
-                        else:
-                            skipped_lines += 1
-                            logger.warning(f"翻译文件格式不正确（第{line_number}行）: {stripped}")
-                            continue
-                        if not key or not value:
-                            skipped_lines += 1
-                            logger.warning(f"翻译文件缺少键或值（第{line_number}行）: {stripped}")
-                            continue
-                        key_lower = key.lower()
-                        source_lang = normalize_language_code(detect_language(key))
-                        target_lang = normalize_language_code(detect_language(value))
-                        compiled_regex = re.compile(re.escape(key), re.IGNORECASE)
-                        parsed_translations[key_lower] = {
-                            "pattern": key,
-                            "replacement": value,
-                            "source_lang": source_lang,
-                            "target_lang": target_lang,
-                            "regex": compiled_regex
-                        }
-                    
-                    local_translations = parsed_translations
+        started_at = time.perf_counter()
+        write_compiled_glossary(output_path, snapshot, digest)
+        logger.info(
+            f"预编译词典已写入: {output_path} ({len(snapshot)} 条, "
+            f"耗时 {(time.perf_counter() - started_at) * 1000:.1f}ms)"
+        )
+        return True
+    except Exception as e:
+        logger.warning(f"写入预编译词典失败，下次启动将重新解析文本: {e}")
+        return False
+
+def load_local_translations(force=False):
+    """
+    加载（或增量重新加载）本地翻译映射文件（txt词语映射）
+    
+    新快照构建完成后一次性替换全局引用，正在翻译的线程继续使用旧快照
+    
+    Args:
+        force (bool): 文件未变化时也重新解析
+    
+    Returns:
+        bool: 是否发布了新快照
+    """
+    global glossary_snapshot
+    with _glossary_reload_lock:
+        previous = glossary_snapshot
+        file_path = find_translations_file()
+        try:
+            if file_path is None:
+                logger.warning(f"未找到翻译映射文件，搜索路径: {get_translation_search_paths()}")
+                logger.warning("将只使用API翻译")
+                if len(previous) or previous.path:
+                    glossary_snapshot = GlossarySnapshot(version=previous.version + 1)
+                    return True
+                return False
+            
+            signature = file_signature(file_path)
+            if not force and file_path == previous.path and signature == previous.signature:
+                return False
+            
+            started_at = time.perf_counter()
+            compiled_path = get_compiled_glossary_path()
+            if compiled_path and file_path != previous.path and not force:
+                # 启动（或切换文件）时优先读取预编译词典，省去逐行解析、语言检测与自动机构建
+                snapshot = read_compiled_glossary(compiled_path, file_path, signature, previous.version + 1)
+                if snapshot is not None:
+                    glossary_snapshot = snapshot
                     logger.info(
-                        f"成功加载本地翻译映射: {len(local_translations)} 条记录 (文件: {file_path})"
+                        f"成功加载预编译词典: {len(snapshot)} 条记录 (文件: {compiled_path}, "
+                        f"耗时: {(time.perf_counter() - started_at) * 1000:.1f}ms)"
                     )
-                    if skipped_lines:
-                        logger.warning(f"有 {skipped_lines} 行因格式问题被跳过")
-                    loaded = True
-                    break
-        
-        if not loaded:
-            logger.warning(f"未找到翻译映射文件，搜索路径: {search_paths}")
-            logger.warning("将只使用API翻译")
-            local_translations = {}
+                    logger.info(f"词典方向分区: {format_partition_sizes(snapshot)}")
+                    return True
             
-    except Exception as e:
-        logger.error(f"加载翻译映射文件失败: {e}")
-        local_translations = {}
+            logger.info(f"尝试加载翻译文件: {file_path}")
+            with open(file_path, 'rb') as f:
+                raw = f.read()
+            lines = raw.decode('utf-8').splitlines()
+            # 路径变化时不复用旧条目，保证统计口径清晰
+            base = previous if file_path == previous.path else GlossarySnapshot(version=previous.version)
+            snapshot, changes = build_glossary_snapshot(file_path, signature, lines, base)
+            glossary_snapshot = snapshot
+            elapsed_ms = (time.perf_counter() - started_at) * 1000
+            
+            logger.info(
+                f"成功加载本地翻译映射: {len(snapshot)} 条记录 (文件: {file_path}, 版本: {snapshot.version}, "
+                f"耗时: {elapsed_ms:.1f}ms)"
+            )
+            logger.info(
+                f"词典变更: 新增 {changes['added']} 条, 删除 {changes['removed']} 条, "
+                f"修改 {changes['changed']} 条, 未变 {changes['unchanged']} 条; "
+                f"匹配自动机{'重建' if changes['matcher_rebuilt'] else '复用'}: {snapshot.matcher.node_count} 个节点"
+            )
+            logger.info(
+                f"词典方向分区: {format_partition_sizes(snapshot)}; "
+                f"重建分区: {', '.join(changes['rebuilt_partitions']) or '无'}"
+            )
+            if changes["skipped_lines"]:
+                logger.warning(f"有 {changes['skipped_lines']} 行因格式问题被跳过")
+            save_compiled_glossary(snapshot, content_digest(raw))
+            return True
+        except Exception as e:
+            # 加载失败时保留旧快照，避免编辑过程中的错误清空词典
+            logger.error(f"加载翻译映射文件失败，继续使用当前词典: {e}")
+            return False
 
 # 程序启动时自动加载翻译映射
 load_local_translations()
@@ -124,19 +205,194 @@ load_local_translations()
 def reload_local_translations():
     """重新加载本地翻译映射（运行时调用）"""
     logger.info("重新加载本地翻译映射...")
-    load_local_translations()
-    return len(local_translations)
+    load_local_translations(force=True)
+    return len(glossary_snapshot)
+
+def get_glossary_snapshot():
+    """获取当前词典快照"""
+    return glossary_snapshot
+
+def start_glossary_watcher(interval_ms=None):
+    """启动词典文件监听，文件变化时增量重新加载"""
+    global _glossary_watcher
+    if _glossary_watcher is None:
+        if interval_ms is None:
+            interval_ms = GLOSSARY_CONFIG.get("watch_interval_ms", 1000)
+        _glossary_watcher = GlossaryWatcher(find_translations_file, load_local_translations, interval_ms)
+        _glossary_watcher.start()
+        logger.info(f"词典文件热更新已启用，轮询间隔 {interval_ms}ms")
+    return _glossary_watcher
+
+def stop_glossary_watcher():
+    """停止词典文件监听"""
+    global _glossary_watcher
+    if _glossary_watcher is not None:
+        _glossary_watcher.stop()
+        _glossary_watcher = None
 
 def get_local_translations_count():
     """获取本地翻译映射数量"""
-    return len(local_translations)
+    return len(glossary_snapshot)
 
 def check_local_translation(text):
     """检查文本是否在本地翻译缓存中"""
-    return text.lower().strip() in local_translations
+    return text.lower().strip() in glossary_snapshot.entries
+
+def create_translation_cache():
+    """根据配置创建翻译结果缓存"""
+    if not CACHE_CONFIG.get("enabled", True):
+        logger.info("翻译结果缓存已禁用")
+        return None
+    return TranslationCache(
+        memory_max_entries=CACHE_CONFIG.get("memory_max_entries", 2000),
+        disk_max_entries=CACHE_CONFIG.get("disk_max_entries", 100000),
+        ttl_seconds=CACHE_CONFIG.get("ttl_seconds", 0),
+        persist_path=resolve_app_path(CACHE_CONFIG.get("persist_path")) or None,
+    )
+
+# 翻译结果缓存（键为实际提交给API的文本及翻译方向）
+translation_cache = create_translation_cache()
+
+def get_translation_cache_stats():
+    """获取翻译结果缓存统计信息"""
+    if translation_cache is None:
+        return {}
+    return translation_cache.get_stats()
+
+def create_translation_memory():
+    """根据配置创建模糊翻译记忆，未启用时返回 None"""
+    if not TRANSLATION_MEMORY_CONFIG.get("enabled", False):
+        return None
+    return TranslationMemory(
+        threshold=TRANSLATION_MEMORY_CONFIG.get("threshold", 0.9),
+        max_entries=TRANSLATION_MEMORY_CONFIG.get("max_entries", 100000),
+        min_chars=TRANSLATION_MEMORY_CONFIG.get("min_chars", 6),
+        filler_words=TRANSLATION_MEMORY_CONFIG.get("filler_words", ()),
+    )
+
+# 模糊翻译记忆（近似重复的原文复用历史译文）
+translation_memory = create_translation_memory()
+
+def get_translation_memory_stats():
+    """获取模糊翻译记忆统计信息：命中率与相似度直方图"""
+    if translation_memory is None:
+        return {}
+    return translation_memory.get_stats()
+
+class TranslationClient(object):
+    """长连接翻译HTTP客户端，基于requests.Session连接池，可在多个线程间共享"""
+
+    def __init__(self, pool_connections=4, pool_maxsize=32, connect_timeout=3.0,
+                 read_timeout=10.0, max_retries=0, verify_ssl=True):
+        self.timeout = (connect_timeout, read_timeout)
+        self.verify_ssl = verify_ssl
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize,
+                              max_retries=max_retries)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Connection": "keep-alive"})
+
+    def post(self, url, data, headers):
+        """发送POST请求，复用连接池中的连接"""
+        return self.session.post(url, data=data, headers=headers,
+                                 timeout=self.timeout, verify=self.verify_ssl)
+
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
+
+
+_translation_client = None
+_translation_client_lock = threading.Lock()
+
+def get_translation_client():
+    """获取全局共享的翻译HTTP客户端（延迟创建）"""
+    global _translation_client
+    if _translation_client is None:
+        with _translation_client_lock:
+            if _translation_client is None:
+                _translation_client = TranslationClient(
+                    pool_connections=HTTP_CONFIG.get("pool_connections", 4),
+                    pool_maxsize=HTTP_CONFIG.get("pool_maxsize", 32),
+                    connect_timeout=HTTP_CONFIG.get("connect_timeout", 3.0),
+                    read_timeout=HTTP_CONFIG.get("read_timeout", 10.0),
+                    max_retries=HTTP_CONFIG.get("max_retries", 0),
+                    verify_ssl=HTTP_CONFIG.get("verify_ssl", True),
+                )
+                logger.info(
+                    f"翻译HTTP客户端已创建: 连接池 {HTTP_CONFIG.get('pool_maxsize', 32)}，"
+                    f"超时 {_translation_client.timeout}"
+                )
+    return _translation_client
+
+class AsyncTranslationClient(object):
+    """异步翻译HTTP客户端，基于aiohttp连接池，在途请求数受信号量限制
+
+    aiohttp会话绑定事件循环，因此在首次使用时于当前事件循环中创建
+    """
+
+    def __init__(self, max_concurrency=100, pool_maxsize=100, connect_timeout=3.0,
+                 read_timeout=10.0, verify_ssl=True):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.pool_maxsize = max(1, int(pool_maxsize))
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.verify_ssl = verify_ssl
+        self._session = None
+        self._semaphore = None
+        self._loop = None
+
+    def _ensure_session(self):
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.pool_maxsize,
+                                             ssl=None if self.verify_ssl else False)
+            timeout = aiohttp.ClientTimeout(sock_connect=self.connect_timeout,
+                                            sock_read=self.read_timeout,
+                                            total=self.connect_timeout + self.read_timeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._session
+
+    async def post(self, url, data, headers):
+        """发送POST请求，返回 (状态码, 响应文本)"""
+        session = self._ensure_session()
+        async with self._semaphore:
+            async with session.post(url, data=data, headers=headers) as response:
+                return response.status, await response.text()
+
+    async def close(self):
+        """关闭会话和连接池"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+_async_translation_client = None
+
+def get_async_translation_client():
+    """获取全局共享的异步翻译HTTP客户端，未安装aiohttp时返回 None"""
+    global _async_translation_client
+    if aiohttp is None:
+        return None
+    if _async_translation_client is None:
+        _async_translation_client = AsyncTranslationClient(
+            max_concurrency=HTTP_CONFIG.get("async_max_concurrency", 100),
+            pool_maxsize=HTTP_CONFIG.get("async_pool_maxsize", 100),
+            connect_timeout=HTTP_CONFIG.get("connect_timeout", 3.0),
+            read_timeout=HTTP_CONFIG.get("read_timeout", 10.0),
+            verify_ssl=HTTP_CONFIG.get("verify_ssl", True),
+        )
+        logger.info(
+            f"异步翻译HTTP客户端已创建: 最大并发 {_async_translation_client.max_concurrency}"
+        )
+    return _async_translation_client
 
 class get_result(object):
-    def __init__(self, host, app_id, api_key, secret, text, business_args):
+    def __init__(self, host, app_id, api_key, secret, text, business_args, client=None, scheme="https"):
         # 应用ID（到控制台获取）
         self.APPID = app_id
         # 接口APISercet（到控制台机器翻译服务页面获取）
@@ -148,7 +404,7 @@ class get_result(object):
         self.Host = host
         self.RequestUri = "/v2/its"
         # 设置url
-        self.url = "https://" + host + self.RequestUri
+        self.url = scheme + "://" + host + self.RequestUri
         self.HttpMethod = "POST"
         self.Algorithm = "hmac-sha256"
         self.HttpProto = "HTTP/1.1"
@@ -159,6 +415,10 @@ class get_result(object):
         # 设置业务参数
         self.Text = text
         self.BusinessArgs = business_args
+        # HTTP客户端，为空时每次请求单独建立连接
+        self.client = client
+        # 最近一次调用的错误码（成功为 None），供流控判断是否被限流
+        self.last_error_code = None
 
     def hashlib_256(self, res):
         m = hashlib.sha256(bytes(res.encode(encoding='utf-8'))).digest()
@@ -212,93 +472,134 @@ class get_result(object):
         body = json.dumps(postdata)
         return body
 
-    def call_url(self):
-        """调用翻译API，增强错误处理"""
+    def has_credentials(self):
+        """检查API配置信息是否完整"""
         if self.APPID == '' or self.APIKey == '' or self.Secret == '':
             logger.error('API配置信息不完整！请填写完整的APPID、APIKey和Secret。')
+            return False
+        return True
+
+    def build_request(self):
+        """生成签名后的请求 (url, body, headers)，同步/异步调用共用"""
+        body = self.get_body()
+        headers = self.init_header(body)
+        return self.url, body, headers
+
+    def parse_response(self, status_code, response_text):
+        """解析API响应，失败返回空字符串"""
+        self.last_error_code = None
+        if status_code != 200:
+            self.last_error_code = f"http_{status_code}"
+            error_msg = f"HTTP请求失败，状态码：{status_code}，错误信息：{response_text}"
+            logger.error(error_msg)
+            return ''
+        
+        respData = json.loads(response_text)
+        code = str(respData.get("code", "unknown"))
+
+        if code != '0':
+            self.last_error_code = code
+            error_msg = f"翻译API返回错误，错误码：{code}"
+            logger.error(error_msg)
+            if code == "10013":
+                logger.error("请检查APPID是否正确")
+            elif code == "10014":
+                logger.error("请检查签名是否正确")
+            elif code == "11200":
+                logger.error("请检查APIKey是否正确")
+            elif code in ("11201", "11202", "11203"):
+                logger.error("翻译API调用量或并发超出限制（服务商限流）")
+            else:
+                logger.error(f"请前往https://www.xfyun.cn/document/error-code?code={code} 查询解决办法")
+            return ''
+        
+        result = respData.get('data', {}).get('result', {}).get('trans_result', {}).get('dst', '')
+        if result:
+            logger.debug(f"翻译成功: {self.Text} -> {result}")
+        else:
+            logger.warning("翻译结果为空")
+        return result
+
+    def call_url(self):
+        """调用翻译API，增强错误处理"""
+        if not self.has_credentials():
             return ''
         
         try:
-            body = self.get_body()
-            headers = self.init_header(body)
+            url, body, headers = self.build_request()
             
             logger.debug(f"发送翻译请求: {self.Text}")
-            response = requests.post(self.url, data=body, headers=headers, timeout=10)
-            status_code = response.status_code
-            
-            if status_code != 200:
-                error_msg = f"HTTP请求失败，状态码：{status_code}，错误信息：{response.text}"
-                logger.error(error_msg)
-                return ''
-            
-            respData = json.loads(response.text)
-            code = str(respData.get("code", "unknown"))
-
-            if code != '0':
-                error_msg = f"翻译API返回错误，错误码：{code}"
-                logger.error(error_msg)
-                if code == "10013":
-                    logger.error("请检查APPID是否正确")
-                elif code == "10014":
-                    logger.error("请检查签名是否正确")
-                elif code == "11200":
-                    logger.error("请检查APIKey是否正确")
-                else:
-                    logger.error(f"请前往https://www.xfyun.cn/document/error-code?code={code} 查询解决办法")
-                return ''
-            
-            result = respData.get('data', {}).get('result', {}).get('trans_result', {}).get('dst', '')
-            if result:
-                logger.debug(f"翻译成功: {self.Text} -> {result}")
+            if self.client is not None:
+                response = self.client.post(url, data=body, headers=headers)
             else:
-                logger.warning("翻译结果为空")
-            return result
+                response = requests.post(url, data=body, headers=headers, timeout=10)
+            return self.parse_response(response.status_code, response.text)
             
         except requests.RequestException as e:
+            self.last_error_code = "network"
             logger.error(f"网络请求异常: {e}")
             return ''
         except json.JSONDecodeError as e:
+            self.last_error_code = "invalid_response"
             logger.error(f"JSON解析失败: {e}")
             return ''
         except Exception as e:
+            self.last_error_code = "unknown"
             logger.error(f"翻译过程中发生未知错误: {str(e)}")
             return ''
 
-
-def collect_glossary_matches(text, from_lang=None, to_lang=None):
-    """收集与当前翻译方向匹配的词典命中"""
-    if not local_translations or not text:
-        return []
-    
-    matches = []
-    for entry in local_translations.values():
-        pattern_text = entry.get("pattern")
-        replacement = entry.get("replacement")
-        if not pattern_text or replacement is None:
-            continue
-        
-        source_lang = entry.get("source_lang")
-        target_lang = entry.get("target_lang")
-        
-        if from_lang and source_lang and source_lang != from_lang:
-            continue
-        if to_lang and target_lang and target_lang != to_lang:
-            continue
+    async def call_url_async(self, client):
+        """异步调用翻译API（签名逻辑与同步调用一致）"""
+        if not self.has_credentials():
+            return ''
         
-        regex = entry.get("regex")
-        if not regex:
-            continue
+        try:
+            url, body, headers = self.build_request()
+            
+            logger.debug(f"发送异步翻译请求: {self.Text}")
+            status_code, response_text = await client.post(url, data=body, headers=headers)
+            return self.parse_response(status_code, response_text)
+            
+        except asyncio.TimeoutError:
+            self.last_error_code = "network"
+            logger.error("网络请求异常: 请求超时")
+            return ''
+        except aiohttp.ClientError as e:
+            self.last_error_code = "network"
+            logger.error(f"网络请求异常: {e}")
+            return ''
+        except json.JSONDecodeError as e:
+            self.last_error_code = "invalid_response"
+            logger.error(f"JSON解析失败: {e}")
+            return ''
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.last_error_code = "unknown"
+            logger.error(f"翻译过程中发生未知错误: {str(e)}")
+            return ''
+
+
+def collect_glossary_matches(text, from_lang=None, to_lang=None, snapshot=None):
+    """收集与当前翻译方向匹配的词典命中（Aho-Corasick 单次扫描）"""
+    if snapshot is None:
+        snapshot = glossary_snapshot
+    # 常用方向直接使用预先分区的匹配器，其余情况退回全量匹配器逐条过滤
+    matcher = snapshot.partition_for(from_lang, to_lang)
+    accept = None
+    if matcher is None:
+        matcher = snapshot.matcher
         
-        for match in regex.finditer(text):
-            matches.append({
-                "start": match.start(),
-                "end": match.end(),
-                "entry": entry
-            })
+        def accept(entry):
+            return entry_matches_direction(entry, from_lang, to_lang)
+    if not text or not len(matcher):
+        return []
     
-    # 按起始位置排序，同起点时优先较长匹配
-    matches.sort(key=lambda item: (item["start"], -(item["end"] - item["start"])))
-    return matches
+    # 结果已按起始位置排序，同起点时优先较长匹配
+    return [
+        {"start": start, "end": end, "entry": entry}
+        for start, end, entry in matcher.find_matches(text, accept)
+    ]
 
 
 def apply_glossary_inline(text, matches):
@@ -329,22 +630,587 @@ def apply_glossary_inline(text, matches):
     return ''.join(result_parts), applied_entries
 
 
+# 译文词形校准（合并正则按词条组合缓存）
+canonical_casing = CanonicalCasing()
+
 def enforce_glossary_in_result(text, applied_entries):
-    """确保翻译结果中保留词典目标词条"""
+    """确保翻译结果中保留词典目标词条（全部词条合并为一个正则，单次扫描）"""
     if not text or not applied_entries:
         return text
+    return canonical_casing.restore(text, [entry.get("replacement", "") for entry in applied_entries])
+
+
+class MessageAnalysis(object):
+    """单条字幕消息的文本分析结果，在接收消息时计算一次，随消息传给翻译与显示环节
+
+    Attributes:
+        text (str): 原文
+        normalized_text (str): 去除首尾空白后的原文（即翻译使用的文本）
+        language (str): 检测到的语种代码
+        language_confidence (float): 语种检测置信度，长文本抽样检测时小于 1.0
+        from_lang / to_lang (str): 翻译方向
+        layout (dict): 字幕显示布局，同 language_detector.get_display_layout
+        local_result (str): 整句词典命中结果，未命中为 None
+        glossary_matches (list): 词典短语命中（整句命中时为空）
+        snapshot (GlossarySnapshot): 分析时使用的词典快照
+    """
     
-    result_text = text
-    for entry in applied_entries:
-        replacement = entry.get("replacement", "")
-        if not replacement:
+    __slots__ = ("text", "normalized_text", "language", "language_confidence", "from_lang", "to_lang",
+                 "layout", "local_result", "glossary_matches", "snapshot")
+    
+    def __init__(self, text, normalized_text, language, language_confidence, from_lang, to_lang, layout,
+                 local_result, glossary_matches, snapshot):
+        self.text = text
+        self.normalized_text = normalized_text
+        self.language = language
+        self.language_confidence = language_confidence
+        self.from_lang = from_lang
+        self.to_lang = to_lang
+        self.layout = layout
+        self.local_result = local_result
+        self.glossary_matches = glossary_matches
+        self.snapshot = snapshot
+    
+    def __repr__(self):
+        return (f"MessageAnalysis(language={self.language!r}({self.language_confidence:.3f}), "
+                f"{self.from_lang}->{self.to_lang}, "
+                f"glossary_matches={len(self.glossary_matches)}, "
+                f"local_result={self.local_result is not None})")
+
+
+def analyze_message(text, snapshot=None):
+    """
+    分析一条字幕消息：语种检测、翻译方向、显示布局、整句词典与词典短语命中
+    每条消息只检测一次语种，结果由 translate_text 与字幕窗口复用
+    
+    Args:
+        text (str): 消息原文
+        snapshot (GlossarySnapshot, optional): 词典快照，默认使用当前快照
+    
+    Returns:
+        MessageAnalysis: 分析结果
+    """
+    text = text or ''
+    normalized_text = text.strip()
+    # 整个分析（以及后续翻译计划）使用同一快照，热更新不会让条目与匹配器不一致
+    if snapshot is None:
+        snapshot = glossary_snapshot
+    
+    # 长段落抽样检测，结论确定后提前结束
+    language, language_confidence = detect_language_with_confidence(normalized_text)
+    direction_from, direction_to, _, _ = get_direction_for_language(language)
+    from_lang = normalize_language_code(direction_from) or TRANSLATION_CONFIG["from_lang"]
+    to_lang = normalize_language_code(direction_to) or TRANSLATION_CONFIG["to_lang"]
+    layout = build_display_layout(text, language)
+    
+    # 整句词典命中（大小写不敏感）时无需再匹配词典短语
+    local_result = None
+    glossary_matches = []
+    entry = snapshot.get(normalized_text.lower()) if normalized_text else None
+    if entry:
+        local_result = entry.get("replacement", normalized_text)
+    elif normalized_text:
+        glossary_matches = collect_glossary_matches(normalized_text, from_lang, to_lang, snapshot)
+    
+    return MessageAnalysis(text, normalized_text, language, language_confidence, from_lang, to_lang,
+                           layout, local_result, glossary_matches, snapshot)
+
+
+def build_provisional_translation(analysis, min_coverage=0.0):
+    """
+    API译文返回前先行显示的临时译文：整句词典命中结果，或词典短语内联替换后的文本
+    
+    Args:
+        analysis (MessageAnalysis): analyze_message 的结果
+        min_coverage (float): 内联替换至少覆盖原文的比例，低于该比例时临时译文与原文相差无几，不再显示
+    
+    Returns:
+        str: 临时译文，没有可用的词典命中时返回 None
+    """
+    if analysis.local_result is not None:
+        return analysis.local_result
+    text = analysis.normalized_text
+    if not text or not analysis.glossary_matches:
+        return None
+    
+    # 与 apply_glossary_inline 相同，跳过被前一个命中覆盖的匹配
+    covered = 0
+    last_index = 0
+    for match in analysis.glossary_matches:
+        if match["start"] < last_index:
             continue
-        regex = re.compile(re.escape(replacement), re.IGNORECASE)
-        result_text = regex.sub(replacement, result_text)
-    return result_text
+        covered += match["end"] - match["start"]
+        last_index = match["end"]
+    if covered / len(text) < min_coverage:
+        return None
+    inline_text, _ = apply_glossary_inline(text, analysis.glossary_matches)
+    return inline_text
 
 
-def translate_text(text, from_lang=None, to_lang=None):
+def prepare_translation(text, analysis=None):
+    """
+    翻译前处理：整句词典命中、翻译方向检测、词典短语内联替换
+    
+    Args:
+        text (str): 已去除首尾空白的文本
+        analysis (MessageAnalysis, optional): 接收消息时已完成的分析结果，不传或与文本不符时重新分析
+    
+    Returns:
+        dict: 翻译计划
+        {
+            "text": 原文,
+            "local_result": 整句词典命中结果（未命中为 None）,
+            "from_lang": "cn", "to_lang": "en",
+            "inline_text": 内联替换后的文本（即提交给API的文本）,
+            "applied_entries": 已应用的词典条目
+        }
+    """
+    if analysis is None or analysis.normalized_text != text:
+        analysis = analyze_message(text)
+    
+    plan = {
+        "text": text,
+        "local_result": analysis.local_result,
+        "from_lang": None,
+        "to_lang": None,
+        "inline_text": text,
+        "applied_entries": []
+    }
+    if analysis.local_result is not None:
+        return plan
+    
+    inline_text, applied_entries = apply_glossary_inline(text, analysis.glossary_matches)
+    if applied_entries:
+        match_terms = [
+            entry.get("pattern", "")
+            for entry in applied_entries
+            if entry and entry.get("pattern")
+        ]
+        logger.info(
+            f"使用本地词典短语替换: 匹配 {len(applied_entries)} 处"
+            + (f" ({', '.join(match_terms)})" if match_terms else "")
+        )
+    
+    plan.update({
+        "from_lang": analysis.from_lang,
+        "to_lang": analysis.to_lang,
+        "inline_text": inline_text,
+        "applied_entries": applied_entries
+    })
+    return plan
+
+
+def create_translator(request_text, from_lang, to_lang, client=None):
+    """根据配置创建API请求对象"""
+    return get_result(
+        XFYUN_CONFIG["host"],
+        XFYUN_CONFIG["app_id"],
+        XFYUN_CONFIG["api_key"],
+        XFYUN_CONFIG["secret"],
+        request_text,
+        {"from": from_lang, "to": to_lang},
+        client=client,
+        scheme=XFYUN_CONFIG.get("scheme", "https")
+    )
+
+
+def lookup_cached_result(request_text, from_lang, to_lang):
+    """查询翻译结果缓存，键为词典替换后的请求文本，词典变更后自然失效"""
+    if translation_cache is None:
+        return None
+    result = translation_cache.get(request_text, from_lang, to_lang)
+    if result:
+        logger.info(f"命中翻译结果缓存: '{request_text}' -> '{result}'")
+    return result
+
+
+def store_cached_result(request_text, from_lang, to_lang, result):
+    """写入翻译结果缓存与模糊翻译记忆"""
+    if not result:
+        return
+    if translation_cache is not None:
+        translation_cache.put(request_text, from_lang, to_lang, result)
+    if translation_memory is not None:
+        translation_memory.store(request_text, from_lang, to_lang, result)
+
+
+def lookup_translation_memory(request_text, from_lang, to_lang):
+    """精确缓存未命中时，查询相似原文的历史译文"""
+    if translation_memory is None:
+        return None
+    result, _ = translation_memory.lookup(request_text, from_lang, to_lang)
+    return result
+
+
+# 在途翻译请求合并（键与结果缓存一致：规范化请求文本 + 翻译方向）
+translation_flights = SingleFlight()
+
+def get_coalescing_stats():
+    """获取在途请求合并统计信息"""
+    return translation_flights.get_stats()
+
+
+def create_flow_controller():
+    """根据配置创建翻译API流控器，未启用时返回 None"""
+    if not RATE_LIMIT_CONFIG.get("enabled", False):
+        return None
+    bucket = None
+    if RATE_LIMIT_CONFIG.get("qps"):
+        bucket = TokenBucket(RATE_LIMIT_CONFIG["qps"], RATE_LIMIT_CONFIG.get("burst"))
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=RATE_LIMIT_CONFIG.get("initial_concurrency", 8),
+        min_limit=RATE_LIMIT_CONFIG.get("min_concurrency", 1),
+        max_limit=RATE_LIMIT_CONFIG.get("max_concurrency", 64),
+        decrease_factor=RATE_LIMIT_CONFIG.get("decrease_factor", 0.7),
+        latency_tolerance=RATE_LIMIT_CONFIG.get("latency_tolerance", 2.0),
+    )
+    max_wait_ms = RATE_LIMIT_CONFIG.get("max_queue_wait_ms")
+    return FlowController(bucket, limiter, None if max_wait_ms is None else max_wait_ms / 1000.0)
+
+# 翻译API流控器（可选）
+translation_flow = create_flow_controller()
+
+def get_flow_control_stats():
+    """获取流控统计信息（排队深度、等待时间、拒绝数、并发上限）"""
+    if translation_flow is None:
+        return {}
+    return translation_flow.get_stats()
+
+
+def classify_api_outcome(translator, result):
+    """根据错误码判断本次调用结果：成功 / 被限流 / 其他错误"""
+    code = translator.last_error_code
+    if code is None:
+        return OUTCOME_SUCCESS if result else OUTCOME_ERROR
+    if code in RATE_LIMIT_CONFIG.get("throttle_codes", ()):
+        return OUTCOME_THROTTLED
+    return OUTCOME_ERROR
+
+
+def create_hedging_policy():
+    """根据配置创建对冲请求策略，未启用时返回 None"""
+    if not RESILIENCE_CONFIG.get("hedging_enabled", False):
+        return None
+    return HedgingPolicy(
+        percentile=RESILIENCE_CONFIG.get("hedge_percentile", 0.95),
+        min_samples=RESILIENCE_CONFIG.get("hedge_min_samples", 20),
+        min_delay=RESILIENCE_CONFIG.get("hedge_min_delay_ms", 100) / 1000.0,
+        max_delay=RESILIENCE_CONFIG.get("hedge_max_delay_ms", 3000) / 1000.0,
+        max_ratio=RESILIENCE_CONFIG.get("hedge_max_ratio", 0.1),
+    )
+
+
+def create_circuit_breaker():
+    """根据配置创建熔断器，未启用时返回 None"""
+    if not RESILIENCE_CONFIG.get("breaker_enabled", False):
+        return None
+    return CircuitBreaker(
+        failure_threshold=RESILIENCE_CONFIG.get("breaker_failure_threshold", 5),
+        recovery_timeout=RESILIENCE_CONFIG.get("breaker_recovery_ms", 10000) / 1000.0,
+    )
+
+# 对冲请求策略与熔断器（可选）
+translation_hedging = create_hedging_policy()
+translation_breaker = create_circuit_breaker()
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+
+def get_hedge_executor():
+    """同步对冲请求使用的线程池（延迟创建）"""
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _hedge_executor_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(
+                    max_workers=HTTP_CONFIG.get("pool_maxsize", 32),
+                    thread_name_prefix="translation-hedge"
+                )
+    return _hedge_executor
+
+def get_resilience_stats():
+    """获取对冲请求与熔断器统计信息"""
+    stats = {}
+    if translation_hedging is not None:
+        stats["hedging"] = translation_hedging.get_stats()
+    if translation_breaker is not None:
+        stats["breaker"] = translation_breaker.get_stats()
+    return stats
+
+
+def record_api_attempt(outcome, latency):
+    """记录单次API调用结果，用于对冲阈值统计和熔断判断"""
+    if outcome == OUTCOME_SUCCESS:
+        if translation_hedging is not None:
+            translation_hedging.latencies.record(latency)
+        if translation_breaker is not None:
+            translation_breaker.record_success()
+    elif translation_breaker is not None:
+        translation_breaker.record_failure()
+
+
+def call_translation_api(request_text, from_lang, to_lang):
+    """使用共享连接池调用API翻译（经过流控），失败返回空字符串"""
+    permit = None
+    if translation_flow is not None:
+        try:
+            permit = translation_flow.acquire()
+        except RateLimitExceeded as e:
+            logger.warning(f"翻译API流控: {e}")
+            if translation_breaker is not None:
+                translation_breaker.record_cancelled()
+            return ''
+    
+    translator = create_translator(request_text, from_lang, to_lang, client=get_translation_client())
+    outcome = OUTCOME_ERROR
+    started_at = time.monotonic()
+    try:
+        result = translator.call_url()
+        outcome = classify_api_outcome(translator, result)
+        record_api_attempt(outcome, time.monotonic() - started_at)
+        return result
+    finally:
+        if translation_flow is not None:
+            translation_flow.release(permit, outcome)
+
+
+async def call_translation_api_async(request_text, from_lang, to_lang, client, progress=None):
+    """使用异步客户端调用API翻译（经过流控），失败返回空字符串
+
+    progress 为可选字典，真正发出HTTP请求前置 progress["sent"] = True，供取消统计区分是否已发出
+    """
+    permit = None
+    if translation_flow is not None:
+        try:
+            permit = await translation_flow.acquire_async()
+        except RateLimitExceeded as e:
+            logger.warning(f"翻译API流控: {e}")
+            if translation_breaker is not None:
+                translation_breaker.record_cancelled()
+            return ''
+    
+    translator = create_translator(request_text, from_lang, to_lang)
+    outcome = OUTCOME_ERROR
+    started_at = time.monotonic()
+    if progress is not None:
+        progress["sent"] = True
+    try:
+        result = await translator.call_url_async(client)
+        outcome = classify_api_outcome(translator, result)
+        record_api_attempt(outcome, time.monotonic() - started_at)
+        return result
+    except asyncio.CancelledError:
+        outcome = None
+        if translation_breaker is not None:
+            translation_breaker.record_cancelled()
+        raise
+    finally:
+        if translation_flow is not None:
+            if outcome is None:
+                translation_flow.abandon(permit)
+            else:
+                translation_flow.release(permit, outcome)
+
+
+def allow_api_request():
+    """熔断期间直接返回 False，由调用方使用本地兜底"""
+    if translation_breaker is None or translation_breaker.allow_request():
+        return True
+    logger.warning("翻译API熔断中，跳过API调用，使用本地兜底")
+    return False
+
+
+def call_translation_api_hedged(request_text, from_lang, to_lang):
+    """调用API翻译（熔断 + 对冲请求），失败返回空字符串"""
+    if not allow_api_request():
+        return ''
+    delay = translation_hedging.hedge_delay() if translation_hedging is not None else None
+    if delay is None:
+        return call_translation_api(request_text, from_lang, to_lang)
+    
+    executor = get_hedge_executor()
+    primary = executor.submit(call_translation_api, request_text, from_lang, to_lang)
+    try:
+        return primary.result(timeout=delay)
+    except FutureTimeoutError:
+        pass
+    if not translation_hedging.try_fire():
+        return primary.result()
+    
+    logger.info(f"翻译请求超过 {delay * 1000:.0f}ms 未返回，发起对冲请求: {request_text}")
+    hedge = executor.submit(call_translation_api, request_text, from_lang, to_lang)
+    pending = {primary, hedge}
+    while pending:
+        done, pending = wait_futures(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            result = future.result()
+            if result:
+                if future is hedge:
+                    translation_hedging.record_win()
+                return result
+    return ''
+
+
+async def call_translation_api_hedged_async(request_text, from_lang, to_lang, client, progress=None):
+    """异步调用API翻译（熔断 + 对冲请求），失败返回空字符串；落败的请求会被取消"""
+    if not allow_api_request():
+        return ''
+    delay = translation_hedging.hedge_delay() if translation_hedging is not None else None
+    if delay is None:
+        return await call_translation_api_async(request_text, from_lang, to_lang, client, progress)
+    
+    primary = asyncio.ensure_future(
+        call_translation_api_async(request_text, from_lang, to_lang, client, progress))
+    tasks = {primary}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if primary in done:
+            return primary.result()
+        if not translation_hedging.try_fire():
+            return await primary
+        
+        logger.info(f"翻译请求超过 {delay * 1000:.0f}ms 未返回，发起对冲请求: {request_text}")
+        hedge = asyncio.ensure_future(
+            call_translation_api_async(request_text, from_lang, to_lang, client, progress))
+        tasks.add(hedge)
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if result:
+                    if task is hedge:
+                        translation_hedging.record_win()
+                    return result
+        return ''
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+def create_translation_batcher():
+    """根据配置创建微批处理器，未启用时返回 None"""
+    if not BATCH_CONFIG.get("enabled", False):
+        return None
+    logger.info(
+        f"翻译微批处理已启用: 窗口 {BATCH_CONFIG.get('window_ms', 30)}ms，"
+        f"单批最多 {BATCH_CONFIG.get('max_batch_size', 16)} 行"
+    )
+    return MicroBatcher(
+        call_translation_api_hedged,
+        window_ms=BATCH_CONFIG.get("window_ms", 30),
+        max_batch_size=BATCH_CONFIG.get("max_batch_size", 16),
+        max_batch_chars=BATCH_CONFIG.get("max_batch_chars", 2000),
+        max_inflight_batches=BATCH_CONFIG.get("max_inflight_batches", 8),
+    )
+
+# 微批处理器（可选）
+translation_batcher = create_translation_batcher()
+
+def get_batching_stats():
+    """获取微批处理统计信息（吞吐、批大小、附加延迟）"""
+    if translation_batcher is None:
+        return {}
+    return translation_batcher.get_stats()
+
+
+def request_translation(request_text, from_lang, to_lang):
+    """调用API翻译并写入缓存，失败返回空字符串"""
+    if translation_batcher is not None:
+        result = translation_batcher.submit(request_text, from_lang, to_lang).result()
+    else:
+        result = call_translation_api_hedged(request_text, from_lang, to_lang)
+    store_cached_result(request_text, from_lang, to_lang, result)
+    return result
+
+
+# 所有等待者都已放弃（字幕已无法显示）而被撤销的翻译请求统计：
+# saved 为尚在排队、未发出HTTP请求即撤销的调用数，aborted 为已发出后中止的调用数
+translation_cancellations = {"saved": 0, "aborted": 0}
+
+def get_cancellation_stats():
+    """获取过期字幕翻译的撤销统计（节省的API调用数）"""
+    return dict(translation_cancellations)
+
+
+async def request_translation_async(request_text, from_lang, to_lang):
+    """异步调用API翻译并写入缓存，失败返回空字符串"""
+    client = get_async_translation_client()
+    progress = {"sent": False}
+    future = None
+    try:
+        if translation_batcher is not None:
+            # 批处理在后台线程发送，取消等待会同时撤回尚未发送的行
+            future = translation_batcher.submit(request_text, from_lang, to_lang)
+            result = await asyncio.wrap_future(future)
+        elif client is None:
+            # 线程池中的同步调用无法中止，取消后仍会完成
+            progress["sent"] = True
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(None, call_translation_api_hedged,
+                                                request_text, from_lang, to_lang)
+        else:
+            result = await call_translation_api_hedged_async(request_text, from_lang, to_lang,
+                                                             client, progress)
+    except asyncio.CancelledError:
+        # 撤回批处理中的行：仍在等待发送时 cancel() 返回 True
+        sent = progress["sent"] if future is None else not future.cancel()
+        translation_cancellations["aborted" if sent else "saved"] += 1
+        logger.info(f"字幕已过期，撤销{'在途' if sent else '排队中'}的翻译请求: {request_text}")
+        raise
+    store_cached_result(request_text, from_lang, to_lang, result)
+    return result
+
+
+def fetch_translation(request_text, from_lang, to_lang):
+    """获取API翻译结果（先查缓存与模糊翻译记忆，合并相同的在途请求），失败返回空字符串"""
+    result = lookup_cached_result(request_text, from_lang, to_lang) or \
+        lookup_translation_memory(request_text, from_lang, to_lang)
+    if result:
+        return result
+    
+    key = TranslationCache.make_key(request_text, from_lang, to_lang)
+    return translation_flights.do(key, request_translation, request_text, from_lang, to_lang)
+
+
+async def fetch_translation_async(request_text, from_lang, to_lang):
+    """异步获取API翻译结果（先查缓存与模糊翻译记忆，合并相同的在途请求），失败返回空字符串"""
+    result = lookup_cached_result(request_text, from_lang, to_lang) or \
+        lookup_translation_memory(request_text, from_lang, to_lang)
+    if result:
+        return result
+    
+    key = TranslationCache.make_key(request_text, from_lang, to_lang)
+    return await translation_flights.do_async(
+        key, request_translation_async, request_text, from_lang, to_lang
+    )
+
+
+# 翻译结果来源
+RESULT_API = "api"            # API译文（含结果缓存与模糊翻译记忆）
+RESULT_GLOSSARY = "glossary"  # 整句词典命中，或API失败时的词典短语内联替换
+RESULT_SOURCE = "source"      # 翻译失败，返回原文
+
+
+def finish_translation(plan, result):
+    """翻译后处理：校准词典词形，API失败时使用词典兜底，返回 (译文, 结果来源)"""
+    text_cleaned = plan["text"]
+    applied_entries = plan["applied_entries"]
+    
+    if result:
+        final_result = enforce_glossary_in_result(result, applied_entries)
+        logger.info(f"API翻译完成: '{text_cleaned}' -> '{final_result}'")
+        return final_result, RESULT_API
+    
+    logger.warning(f"API翻译失败或无结果，返回兜底结果: '{text_cleaned}'")
+    if applied_entries:
+        inline_text = plan["inline_text"]
+        logger.info(f"使用本地词典兜底: '{text_cleaned}' -> '{inline_text}'")
+        return inline_text, RESULT_GLOSSARY
+    return text_cleaned, RESULT_SOURCE
+
+
+def translate_text(text, from_lang=None, to_lang=None, analysis=None):
     """
     便捷的翻译函数，支持自动语种检测和翻译方向
     优先使用本地翻译缓存，未找到时调用API
@@ -353,6 +1219,7 @@ def translate_text(text, from_lang=None, to_lang=None):
         text (str): 要翻译的文本
         from_lang (str, optional): 源语言，如果不指定则自动检测
         to_lang (str, optional): 目标语言，如果不指定则根据源语言自动选择
+        analysis (MessageAnalysis, optional): analyze_message 的结果，提供时不再重复检测语种与匹配词典
     
     Returns:
         str: 翻译结果，翻译失败返回原文
@@ -363,57 +1230,63 @@ def translate_text(text, from_lang=None, to_lang=None):
         if not text_cleaned:
             return text
         
-        # 首先检查本地翻译缓存（大小写不敏感）
-        text_lower = text_cleaned.lower()
-        entry = local_translations.get(text_lower)
-        if entry:
-            cached_result = entry.get("replacement", text_cleaned)
-            logger.info(f"使用本地翻译缓存: '{text_cleaned}' -> '{cached_result}'")
-            return cached_result
-        
-        # 根据文本内容自动检测翻译方向
-        auto_config = update_translation_config(text_cleaned)
-        from_lang = normalize_language_code(auto_config.get("from")) or TRANSLATION_CONFIG["from_lang"]
-        to_lang = normalize_language_code(auto_config.get("to")) or TRANSLATION_CONFIG["to_lang"]
-        
-        matches = collect_glossary_matches(text_cleaned, from_lang, to_lang)
-        inline_text, applied_entries = apply_glossary_inline(text_cleaned, matches)
-        if applied_entries:
-            match_terms = [
-                entry.get("pattern", "")
-                for entry in applied_entries
-                if entry and entry.get("pattern")
-            ]
-            logger.info(
-                f"使用本地词典短语替换: 匹配 {len(applied_entries)} 处"
-                + (f" ({', '.join(match_terms)})" if match_terms else "")
-            )
-        
-        request_text = inline_text
-        
-        # 获取API配置参数
-        host = XFYUN_CONFIG["host"]
-        app_id = XFYUN_CONFIG["app_id"]
-        api_key = XFYUN_CONFIG["api_key"]
-        secret = XFYUN_CONFIG["secret"]
+        plan = prepare_translation(text_cleaned, analysis)
+        if plan["local_result"] is not None:
+            logger.info(f"使用本地翻译缓存: '{text_cleaned}' -> '{plan['local_result']}'")
+            return plan["local_result"]
         
-        business_args = {"from": from_lang, "to": to_lang}
+        result = fetch_translation(plan["inline_text"], plan["from_lang"], plan["to_lang"])
+        return finish_translation(plan, result)[0]
         
-        # 执行翻译
-        translator = get_result(host, app_id, api_key, secret, request_text, business_args)
-        result = translator.call_url()
+    except Exception as e:
+        logger.error(f"翻译函数发生错误: {str(e)}")
+        return text
+
+
+async def translate_text_async(text, from_lang=None, to_lang=None, analysis=None):
+    """
+    translate_text 的异步版本，在事件循环中直接发起HTTP请求，不占用线程池
+    
+    Args:
+        text (str): 要翻译的文本
+        from_lang (str, optional): 源语言，如果不指定则自动检测
+        to_lang (str, optional): 目标语言，如果不指定则根据源语言自动选择
+        analysis (MessageAnalysis, optional): analyze_message 的结果，提供时不再重复检测语种与匹配词典
+    
+    Returns:
+        str: 翻译结果，翻译失败返回原文
+    """
+    result, _ = await translate_text_with_origin_async(text, analysis)
+    return result
+
+
+async def translate_text_with_origin_async(text, analysis=None):
+    """
+    异步翻译并返回结果来源，用于区分最终显示的是API译文还是词典结果
+    
+    Args:
+        text (str): 要翻译的文本
+        analysis (MessageAnalysis, optional): analyze_message 的结果
+    
+    Returns:
+        tuple: (译文, 结果来源 RESULT_API / RESULT_GLOSSARY / RESULT_SOURCE)
+    """
+    try:
+        # 清理输入文本
+        text_cleaned = text.strip()
+        if not text_cleaned:
+            return text, RESULT_SOURCE
         
-        if result:
-            final_result = enforce_glossary_in_result(result, applied_entries)
-            logger.info(f"API翻译完成: '{text_cleaned}' -> '{final_result}'")
-            return final_result
+        plan = prepare_translation(text_cleaned, analysis)
+        if plan["local_result"] is not None:
+            logger.info(f"使用本地翻译缓存: '{text_cleaned}' -> '{plan['local_result']}'")
+            return plan["local_result"], RESULT_GLOSSARY
         
-        logger.warning(f"API翻译失败或无结果，返回兜底结果: '{text_cleaned}'")
-        if applied_entries:
-            logger.info(f"使用本地词典兜底: '{text_cleaned}' -> '{inline_text}'")
-            return inline_text
-        return text
+        result = await fetch_translation_async(plan["inline_text"], plan["from_lang"], plan["to_lang"])
+        return finish_translation(plan, result)
         
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
         logger.error(f"翻译函数发生错误: {str(e)}")
-        return text
+        return text, RESULT_SOURCE
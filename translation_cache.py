@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+翻译结果缓存模块 - 两级缓存（内存LRU + 磁盘追加日志）
+以 (规范化文本, 源语言, 目标语言) 为键，重复文本无需再次调用翻译API
+磁盘层为追加写入的JSON行日志，程序重启后自动回放恢复
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_cache_text(text):
+    """规范化缓存文本：去除首尾空白并合并连续空白"""
+    if not text:
+        return ''
+    return ' '.join(text.split())
+
+
+class TranslationCache(object):
+    """两级翻译结果缓存，线程安全"""
+
+    def __init__(self, memory_max_entries=2000, disk_max_entries=100000,
+                 ttl_seconds=7 * 24 * 3600, persist_path=None, compact_ratio=2.0):
+        self.memory_max_entries = max(1, int(memory_max_entries))
+        self.disk_max_entries = max(0, int(disk_max_entries))
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self.persist_path = persist_path
+        self.compact_ratio = max(1.5, float(compact_ratio))
+
+        self._lock = threading.Lock()
+        # 内存层: key -> (result, created_at)，按访问顺序排列
+        self._memory = OrderedDict()
+        # 磁盘层索引: key -> (offset, length, created_at)，按写入顺序排列
+        self._disk_index = OrderedDict()
+        self._disk_records = 0
+        self._reader = None
+        self._writer = None
+
+        self._stats = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+        if self.persist_path and self.disk_max_entries:
+            self._open_disk_store()
+
+    @staticmethod
+    def make_key(text, from_lang, to_lang):
+        """生成缓存键"""
+        return (normalize_cache_text(text), from_lang or '', to_lang or '')
+
+    def _is_expired(self, created_at, now):
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _open_disk_store(self):
+        """打开磁盘日志并回放索引"""
+        try:
+            directory = os.path.dirname(os.path.abspath(self.persist_path))
+            os.makedirs(directory, exist_ok=True)
+            self._replay_log()
+            self._writer = open(self.persist_path, 'ab')
+            self._reader = open(self.persist_path, 'rb')
+            logger.info(
+                f"翻译结果缓存已加载: {len(self._disk_index)} 条记录 (文件: {self.persist_path})"
+            )
+            if self._disk_records > self.compact_ratio * max(len(self._disk_index), 1):
+                self._compact()
+        except Exception as e:
+            logger.error(f"打开翻译结果缓存文件失败，仅使用内存缓存: {e}")
+            self._close_disk_store()
+            self._disk_index.clear()
+
+    def _close_disk_store(self):
+        for handle in (self._reader, self._writer):
+            try:
+                if handle:
+                    handle.close()
+            except Exception:
+                pass
+        self._reader = None
+        self._writer = None
+
+    def _replay_log(self):
+        """回放追加日志，重建 key -> 偏移量 索引"""
+        self._disk_index.clear()
+        self._disk_records = 0
+        if not os.path.exists(self.persist_path):
+            return
+
+        now = time.time()
+        corrupted = 0
+        with open(self.persist_path, 'rb') as f:
+            offset = 0
+            for raw_line in f:
+                length = len(raw_line)
+                try:
+                    record = json.loads(raw_line.decode('utf-8'))
+                    key = tuple(record["k"])
+                    created_at = float(record["t"])
+                except Exception:
+                    corrupted += 1
+                    offset += length
+                    continue
+                self._disk_records += 1
+                self._disk_index.pop(key, None)
+                if not self._is_expired(created_at, now):
+                    self._disk_index[key] = (offset, length, created_at)
+                offset += length
+
+        while len(self._disk_index) > self.disk_max_entries:
+            self._disk_index.popitem(last=False)
+        if corrupted:
+            logger.warning(f"翻译结果缓存文件中有 {corrupted} 行无法解析，已忽略")
+
+    def _read_disk_record(self, offset, length):
+        self._reader.seek(offset)
+        record = json.loads(self._reader.read(length).decode('utf-8'))
+        return record["v"]
+
+    def _append_disk_record(self, key, result, created_at):
+        record = {"k": list(key), "v": result, "t": created_at}
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+        offset = self._writer.seek(0, os.SEEK_END)
+        self._writer.write(line)
+        self._writer.flush()
+        self._disk_index.pop(key, None)
+        self._disk_index[key] = (offset, len(line), created_at)
+        self._disk_records += 1
+
+        while len(self._disk_index) > self.disk_max_entries:
+            self._disk_index.popitem(last=False)
+            self._stats["evictions"] += 1
+
+        if self._disk_records > self.compact_ratio * max(len(self._disk_index), 1) + 100:
+            self._compact()
+
+    def _compact(self):
+        """压缩磁盘日志，仅保留有效记录"""
+        tmp_path = self.persist_path + ".tmp"
+        new_index = OrderedDict()
+        with open(tmp_path, 'wb') as out:
+            offset = 0
+            for key, (old_offset, length, created_at) in self._disk_index.items():
+                self._reader.seek(old_offset)
+                line = self._reader.read(length)
+                out.write(line)
+                new_index[key] = (offset, length, created_at)
+                offset += length
+        self._close_disk_store()
+        os.replace(tmp_path, self.persist_path)
+        self._writer = open(self.persist_path, 'ab')
+        self._reader = open(self.persist_path, 'rb')
+        logger.info(
+            f"翻译结果缓存文件已压缩: {self._disk_records} -> {len(new_index)} 条记录"
+        )
+        self._disk_index = new_index
+        self._disk_records = len(new_index)
+
+    def _remember(self, key, result, created_at):
+        self._memory.pop(key, None)
+        self._memory[key] = (result, created_at)
+        while len(self._memory) > self.memory_max_entries:
+            self._memory.popitem(last=False)
+            if not self._reader:
+                self._stats["evictions"] += 1
+
+    def get(self, text, from_lang=None, to_lang=None):
+        """查询缓存，未命中或已过期返回 None"""
+        key = self.make_key(text, from_lang, to_lang)
+        if not key[0]:
+            return None
+
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                result, created_at = item
+                if not self._is_expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self._stats["hits"] += 1
+                    self._stats["memory_hits"] += 1
+                    return result
+                del self._memory[key]
+                self._stats["expirations"] += 1
+
+            location = self._disk_index.get(key) if self._reader else None
+            if location is not None:
+                offset, length, created_at = location
+                if self._is_expired(created_at, now):
+                    del self._disk_index[key]
+                    self._stats["expirations"] += 1
+                else:
+                    try:
+                        result = self._read_disk_record(offset, length)
+                    except Exception as e:
+                        logger.warning(f"读取翻译结果缓存失败: {e}")
+                        del self._disk_index[key]
+                    else:
+                        self._remember(key, result, created_at)
+                        self._stats["hits"] += 1
+                        self._stats["disk_hits"] += 1
+                        return result
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, text, from_lang, to_lang, result):
+        """写入缓存（空结果不缓存）"""
+        key = self.make_key(text, from_lang, to_lang)
+        if not key[0] or not result:
+            return
+
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, result, created_at)
+            self._stats["writes"] += 1
+            if self._writer:
+                try:
+                    self._append_disk_record(key, result, created_at)
+                except Exception as e:
+                    logger.error(f"写入翻译结果缓存文件失败: {e}")
+
+    def clear(self):
+        """清空缓存（包括磁盘文件）"""
+        with self._lock:
+            self._memory.clear()
+            self._disk_index.clear()
+            self._disk_records = 0
+            if self._writer:
+                self._writer.seek(0)
+                self._writer.truncate()
+                self._writer.flush()
+
+    def close(self):
+        """关闭磁盘文件句柄"""
+        with self._lock:
+            self._close_disk_store()
+
+    def get_stats(self):
+        """获取缓存统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = len(self._disk_index)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def __len__(self):
+        with self._lock:
+            return max(len(self._memory), len(self._disk_index))
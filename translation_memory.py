@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+模糊翻译记忆模块 - 复用近似重复原文的历史译文
+语音识别对同一句话的多次输出常只差标点、语气词或个别字，精确缓存无法命中；
+本模块以字符 n-gram 的 MinHash 局部敏感哈希（LSH）快速召回候选，
+再用带宽限制的编辑距离精确计算相似度，超过阈值即返回历史译文
+MinHash 采用单次哈希分桶（one permutation hashing）加旋转补齐，每个 n-gram 只计算一次哈希
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_IGNORED_CHARS = re.compile(r'[\W_]+')
+_MASK = (1 << 61) - 1
+
+# 相似度直方图的分桶下界
+SIMILARITY_BUCKETS = (0.0, 0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 1.0)
+
+
+def bounded_edit_distance(a, b, max_distance):
+    """带宽限制的编辑距离（Levenshtein），超过 max_distance 时返回 max_distance + 1"""
+    if a == b:
+        return 0
+    # 去掉公共前后缀，近似重复文本通常只剩很短的差异片段
+    limit = min(len(a), len(b))
+    prefix = 0
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    a = a[prefix:len(a) - suffix]
+    b = b[prefix:len(b) - suffix]
+    len_a, len_b = len(a), len(b)
+    if abs(len_a - len_b) > max_distance:
+        return max_distance + 1
+    if not len_a or not len_b:
+        return max(len_a, len_b)
+    if len_a > len_b:
+        a, b, len_a, len_b = b, a, len_b, len_a
+    over = max_distance + 1
+    previous = list(range(len_b + 1))
+    for i in range(1, len_a + 1):
+        lo = max(1, i - max_distance)
+        hi = min(len_b, i + max_distance)
+        current = [over] * (len_b + 1)
+        if lo == 1:
+            current[0] = i
+        ch = a[i - 1]
+        row_min = current[0] if lo == 1 else over
+        for j in range(lo, hi + 1):
+            cost = previous[j - 1] + (ch != b[j - 1])
+            deletion = previous[j] + 1
+            insertion = current[j - 1] + 1
+            value = cost if cost < deletion else deletion
+            if insertion < value:
+                value = insertion
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return over
+        previous = current
+    return previous[len_b] if previous[len_b] <= max_distance else over
+
+
+class TranslationMemory(object):
+    """模糊翻译记忆，线程安全
+
+    Args:
+        threshold (float): 相似度阈值（1 - 编辑距离 / 较长文本长度），达到即复用译文
+        max_entries (int): 最多保存的原文条数，超出时淘汰最久未使用的条目
+        min_chars (int): 规范化后少于该字符数的短句只做精确匹配（短句改一个字可能意思相反）
+        ngram (int): MinHash 使用的字符 n-gram 长度
+        bands (int): LSH 分段数
+        rows (int): 每段的哈希个数，bands * rows 为签名长度
+        max_candidates (int): 每次查询最多精确比较的候选数
+        max_bucket_size (int): 成员超过该数量的分段桶区分度太低，查询时跳过
+        filler_words (list): 比较前忽略的语气词
+    """
+
+    def __init__(self, threshold=0.9, max_entries=100000, min_chars=6, ngram=3, bands=10, rows=4,
+                 max_candidates=32, max_bucket_size=256, filler_words=()):
+        self.threshold = min(1.0, max(0.0, float(threshold)))
+        self.max_entries = max(1, int(max_entries))
+        self.min_chars = max(1, int(min_chars))
+        self.ngram = max(1, int(ngram))
+        self.bands = max(1, int(bands))
+        self.rows = max(1, int(rows))
+        self.max_candidates = max(1, int(max_candidates))
+        self.max_bucket_size = max(1, int(max_bucket_size))
+        self._filler = self._compile_filler(filler_words)
+
+        self._lock = threading.Lock()
+        self._next_id = 0
+        # id -> (规范化原文, 译文, 翻译方向, LSH键列表)，按访问顺序排列
+        self._entries = OrderedDict()
+        # (翻译方向, 规范化原文) -> id
+        self._exact = {}
+        # (翻译方向, 分段序号, 分段哈希) -> {id}
+        self._buckets = {}
+        self._stats = {
+            "lookups": 0,
+            "exact_hits": 0,
+            "fuzzy_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "candidates_checked": 0,
+            "skipped_buckets": 0,
+            "lookup_ms_total": 0.0,
+            "lookup_ms_max": 0.0,
+        }
+        self._histogram = [0] * len(SIMILARITY_BUCKETS)
+
+    @staticmethod
+    def _compile_filler(filler_words):
+        words = [word for word in filler_words or () if word]
+        if not words:
+            return None
+        # 英文语气词按单词边界匹配，中文语气词直接匹配
+        parts = []
+        for word in sorted(words, key=len, reverse=True):
+            escaped = re.escape(word.lower())
+            parts.append(rf'\b{escaped}\b' if word.isascii() else escaped)
+        return re.compile('|'.join(parts))
+
+    def normalize(self, text):
+        """规范化原文：忽略大小写、空白、标点与语气词"""
+        text = (text or '').lower()
+        if self._filler is not None:
+            text = self._filler.sub(' ', text)
+        return _IGNORED_CHARS.sub('', text)
+
+    def _band_keys(self, norm_text, direction):
+        n = self.ngram
+        if len(norm_text) <= n:
+            grams = {hash(norm_text)}
+        else:
+            grams = {hash(norm_text[index:index + n]) for index in range(len(norm_text) - n + 1)}
+
+        # 单次哈希分桶：哈希值按余数分到 K 个桶，各桶保留最小的商
+        size = self.bands * self.rows
+        signature = [None] * size
+        for gram in grams:
+            value = gram & _MASK
+            slot = value % size
+            value //= size
+            current = signature[slot]
+            if current is None or value < current:
+                signature[slot] = value
+        # 空桶向后借用最近的非空桶（加上距离偏移），保证相似文本的签名仍然一致
+        if None in signature:
+            for slot in range(size):
+                if signature[slot] is None:
+                    offset = 1
+                    while signature[(slot + offset) % size] is None:
+                        offset += 1
+                    signature[slot] = (signature[(slot + offset) % size], offset)
+        rows = self.rows
+        return [(direction, band, hash(tuple(signature[band * rows:(band + 1) * rows])))
+                for band in range(self.bands)]
+
+    @staticmethod
+    def _allowed_distance(similarity, length):
+        """相似度不低于 similarity 时允许的最大编辑距离（容忍浮点误差）"""
+        return int((1.0 - similarity) * length + 1e-9)
+
+    def _record(self, similarity, elapsed_ms):
+        for index in range(len(SIMILARITY_BUCKETS) - 1, -1, -1):
+            if similarity >= SIMILARITY_BUCKETS[index]:
+                self._histogram[index] += 1
+                break
+        self._stats["lookup_ms_total"] += elapsed_ms
+        self._stats["lookup_ms_max"] = max(self._stats["lookup_ms_max"], elapsed_ms)
+
+    def lookup(self, text, from_lang, to_lang):
+        """查找相似原文的历史译文
+
+        Returns:
+            tuple: (译文, 相似度)，未命中返回 (None, 最高相似度)
+        """
+        started_at = time.perf_counter()
+        direction = (from_lang or '', to_lang or '')
+        norm_text = self.normalize(text)
+        with self._lock:
+            self._stats["lookups"] += 1
+
+        if not norm_text:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None, 0.0
+
+        with self._lock:
+            entry_id = self._exact.get((direction, norm_text))
+            if entry_id is not None:
+                self._entries.move_to_end(entry_id)
+                self._stats["exact_hits"] += 1
+                self._record(1.0, (time.perf_counter() - started_at) * 1000)
+                return self._entries[entry_id][1], 1.0
+
+        if len(norm_text) < self.min_chars or self.threshold >= 1.0:
+            with self._lock:
+                self._stats["misses"] += 1
+                self._record(0.0, (time.perf_counter() - started_at) * 1000)
+            return None, 0.0
+
+        band_keys = self._band_keys(norm_text, direction)
+        max_distance = self._allowed_distance(self.threshold, len(norm_text) / self.threshold)
+        with self._lock:
+            collisions = {}
+            for key in band_keys:
+                bucket = self._buckets.get(key)
+                if not bucket:
+                    continue
+                if len(bucket) > self.max_bucket_size:
+                    self._stats["skipped_buckets"] += 1
+                    continue
+                for entry_id in bucket:
+                    collisions[entry_id] = collisions.get(entry_id, 0) + 1
+            candidates = [self._entries[entry_id][:2] + (entry_id, count)
+                          for entry_id, count in collisions.items()]
+
+        # 碰撞段数越多越可能相似，其次长度最接近的候选优先比较；命中阈值即停止
+        candidates.sort(key=lambda item: (-item[3], abs(len(item[0]) - len(norm_text))))
+        best = (None, 0.0, None)
+        checked = 0
+        for candidate_text, translation, entry_id, _ in candidates[:self.max_candidates]:
+            longest = max(len(candidate_text), len(norm_text))
+            limit = min(max_distance, self._allowed_distance(self.threshold, longest))
+            checked += 1
+            distance = bounded_edit_distance(norm_text, candidate_text, limit)
+            if distance > limit:
+                continue
+            best = (translation, 1.0 - distance / longest, entry_id)
+            break
+
+        translation, similarity, entry_id = best
+        with self._lock:
+            self._stats["candidates_checked"] += checked
+            hit = translation is not None and similarity >= self.threshold
+            if hit and entry_id in self._entries:
+                self._entries.move_to_end(entry_id)
+            self._stats["fuzzy_hits" if hit else "misses"] += 1
+            self._record(similarity, (time.perf_counter() - started_at) * 1000)
+        if hit:
+            logger.info(f"命中模糊翻译记忆(相似度 {similarity:.2f}): '{text}' -> '{translation}'")
+            return translation, similarity
+        return None, similarity
+
+    def store(self, text, from_lang, to_lang, translation):
+        """保存一条原文与译文"""
+        if not translation:
+            return
+        direction = (from_lang or '', to_lang or '')
+        norm_text = self.normalize(text)
+        if not norm_text:
+            return
+        band_keys = self._band_keys(norm_text, direction) if len(norm_text) >= self.min_chars else []
+
+        with self._lock:
+            existing = self._exact.get((direction, norm_text))
+            if existing is not None:
+                self._remove(existing)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (norm_text, translation, direction, band_keys)
+            self._exact[(direction, norm_text)] = entry_id
+            for key in band_keys:
+                self._buckets.setdefault(key, set()).add(entry_id)
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def _remove(self, entry_id):
+        norm_text, _, direction, band_keys = self._entries.pop(entry_id)
+        if self._exact.get((direction, norm_text)) == entry_id:
+            del self._exact[(direction, norm_text)]
+        for key in band_keys:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._exact.clear()
+            self._buckets.clear()
+
+    def get_stats(self):
+        """获取统计信息：命中率、候选数、查询耗时与最佳相似度直方图"""
+        with self._lock:
+            stats = dict(self._stats)
+            histogram = list(self._histogram)
+            stats["entries"] = len(self._entries)
+        lookups = stats["lookups"]
+        hits = stats["exact_hits"] + stats["fuzzy_hits"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        stats["lookup_ms_avg"] = stats["lookup_ms_total"] / lookups if lookups else 0.0
+        stats["candidates_avg"] = stats["candidates_checked"] / lookups if lookups else 0.0
+        stats["similarity_histogram"] = {
+            f"{SIMILARITY_BUCKETS[index]:.2f}": count for index, count in enumerate(histogram)
+        }
+        return stats
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+WebSocket消息编码模块 - 按连接协商消息编码
+    json:    文本帧；安装了 orjson 时使用 orjson 编解码，否则使用标准库（不转义非ASCII字符，紧凑分隔符）
+    msgpack: 二进制帧（需安装 msgpack），体积更小、编解码更快
+客户端可通过 WebSocket 子协议（subtitle.json / subtitle.msgpack）或配置消息 {"type": "config", "encoding": ...}
+选择响应编码；收到的消息按帧类型解码：文本帧为JSON，二进制帧为MessagePack
+"""
+
+import inspect
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+ENCODINGS = ("json", "msgpack")
+
+# WebSocket 子协议与编码的对应关系
+SUBPROTOCOLS = {
+    "subtitle.json": "json",
+    "subtitle.msgpack": "msgpack",
+}
+
+# 关闭回显时从响应中去除的字段（客户端发送的原文）
+ECHO_FIELDS = ("source_text",)
+
+
+class MessageDecodeError(ValueError):
+    """收到的消息无法解码"""
+
+
+def available_encodings():
+    """当前环境可用的编码"""
+    return tuple(encoding for encoding in ENCODINGS if encoding != "msgpack" or msgpack is not None)
+
+
+def check_encoding(encoding):
+    """检查编码是否受支持且已安装，不可用时抛出 ValueError"""
+    if encoding not in ENCODINGS:
+        raise ValueError(f"不支持的消息编码: {encoding}")
+    if encoding not in available_encodings():
+        raise ValueError(f"未安装 {encoding}，无法使用该编码")
+
+
+def available_subprotocols():
+    """当前环境可协商的子协议，按优先顺序排列"""
+    encodings = available_encodings()
+    return [name for name, encoding in SUBPROTOCOLS.items() if encoding in encodings]
+
+
+# json.dumps 传入非默认参数时每次调用都会新建编码器，这里复用同一个
+_json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def encode_json(obj):
+    """编码为UTF-8 JSON字节串（非ASCII字符不转义）"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return _json_encoder.encode(obj).encode("utf-8")
+
+
+def encode_message(message, encoding):
+    """按指定编码编码消息，返回字节串"""
+    if encoding == "msgpack":
+        return msgpack.packb(message, use_bin_type=True)
+    return encode_json(message)
+
+
+def _supports_text_bytes(websocket):
+    """websockets 13 起 send(bytes, text=True) 直接以文本帧发送UTF-8字节，省去一次解码与重新编码"""
+    try:
+        return "text" in inspect.signature(websocket.send).parameters
+    except (AttributeError, TypeError, ValueError):
+        return False
+
+
+def decode_message(message):
+    """按帧类型解码收到的消息：文本帧为JSON，二进制帧为MessagePack"""
+    try:
+        if isinstance(message, (bytes, bytearray, memoryview)):
+            if msgpack is None:
+                raise MessageDecodeError("未安装 msgpack，无法解析二进制消息")
+            data = msgpack.unpackb(message, raw=False)
+        elif orjson is not None:
+            data = orjson.loads(message)
+        else:
+            data = json.loads(message)
+    except MessageDecodeError:
+        raise
+    except Exception as e:
+        raise MessageDecodeError(str(e)) from e
+    if not isinstance(data, dict):
+        raise MessageDecodeError("消息必须是对象")
+    return data
+
+
+class WireConnection(object):
+    """单个连接的消息收发：按协商的编码发送响应，可选去除回显的原文
+
+    Args:
+        websocket: websockets 连接对象
+        encoding (str): 响应编码，json 或 msgpack；未指定时按子协议协商结果，再退回默认配置
+        echo_text (bool): 响应是否回显原文
+    """
+
+    def __init__(self, websocket, encoding=None, echo_text=True):
+        self.websocket = websocket
+        self._send_text_bytes = _supports_text_bytes(websocket)
+        subprotocol = getattr(websocket, "subprotocol", None)
+        if subprotocol in SUBPROTOCOLS:
+            encoding = SUBPROTOCOLS[subprotocol]
+        self.encoding = "json"
+        self.configure(encoding=encoding or "json", echo_text=echo_text)
+
+    def configure(self, encoding=None, echo_text=None):
+        """调整响应编码与回显设置"""
+        if encoding is not None:
+            check_encoding(encoding)
+            self.encoding = encoding
+        if echo_text is not None:
+            self.echo_text = bool(echo_text)
+
+    def encode(self, response):
+        """按当前设置编码响应，返回字节串：json 以文本帧发送，msgpack 以二进制帧发送"""
+        if not self.echo_text:
+            echoed = [key for key in ECHO_FIELDS if key in response]
+            if echoed:
+                response = dict(response)
+                for key in echoed:
+                    del response[key]
+        return encode_message(response, self.encoding)
+
+    async def send(self, response):
+        await self.send_encoded(self.encode(response))
+
+    async def send_encoded(self, payload):
+        """发送已按当前编码编码的消息（广播时同一编码只编码一次）"""
+        if self.encoding == "msgpack":
+            await self.websocket.send(payload)
+        elif self._send_text_bytes:
+            await self.websocket.send(payload, text=True)
+        else:
+            await self.websocket.send(payload.decode("utf-8"))